@@ -0,0 +1,286 @@
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+
+from . import constants
+from .cache import DEFAULT_CACHE_MAX_BYTES, default_cache_dir
+from .metrics import Metrics
+
+DATA_EXTENSIONS = (".csv", ".npy", ".parquet", ".pq", ".arrow", ".feather")
+SUMMARY_FIELDS = [
+    "dataset",
+    "formula",
+    "coefficients",
+    "intercept",
+    "mse",
+    "seconds",
+    "combinations_fitted",
+    "error_message",
+]
+
+
+def find_datasets(path):
+    """Returns the datasets in a directory, or listed in a manifest file.
+
+    A manifest lists one dataset per line, relative to the manifest's own
+    directory; blank lines and lines starting with '#' are ignored.
+    """
+    if os.path.isdir(path):
+        return sorted(
+            os.path.join(path, name)
+            for name in os.listdir(path)
+            if os.path.splitext(name)[1].lower() in DATA_EXTENSIONS
+        )
+    base = os.path.dirname(path)
+    with open(path) as f:
+        lines = [line.strip() for line in f]
+    return [
+        os.path.join(base, line) for line in lines if line and not line.startswith("#")
+    ]
+
+
+def fit_dataset(data_path, search_kwargs):
+    """Searches one dataset in the current process and returns its summary row.
+
+    Progress output is suppressed and failures are recorded in the row
+    rather than raised, so one bad file does not abort a batch.
+    """
+    from .model_search import search_models
+
+    metrics = Metrics()
+    row = dict.fromkeys(SUMMARY_FIELDS)
+    row["dataset"] = data_path
+    start = time.perf_counter()
+    try:
+        best = search_models(
+            data_path, num_threads=1, metrics=metrics, verbose=False, **search_kwargs
+        )[0]
+        row.update(
+            formula=" + ".join(str(f) for f in best["basis_functions"]),
+            coefficients=[float(c) for c in best["model"].coef_],
+            intercept=float(best["model"].intercept_),
+            mse=float(best["error"]),
+        )
+    except Exception as error:
+        # Missing optional readers (ImportError) and bases too large for
+        # memory (MemoryError) only fail this dataset, like unreadable files.
+        row["error_message"] = f"{type(error).__name__}: {error}"
+    row["seconds"] = time.perf_counter() - start
+    row["combinations_fitted"] = metrics.counters.get("combinations_fitted", 0)
+    row["phases"] = {
+        name: phase["wall_seconds"] for name, phase in metrics.phases.items()
+    }
+    return row
+
+
+def run_batch(data_paths, num_threads=4, **search_kwargs):
+    """Fits every dataset, scheduling whole datasets across worker processes.
+
+    Each dataset is searched single-threaded inside one worker of a shared
+    process pool, so workers, imports and basis tables are reused across
+    datasets. The largest files are submitted first to balance the load.
+    Returns the summary rows in the order of `data_paths`.
+    """
+    from joblib import Parallel, delayed
+
+    order = sorted(
+        range(len(data_paths)),
+        key=lambda i: (
+            -os.path.getsize(data_paths[i]) if os.path.exists(data_paths[i]) else 0
+        ),
+    )
+    rows = Parallel(n_jobs=num_threads)(
+        delayed(fit_dataset)(data_paths[i], search_kwargs) for i in order
+    )
+    ordered = [None] * len(data_paths)
+    for i, row in zip(order, rows):
+        ordered[i] = row
+    return ordered
+
+
+def write_summary(rows, path):
+    """Writes the summary rows as CSV if `path` ends in .csv, else as JSON."""
+    if path.lower().endswith(".csv"):
+        with open(path, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=SUMMARY_FIELDS, extrasaction="ignore")
+            writer.writeheader()
+            for row in rows:
+                writer.writerow(
+                    dict(
+                        row, coefficients=" ".join(map(str, row["coefficients"] or []))
+                    )
+                )
+    else:
+        with open(path, "w") as f:
+            json.dump(rows, f, indent=2)
+
+
+def main(argv=None):
+    """Main function to fit a batch of datasets."""
+    parser = argparse.ArgumentParser(
+        description="Find the best complexity model for every dataset in a "
+        "directory or manifest."
+    )
+    parser.add_argument(
+        "datasets",
+        help="Directory of data files, or a manifest listing one file per line.",
+    )
+    parser.add_argument(
+        "--output",
+        type=str,
+        default="summary.json",
+        help="Summary file, one row per dataset (.json or .csv).",
+    )
+    parser.add_argument(
+        "--num_threads",
+        type=int,
+        default=4,
+        help="Number of datasets fitted in parallel.",
+    )
+    parser.add_argument(
+        "--search_strategy",
+        type=str,
+        default="grid",
+        help="Search strategy to use ('grid', 'random', 'stepwise' or 'bnb').",
+    )
+    parser.add_argument(
+        "--num_samples",
+        type=int,
+        default=100,
+        help="Number of samples to use for random search.",
+    )
+    parser.add_argument(
+        "--seed",
+        type=int,
+        default=None,
+        help="Random seed for reproducible random search.",
+    )
+    parser.add_argument(
+        "--num_terms",
+        type=int,
+        default=constants.DEFAULT_NUM_TERMS,
+        help="The number of terms in the complexity function.",
+    )
+    parser.add_argument(
+        "--p_values",
+        type=float,
+        nargs="*",
+        default=constants.DEFAULT_P_VALUES,
+        help="A list of values for the exponents of the polynomial terms.",
+    )
+    parser.add_argument(
+        "--q_values",
+        type=float,
+        nargs="*",
+        default=constants.DEFAULT_Q_VALUES,
+        help="A list of values for the exponents of the polylogarithmic terms.",
+    )
+    parser.add_argument(
+        "--X_values",
+        type=float,
+        nargs="*",
+        default=constants.DEFAULT_X_VALUES,
+        help="A list of values for the base of the exponential terms.",
+    )
+    parser.add_argument(
+        "--solver",
+        type=str,
+        default="sklearn",
+        help="Fitting engine to use ('sklearn', 'gram', 'batched' or "
+        "'incremental', which is much slower than 'batched').",
+    )
+    parser.add_argument(
+        "--criterion",
+        type=str,
+        default="mse",
+        help="Model selection criterion ('mse', 'aic', 'bic', 'cv' for k-fold "
+        "cross-validation or 'loo' for leave-one-out; cv and loo require the "
+        "gram or batched solver, and grid search with aic or bic also tries "
+        "fewer terms).",
+    )
+    parser.add_argument(
+        "--cv_folds",
+        type=int,
+        default=5,
+        help="Number of folds for the cv criterion.",
+    )
+    parser.add_argument(
+        "--weights",
+        type=str,
+        default=None,
+        help="Weight the least-squares objective per row: 'relative' fits the "
+        "relative error (1/y^2 weights), any other value names a data column "
+        "holding the weights.",
+    )
+    parser.add_argument(
+        "--log_space",
+        action="store_true",
+        help="Evaluate bases in the log domain with per-column normalization.",
+    )
+    parser.add_argument(
+        "--prune_equivalent",
+        action="store_true",
+        help="Keep one basis column per class of identical or collinear columns.",
+    )
+    parser.add_argument(
+        "--batch_size",
+        type=int,
+        default=4096,
+        help="Number of combinations solved in one call by the batched solver.",
+    )
+    parser.add_argument(
+        "--cache_dir",
+        type=str,
+        default=default_cache_dir(),
+        help="Directory caching evaluated basis matrices and Gram statistics.",
+    )
+    parser.add_argument(
+        "--no_cache",
+        action="store_true",
+        help="Neither read nor write the on-disk cache.",
+    )
+    args = parser.parse_args(argv)
+
+    data_paths = find_datasets(args.datasets)
+    rows = run_batch(
+        data_paths,
+        num_threads=args.num_threads,
+        num_terms=args.num_terms,
+        p_values=args.p_values,
+        q_values=args.q_values,
+        X_values=args.X_values,
+        search_strategy=args.search_strategy,
+        num_samples=args.num_samples,
+        seed=args.seed,
+        solver=args.solver,
+        log_space=args.log_space,
+        prune_equivalent=args.prune_equivalent,
+        criterion=args.criterion,
+        cv_folds=args.cv_folds,
+        weights=args.weights,
+        batch_size=args.batch_size,
+        cache_dir=None if args.no_cache else args.cache_dir,
+        cache_max_bytes=DEFAULT_CACHE_MAX_BYTES,
+    )
+    write_summary(rows, args.output)
+
+    failed = 0
+    for row in rows:
+        if row["error_message"] is not None:
+            failed += 1
+            print(f"{row['dataset']}: FAILED {row['error_message']}", file=sys.stderr)
+        else:
+            print(
+                f"{row['dataset']}: {row['formula']} "
+                f"(MSE {row['mse']:.6g}, {row['seconds']:.2f}s)"
+            )
+    print(f"Fitted {len(rows) - failed}/{len(rows)} datasets; summary in {args.output}")
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,465 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from . import constants
+from .gram import GramStatistics, IncrementalSolver
+from .model_search import (
+    build_coded_basis_matrix,
+    find_best_model,
+    fit_cached_model,
+    iter_index_batches,
+)
+from .predict import CompiledModel, predict
+from .search import (
+    generate_1d_basis_functions,
+    get_nd_basis_function,
+    iter_combinations,
+    iter_revolving_door,
+    n_choose_k,
+    nd_basis_codes,
+)
+
+CONSTANT_SETS = {
+    "default": (
+        constants.DEFAULT_NUM_TERMS,
+        constants.DEFAULT_P_VALUES,
+        constants.DEFAULT_Q_VALUES,
+        constants.DEFAULT_X_VALUES,
+    ),
+    "best": (
+        constants.BEST_NUM_TERMS,
+        constants.BEST_P_VALUES,
+        constants.BEST_Q_VALUES,
+        constants.BEST_X_VALUES,
+    ),
+}
+DEFAULT_SIZES = [25, 1000, 100000, 1000000]
+DESIGN_BATCH = 4096
+SKLEARN_FITS = 200
+ENUMERATED_COMBINATIONS = 100000
+# Command-line invocations whose cold start (interpreter plus imports) is timed.
+STARTUP_COMMANDS = {
+    "startup_main_help": ["-m", "nd_r_complexity.main", "--help"],
+    "startup_print_functions": [
+        "-m",
+        "nd_r_complexity.print_functions",
+        "--num_dimensions",
+        "2",
+        "--total_only",
+    ],
+}
+
+
+def make_dataset(num_rows, num_dimensions, seed=0):
+    """Generates a synthetic measurement set with a polynomial ground truth."""
+    rng = np.random.default_rng(seed)
+    X_data = rng.integers(1, 50, size=(num_rows, num_dimensions)).astype(np.float64)
+    y_data = X_data.prod(axis=1) * 1e-3 + rng.normal(scale=0.1, size=num_rows)
+    return X_data, y_data
+
+
+def time_call(func, repeat):
+    """Returns the best wall-clock time of `repeat` calls to `func`."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def _record(results, name, case, seconds=None, operations=None, skipped=None):
+    entry = dict(case, name=name)
+    if skipped is not None:
+        entry["skipped"] = skipped
+    else:
+        entry.update(
+            seconds=seconds,
+            operations=operations,
+            ops_per_second=operations / seconds if seconds > 0 else float("inf"),
+        )
+    results.append(entry)
+
+
+def _prediction_model(one_d_funcs, num_dimensions, num_terms, X_data, y_data):
+    """Fits the last `num_terms` ND bases that are finite on `X_data`.
+
+    The highest basis ids are mixed terms, exercising logs, powers and
+    factorials. Returns the fitted estimator and its basis functions.
+    """
+    from sklearn.linear_model import LinearRegression
+
+    basis_functions, columns = [], []
+    for i in reversed(range(len(one_d_funcs) ** num_dimensions)):
+        func = get_nd_basis_function(i, one_d_funcs, num_dimensions)
+        column = func(*X_data.T)
+        if np.isfinite(column).all():
+            basis_functions.append(func)
+            columns.append(column)
+            if len(columns) == num_terms:
+                break
+    model = LinearRegression().fit(np.column_stack(columns), y_data)
+    return model, basis_functions
+
+
+def benchmark_case(
+    num_dimensions,
+    constant_set,
+    num_rows,
+    repeat=3,
+    max_cells=2 * 10**7,
+    max_combinations=10**6,
+    num_threads=4,
+):
+    """Benchmarks every search hot path for one dataset and basis configuration."""
+    num_terms, p_values, q_values, X_values = CONSTANT_SETS[constant_set]
+    case = {
+        "dimensions": num_dimensions,
+        "constants": constant_set,
+        "rows": num_rows,
+    }
+    results = []
+    one_d_funcs = list(generate_1d_basis_functions(p_values, q_values, X_values))
+    codes = nd_basis_codes(len(one_d_funcs), num_dimensions)
+    num_columns = len(codes)
+    total_combinations = n_choose_k(num_columns, num_terms)
+
+    start = total_combinations // 2
+    stop = min(start + ENUMERATED_COMBINATIONS, total_combinations)
+    seconds = time_call(
+        lambda: sum(1 for _ in iter_combinations(num_columns, num_terms, start, stop)),
+        repeat,
+    )
+    _record(results, "combination_enumeration", case, seconds, stop - start)
+
+    X_data, y_data = make_dataset(num_rows, num_dimensions)
+    model, basis_functions = _prediction_model(
+        one_d_funcs, num_dimensions, num_terms, X_data, y_data
+    )
+    seconds = time_call(
+        lambda: model.predict(np.column_stack([f(*X_data.T) for f in basis_functions])),
+        repeat,
+    )
+    _record(results, "predict_basis_functions", case, seconds, num_rows)
+    compiled = CompiledModel.from_estimator(model, basis_functions)
+    seconds = time_call(lambda: predict(compiled, X_data), repeat)
+    _record(results, "predict_compiled", case, seconds, num_rows)
+
+    if num_columns * num_rows > max_cells:
+        reason = f"basis matrix has {num_columns * num_rows} cells"
+        for name in [
+            "basis_evaluation",
+            "design_matrix",
+            "fit_sklearn",
+            "gram_statistics",
+            "fit_gram",
+            "fit_batched",
+            "fit_incremental",
+            "end_to_end",
+        ]:
+            _record(results, name, case, skipped=reason)
+        return results
+
+    seconds = time_call(
+        lambda: build_coded_basis_matrix(one_d_funcs, codes, X_data), repeat
+    )
+    _record(results, "basis_evaluation", case, seconds, num_columns)
+    basis_matrix = build_coded_basis_matrix(one_d_funcs, codes, X_data)
+
+    index_array = next(
+        iter_index_batches(
+            iter_combinations(num_columns, num_terms), num_terms, DESIGN_BATCH
+        )
+    )
+    seconds = time_call(lambda: basis_matrix[:, index_array], repeat)
+    _record(results, "design_matrix", case, seconds, len(index_array))
+
+    sklearn_combinations = index_array[:SKLEARN_FITS]
+    seconds = time_call(
+        lambda: [
+            fit_cached_model(c, basis_matrix, y_data) for c in sklearn_combinations
+        ],
+        repeat,
+    )
+    _record(results, "fit_sklearn", case, seconds, len(sklearn_combinations))
+
+    if num_columns * num_columns > max_cells:
+        reason = f"Gram matrix has {num_columns * num_columns} cells"
+        for name in [
+            "gram_statistics",
+            "fit_gram",
+            "fit_batched",
+            "fit_incremental",
+            "end_to_end",
+        ]:
+            _record(results, name, case, skipped=reason)
+        return results
+
+    seconds = time_call(lambda: GramStatistics(basis_matrix, y_data), repeat)
+    _record(results, "gram_statistics", case, seconds, num_columns)
+    stats = GramStatistics(basis_matrix, y_data)
+    seconds = time_call(lambda: [stats.error(c) for c in index_array], repeat)
+    _record(results, "fit_gram", case, seconds, len(index_array))
+    seconds = time_call(lambda: stats.batch_errors(index_array), repeat)
+    _record(results, "fit_batched", case, seconds, len(index_array))
+    revolving_array = next(
+        iter_index_batches(
+            iter_revolving_door(num_columns, num_terms), num_terms, DESIGN_BATCH
+        )
+    )
+    seconds = time_call(
+        lambda: IncrementalSolver(stats).batch_errors(revolving_array), repeat
+    )
+    _record(results, "fit_incremental", case, seconds, len(revolving_array))
+
+    if total_combinations > max_combinations:
+        _record(
+            results,
+            "end_to_end",
+            case,
+            skipped=f"grid has {total_combinations} combinations",
+        )
+        return results
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        data_path = os.path.join(tmp_dir, "data.csv")
+        np.savetxt(
+            data_path,
+            np.column_stack([X_data, y_data]),
+            delimiter=",",
+            header=",".join([f"x{i}" for i in range(num_dimensions)] + ["y"]),
+            comments="",
+        )
+
+        def run_search():
+            with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(
+                io.StringIO()
+            ):
+                find_best_model(
+                    data_path,
+                    num_terms,
+                    p_values,
+                    q_values,
+                    X_values,
+                    num_threads=num_threads,
+                    solver="batched",
+                )
+
+        seconds = time_call(run_search, 1)
+    _record(results, "end_to_end", case, seconds, total_combinations)
+    return results
+
+
+def benchmark_startup(repeat=3):
+    """Times cold starts of the command-line entry points in fresh interpreters."""
+    case = {"dimensions": 0, "constants": "-", "rows": 0}
+    results = []
+    for name, args in STARTUP_COMMANDS.items():
+        seconds = time_call(
+            lambda: subprocess.run(
+                [sys.executable, *args], check=True, stdout=subprocess.DEVNULL
+            ),
+            repeat,
+        )
+        _record(results, name, case, seconds, 1)
+    return results
+
+
+def run_benchmarks(dimensions, constant_sets, sizes, **kwargs):
+    """Benchmarks every combination of dimensions, constant sets and sizes."""
+    results = benchmark_startup(kwargs.get("repeat", 3))
+    for num_dimensions in dimensions:
+        for constant_set in constant_sets:
+            for num_rows in sizes:
+                results.extend(
+                    benchmark_case(num_dimensions, constant_set, num_rows, **kwargs)
+                )
+    return {
+        "metadata": {
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "results": results,
+    }
+
+
+def _result_key(result):
+    return (result["name"], result["dimensions"], result["constants"], result["rows"])
+
+
+def compare_results(report, baseline, tolerance):
+    """Returns the benchmarks that got slower than the baseline by over `tolerance`."""
+    baseline_seconds = {
+        _result_key(result): result["seconds"]
+        for result in baseline["results"]
+        if "seconds" in result
+    }
+    regressions = []
+    for result in report["results"]:
+        previous = baseline_seconds.get(_result_key(result))
+        if previous is None or "seconds" not in result:
+            continue
+        if result["seconds"] > previous * (1 + tolerance):
+            regressions.append(dict(result, baseline_seconds=previous))
+    return regressions
+
+
+def _print_report(report):
+    """Prints one line per benchmark result."""
+    for result in report["results"]:
+        label = (
+            f"{result['name']:<24} d={result['dimensions']} "
+            f"{result['constants']:<7} rows={result['rows']:<8}"
+        )
+        if "skipped" in result:
+            print(f"{label} skipped: {result['skipped']}")
+        else:
+            print(
+                f"{label} {result['seconds']:.6f}s "
+                f"({result['ops_per_second']:.1f} ops/s)"
+            )
+
+
+def _report_regressions(report, baseline_path, tolerance):
+    """Prints the regressions against a baseline file and returns whether any."""
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    regressions = compare_results(report, baseline, tolerance)
+    for result in regressions:
+        print(
+            f"REGRESSION {result['name']} d={result['dimensions']} "
+            f"{result['constants']} rows={result['rows']}: "
+            f"{result['baseline_seconds']:.6f}s -> {result['seconds']:.6f}s",
+            file=sys.stderr,
+        )
+    return bool(regressions)
+
+
+def _report_over_budget(report, startup_budget):
+    """Prints the cold starts slower than the budget and returns whether any."""
+    over_budget = False
+    for result in report["results"]:
+        if result["name"] in STARTUP_COMMANDS and result["seconds"] > startup_budget:
+            print(
+                f"OVER BUDGET {result['name']}: {result['seconds']:.3f}s > "
+                f"{startup_budget:.3f}s",
+                file=sys.stderr,
+            )
+            over_budget = True
+    return over_budget
+
+
+def main(argv=None):
+    """Main function to run the benchmark suite."""
+    parser = argparse.ArgumentParser(
+        description="Benchmark the model search hot paths."
+    )
+    parser.add_argument(
+        "--dimensions",
+        type=int,
+        nargs="*",
+        default=[1, 2, 3],
+        help="Input dimensionalities to benchmark.",
+    )
+    parser.add_argument(
+        "--constants",
+        type=str,
+        nargs="*",
+        default=list(CONSTANT_SETS),
+        help="Basis configurations to benchmark ('default' and/or 'best').",
+    )
+    parser.add_argument(
+        "--sizes",
+        type=int,
+        nargs="*",
+        default=DEFAULT_SIZES,
+        help="Synthetic dataset sizes (number of rows).",
+    )
+    parser.add_argument(
+        "--repeat",
+        type=int,
+        default=3,
+        help="Number of timed repetitions; the best one is reported.",
+    )
+    parser.add_argument(
+        "--max_cells",
+        type=int,
+        default=2 * 10**7,
+        help="Skip cases whose basis or Gram matrix exceeds this many cells.",
+    )
+    parser.add_argument(
+        "--max_combinations",
+        type=int,
+        default=10**6,
+        help="Skip the end-to-end search for grids larger than this.",
+    )
+    parser.add_argument(
+        "--num_threads",
+        type=int,
+        default=4,
+        help="Number of threads for the end-to-end search.",
+    )
+    parser.add_argument(
+        "--output",
+        type=str,
+        default="benchmark_results.json",
+        help="Path of the JSON file to write the results to.",
+    )
+    parser.add_argument(
+        "--compare",
+        type=str,
+        default=None,
+        help="JSON results of a previous run to check for regressions.",
+    )
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.2,
+        help="Allowed relative slowdown against the --compare baseline.",
+    )
+    parser.add_argument(
+        "--startup_budget",
+        type=float,
+        default=None,
+        help="Fail if a command-line cold start takes longer than this (seconds).",
+    )
+    args = parser.parse_args(argv)
+    for constant_set in args.constants:
+        if constant_set not in CONSTANT_SETS:
+            parser.error(f"Unknown constants '{constant_set}'.")
+
+    report = run_benchmarks(
+        args.dimensions,
+        args.constants,
+        args.sizes,
+        repeat=args.repeat,
+        max_cells=args.max_cells,
+        max_combinations=args.max_combinations,
+        num_threads=args.num_threads,
+    )
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+
+    _print_report(report)
+    failed = False
+    if args.compare is not None:
+        failed = _report_regressions(report, args.compare, args.tolerance)
+    if args.startup_budget is not None:
+        failed = _report_over_budget(report, args.startup_budget) or failed
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
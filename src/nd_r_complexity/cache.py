@@ -0,0 +1,116 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+from .checkpoint import file_digest
+
+DEFAULT_CACHE_MAX_BYTES = 4 * 2**30
+
+
+def default_cache_dir():
+    """Returns the per-user cache directory, honouring XDG_CACHE_HOME."""
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(
+        os.path.expanduser("~"), ".cache"
+    )
+    return os.path.join(base, "nd_r_complexity")
+
+
+class ArrayCache:
+    """A content-addressed on-disk cache of named numpy arrays.
+
+    Each entry is a directory of .npy files, loaded memory-mapped, keyed by
+    the SHA-256 of the data file contents and the parameters that produced
+    it. Entries are written to a temporary directory and renamed into place,
+    so readers never see partial entries. When the cache grows beyond
+    `max_bytes`, the least recently used entries are evicted.
+    """
+
+    def __init__(self, directory, max_bytes=DEFAULT_CACHE_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._digests = {}
+        os.makedirs(directory, exist_ok=True)
+
+    def key(self, data_path, **params):
+        """Returns the entry key for a data file and producing parameters."""
+        if data_path not in self._digests:
+            self._digests[data_path] = file_digest(data_path)
+        description = dict(params, data_sha256=self._digests[data_path])
+        encoded = json.dumps(description, sort_keys=True, default=list)
+        return hashlib.sha256(encoded.encode()).hexdigest()
+
+    def load(self, key):
+        """Returns the entry's arrays memory-mapped, or None on a miss."""
+        entry = os.path.join(self.directory, key)
+        try:
+            names = [name for name in os.listdir(entry) if name.endswith(".npy")]
+            arrays = {
+                name[: -len(".npy")]: np.load(os.path.join(entry, name), mmap_mode="r")
+                for name in names
+            }
+            # The entry's modification time orders it for LRU eviction.
+            os.utime(entry)
+        except OSError:
+            return None
+        return arrays
+
+    def store(self, key, arrays):
+        """Writes an entry, then evicts old entries beyond the size limit."""
+        size = sum(np.asarray(value).nbytes for value in arrays.values())
+        if size > self.max_bytes:
+            return
+        tmp_dir = tempfile.mkdtemp(prefix=".tmp-", dir=self.directory)
+        try:
+            for name, value in arrays.items():
+                np.save(os.path.join(tmp_dir, f"{name}.npy"), value)
+            os.rename(tmp_dir, os.path.join(self.directory, key))
+        except OSError:
+            # Another process stored the same entry first.
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+            return
+        self.evict(keep=key)
+
+    def entries(self):
+        """Returns (key, size in bytes, last use) for every entry."""
+        entries = []
+        for key in os.listdir(self.directory):
+            entry = os.path.join(self.directory, key)
+            if key.startswith(".") or not os.path.isdir(entry):
+                continue
+            try:
+                size = sum(
+                    os.path.getsize(os.path.join(entry, name))
+                    for name in os.listdir(entry)
+                )
+                entries.append((key, size, os.path.getmtime(entry)))
+            except OSError:
+                continue
+        return entries
+
+    def evict(self, keep=None):
+        """Removes least recently used entries until the cache fits its limit."""
+        entries = sorted(self.entries(), key=lambda entry: entry[2])
+        total = sum(size for _, size, _ in entries)
+        for key, size, _ in entries:
+            if total <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            shutil.rmtree(os.path.join(self.directory, key), ignore_errors=True)
+            total -= size
+
+
+def cached_arrays(cache, data_path, compute, **params):
+    """Returns the dict of arrays from `compute()`, through `cache` if given."""
+    if cache is None:
+        return compute()
+    key = cache.key(data_path, **params)
+    arrays = cache.load(key)
+    if arrays is None:
+        arrays = compute()
+        cache.store(key, arrays)
+    return arrays
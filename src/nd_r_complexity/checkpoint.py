@@ -0,0 +1,56 @@
+import hashlib
+import json
+import os
+
+from .top_k import TopK
+
+
+def file_digest(path):
+    """Returns the SHA-256 hex digest of a file's contents."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def search_fingerprint(data_path, **search_params):
+    """Identifies a search by its dataset contents and parameters."""
+    fingerprint = dict(search_params, data_sha256=file_digest(data_path))
+    # Normalize tuples and numbers the same way a JSON round trip would.
+    return json.loads(json.dumps(fingerprint))
+
+
+def default_checkpoint_path(directory, fingerprint):
+    """Returns the checkpoint file within `directory` named after a search."""
+    encoded = json.dumps(fingerprint, sort_keys=True)
+    name = hashlib.sha256(encoded.encode()).hexdigest()
+    return os.path.join(directory, f"{name}.checkpoint.json")
+
+
+def save_checkpoint(path, fingerprint, next_index, best):
+    """Atomically records the first unsearched combination index and the top-K."""
+    state = {
+        "fingerprint": fingerprint,
+        "next_index": next_index,
+        "top_k": [[error, list(indices)] for error, indices in best.items()],
+    }
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(state, f)
+    os.replace(tmp_path, path)
+
+
+def load_checkpoint(path, fingerprint, top_k):
+    """Returns (next_index, TopK) from a checkpoint written for the same search."""
+    with open(path) as f:
+        state = json.load(f)
+    if state["fingerprint"] != fingerprint:
+        raise ValueError(
+            f"Checkpoint {path} was written for a different dataset or search "
+            "parameters."
+        )
+    best = TopK(top_k)
+    for error, indices in state["top_k"]:
+        best.push(error, indices)
+    return state["next_index"], best
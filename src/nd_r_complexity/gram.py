@@ -0,0 +1,424 @@
+import numpy as np
+
+# Normal equations square the condition number of the design matrix, so
+# sub-systems worse than this are re-solved with least squares.
+MAX_CONDITION_NUMBER = 1e8
+# Incrementally updated factors are recomputed after this many updates to
+# bound the accumulated rounding error.
+REFACTOR_INTERVAL = 1000
+# Gram-sized arrays larger than this are not formed; the sub-Grams of each
+# batch are computed from the normalized columns instead.
+MAX_GRAM_BYTES = 2**30
+# Bounds the (rows, combinations, terms) arrays gathered for those sub-Grams.
+SUB_GRAM_BATCH_CELLS = 2**22
+
+
+def gram_fits(num_columns, count=1):
+    """Returns whether `count` float64 Gram matrices fit in `MAX_GRAM_BYTES`."""
+    return count * num_columns * num_columns * 8 <= MAX_GRAM_BYTES
+
+
+def column_sub_grams(columns, index_array):
+    """Returns the (batch, k, k) cross-products of column subsets of `columns`.
+
+    The subsets are gathered a few at a time, so memory stays bounded by
+    `SUB_GRAM_BATCH_CELLS` whatever the number of rows.
+    """
+    index_array = np.asarray(index_array, dtype=np.intp)
+    num_terms = index_array.shape[1]
+    step = max(1, SUB_GRAM_BATCH_CELLS // max(len(columns) * num_terms, 1))
+    sub_grams = np.empty((len(index_array), num_terms, num_terms))
+    for start in range(0, len(index_array), step):
+        gathered = columns[:, index_array[start : start + step]]
+        sub_grams[start : start + step] = np.einsum("nbi,nbj->bij", gathered, gathered)
+    return sub_grams
+
+
+class LinearModel:
+    """A fitted linear model exposing the subset of the sklearn API we rely on."""
+
+    def __init__(self, coef, intercept):
+        self.coef_ = np.asarray(coef, dtype=np.float64)
+        self.intercept_ = float(intercept)
+
+    def predict(self, X):
+        return np.asarray(X, dtype=np.float64) @ self.coef_ + self.intercept_
+
+
+class GramStatistics:
+    """Centered normal-equation statistics over every cached basis column.
+
+    Columns are scaled to their maximum absolute value, centered and then
+    normalized to unit length, so the Gram matrix is the column correlation
+    matrix. Columns holding NaN or infinite values are marked invalid.
+    With `with_gram=False`, or when it would exceed `MAX_GRAM_BYTES`, the
+    quadratic-size Gram matrix is not formed: sub-Grams are computed from
+    the normalized columns and ill-conditioned subsets are solved by least
+    squares on them.
+
+    With per-row `weights`, columns and y are centered by their weighted
+    means and rows are scaled by the square root of the weights, so every
+    subset is solved and scored exactly as without weights, and errors are
+    weighted MSEs. Weights are rescaled to average one.
+    """
+
+    def __init__(self, basis_matrix, y_data, with_gram=True, weights=None):
+        basis_matrix = np.asarray(basis_matrix, dtype=np.float64)
+        y_data = np.asarray(y_data, dtype=np.float64)
+        self.num_samples = len(y_data)
+        self.valid = np.isfinite(basis_matrix).all(axis=0)
+
+        columns = np.where(self.valid, basis_matrix, 0.0)
+        self.amplitude = np.abs(columns).max(axis=0, initial=0.0)
+        self.amplitude[self.amplitude == 0] = 1.0
+        columns = columns / self.amplitude
+        if weights is None:
+            self.mean = columns.mean(axis=0)
+            columns -= self.mean
+            self.y_mean = y_data.mean()
+            self.y_centered = y_data - self.y_mean
+        else:
+            weights = np.asarray(weights, dtype=np.float64)
+            weights = weights * (len(weights) / weights.sum())
+            self.mean = weights @ columns / len(weights)
+            root_weights = np.sqrt(weights)
+            columns -= self.mean
+            columns *= root_weights[:, None]
+            self.y_mean = weights @ y_data / len(weights)
+            self.y_centered = (y_data - self.y_mean) * root_weights
+        self.norm = np.linalg.norm(columns, axis=0)
+        self.norm[self.norm == 0] = 1.0
+        self.centered = np.asfortranarray(columns / self.norm)
+
+        with_gram = with_gram and gram_fits(self.centered.shape[1])
+        self.gram = self.centered.T @ self.centered if with_gram else None
+        self.moment = self.centered.T @ self.y_centered
+        self.total_sum_of_squares = float(self.y_centered @ self.y_centered)
+
+    @classmethod
+    def from_moments(
+        cls,
+        num_samples,
+        amplitude,
+        mean,
+        comoment,
+        cross_moment,
+        y_mean,
+        y_sum_of_squares,
+        valid,
+    ):
+        """Builds the statistics from the moments of max-scaled columns.
+
+        `mean`, `comoment` and `cross_moment` are the column means, centered
+        cross-products and centered products with y of the columns divided by
+        `amplitude`. No columns are kept, so ill-conditioned subsets are
+        solved by least squares on the Gram matrix itself.
+        """
+        stats = cls.__new__(cls)
+        stats.num_samples = num_samples
+        stats.valid = np.asarray(valid, dtype=bool)
+        stats.amplitude = np.where(amplitude == 0, 1.0, amplitude)
+        stats.mean = np.asarray(mean, dtype=np.float64)
+        stats.norm = np.sqrt(np.diagonal(comoment))
+        stats.norm[stats.norm == 0] = 1.0
+        stats.centered = None
+        stats.y_mean = float(y_mean)
+        stats.y_centered = None
+        stats.gram = comoment / stats.norm / stats.norm[:, None]
+        stats.moment = cross_moment / stats.norm
+        stats.total_sum_of_squares = float(y_sum_of_squares)
+        return stats
+
+    def arrays(self):
+        """Returns the statistics as a dict of arrays, e.g. for caching."""
+        return {name: value for name, value in vars(self).items() if value is not None}
+
+    @classmethod
+    def from_arrays(cls, arrays):
+        """Rebuilds the statistics from the output of `arrays`."""
+        stats = cls.__new__(cls)
+        for name in (
+            "num_samples",
+            "valid",
+            "amplitude",
+            "mean",
+            "norm",
+            "centered",
+            "y_mean",
+            "y_centered",
+            "gram",
+            "moment",
+            "total_sum_of_squares",
+        ):
+            value = arrays.get(name)
+            if value is not None and np.ndim(value) == 0:
+                value = np.asarray(value).item()
+            setattr(stats, name, value)
+        return stats
+
+    def sub_grams(self, index_array):
+        """Returns the (batch, k, k) sub-Gram matrices of a (batch, k) index array."""
+        index_array = np.asarray(index_array, dtype=np.intp)
+        if self.gram is not None:
+            return self.gram[index_array[:, :, None], index_array[:, None, :]]
+        return column_sub_grams(self.centered, index_array)
+
+    def cross_products(self, column_indices, column):
+        """Returns the Gram entries between `column_indices` and one column."""
+        if self.gram is not None:
+            return self.gram[column_indices, column]
+        return self.centered[:, column_indices].T @ self.centered[:, column]
+
+    def solve(self, column_indices):
+        """Returns the normalized coefficients and residual sum of squares."""
+        column_indices = list(column_indices)
+        if self.gram is not None:
+            sub_gram = self.gram[np.ix_(column_indices, column_indices)]
+            sub_moment = self.moment[column_indices]
+            if np.linalg.cond(sub_gram) < MAX_CONDITION_NUMBER:
+                coef = np.linalg.solve(sub_gram, sub_moment)
+                rss = self.total_sum_of_squares - sub_moment @ coef
+                return coef, max(float(rss), 0.0)
+            if self.centered is None:
+                # Gram entries carry rounding errors around 1e-16, so smaller
+                # relative singular values are treated as exact collinearity.
+                coef = np.linalg.lstsq(sub_gram, sub_moment, rcond=1e-12)[0]
+                rss = self.total_sum_of_squares - sub_moment @ coef
+                return coef, max(float(rss), 0.0)
+        coef = np.linalg.lstsq(
+            self.centered[:, column_indices], self.y_centered, rcond=None
+        )[0]
+        residual = self.y_centered - self.centered[:, column_indices] @ coef
+        rss = residual @ residual
+        return coef, max(float(rss), 0.0)
+
+    def error(self, column_indices):
+        """Returns the MSE of a combination of cached columns."""
+        if not self.valid[list(column_indices)].all():
+            return float("inf")
+        return self.solve(column_indices)[1] / self.num_samples
+
+    def batch_errors(self, index_array):
+        """Returns the MSE of every combination in a (batch, k) index array."""
+        index_array = np.asarray(index_array, dtype=np.intp)
+        errors = np.full(len(index_array), np.inf)
+        valid = self.valid[index_array].all(axis=1)
+        rows = index_array[valid]
+        if not len(rows):
+            return errors
+
+        sub_gram = self.sub_grams(rows)
+        sub_moment = self.moment[rows]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            well_conditioned = np.linalg.cond(sub_gram) < MAX_CONDITION_NUMBER
+        rss = np.empty(len(rows))
+        coef = np.linalg.solve(
+            sub_gram[well_conditioned], sub_moment[well_conditioned][..., None]
+        )[..., 0]
+        rss[well_conditioned] = self.total_sum_of_squares - np.einsum(
+            "ij,ij->i", sub_moment[well_conditioned], coef
+        )
+        rss[~well_conditioned] = self._batch_lstsq_rss(rows[~well_conditioned])
+
+        errors[valid] = np.maximum(rss, 0.0) / self.num_samples
+        return errors
+
+    def to_linear_model(self, column_indices, coef):
+        """Maps normalized coefficients back onto the raw basis columns."""
+        column_indices = list(column_indices)
+        scale = self.amplitude[column_indices] * self.norm[column_indices]
+        intercept = self.y_mean - np.sum(
+            coef * self.mean[column_indices] / self.norm[column_indices]
+        )
+        return LinearModel(coef / scale, intercept)
+
+    def _batch_lstsq_rss(self, rows):
+        """Residual sums of squares from a batched SVD of the centered columns."""
+        if not len(rows):
+            return np.empty(0)
+        if self.centered is None:
+            return np.array([self.solve(row)[1] for row in rows])
+        design = np.moveaxis(self.centered[:, rows], 0, 1)
+        u, singular_values, _ = np.linalg.svd(design, full_matrices=False)
+        # Same cutoff as np.linalg.lstsq(rcond=None) for each sub-system.
+        cutoff = (
+            np.finfo(np.float64).eps * max(design.shape[1:]) * singular_values[:, :1]
+        )
+        projection = np.einsum("bnk,n->bk", u, self.y_centered)
+        projection[singular_values <= cutoff] = 0.0
+        explained = np.sum(projection**2, axis=1)
+        return self.total_sum_of_squares - explained
+
+    def fit(self, column_indices):
+        """Fits a combination of cached columns, mirroring `fit_cached_model`."""
+        if not self.valid[list(column_indices)].all():
+            return float("inf"), None, None
+        coef, rss = self.solve(column_indices)
+        model = self.to_linear_model(column_indices, coef)
+        return rss / self.num_samples, model, column_indices
+
+
+class MomentAccumulator:
+    """Accumulates the moments of basis columns over chunks of rows.
+
+    Columns are kept scaled to their running maximum absolute value, and the
+    per-chunk means and centered cross-products are merged with the pairwise
+    update of Chan et al., which stays accurate when a column's mean is large
+    compared to its spread. Columns with non-finite values in any chunk are
+    marked invalid and left out of the sums.
+    """
+
+    def __init__(self, num_columns):
+        self.num_samples = 0
+        self.valid = np.ones(num_columns, dtype=bool)
+        self.amplitude = np.zeros(num_columns)
+        self.mean = np.zeros(num_columns)
+        self.comoment = np.zeros((num_columns, num_columns))
+        self.cross_moment = np.zeros(num_columns)
+        self.y_mean = 0.0
+        self.y_sum_of_squares = 0.0
+
+    def update(self, basis_chunk, y_chunk):
+        """Adds a chunk of basis matrix rows and their targets."""
+        y_chunk = np.asarray(y_chunk, dtype=np.float64)
+        chunk_size = len(y_chunk)
+        if not chunk_size:
+            return
+        finite = np.isfinite(basis_chunk).all(axis=0)
+        self.valid &= finite
+        basis_chunk = np.where(finite, basis_chunk, 0.0)
+
+        amplitude = np.maximum(self.amplitude, np.abs(basis_chunk).max(axis=0))
+        # Rescale what was accumulated so far to the new amplitudes.
+        ratio = np.ones_like(amplitude)
+        grown = (self.amplitude > 0) & (amplitude > self.amplitude)
+        ratio[grown] = self.amplitude[grown] / amplitude[grown]
+        self.comoment *= ratio
+        self.comoment *= ratio[:, None]
+        self.mean *= ratio
+        self.cross_moment *= ratio
+        self.amplitude = amplitude
+        basis_chunk = basis_chunk / np.where(amplitude == 0, 1.0, amplitude)
+
+        mean = basis_chunk.mean(axis=0)
+        y_mean = y_chunk.mean()
+        centered = basis_chunk - mean
+        y_centered = y_chunk - y_mean
+        total = self.num_samples + chunk_size
+        weight = self.num_samples * chunk_size / total
+        delta = mean - self.mean
+        y_delta = y_mean - self.y_mean
+        self.comoment += centered.T @ centered
+        if weight:
+            self.comoment += weight * np.outer(delta, delta)
+        self.cross_moment += centered.T @ y_centered + weight * delta * y_delta
+        self.y_sum_of_squares += y_centered @ y_centered + weight * y_delta**2
+        self.mean += delta * chunk_size / total
+        self.y_mean += y_delta * chunk_size / total
+        self.num_samples = total
+
+    def statistics(self, column_indices):
+        """Returns `GramStatistics` over the given accumulated columns."""
+        column_indices = np.asarray(column_indices, dtype=np.intp)
+        return GramStatistics.from_moments(
+            self.num_samples,
+            self.amplitude[column_indices],
+            self.mean[column_indices],
+            self.comoment[np.ix_(column_indices, column_indices)],
+            self.cross_moment[column_indices],
+            self.y_mean,
+            self.y_sum_of_squares,
+            self.valid[column_indices],
+        )
+
+
+class IncrementalSolver:
+    """Scores a sequence of combinations by updating a triangular factor.
+
+    Keeps the upper-triangular R with R'R equal to the current sub-Gram
+    matrix and z = R'^-1 m, so the RSS is the total sum of squares minus
+    |z|^2. When consecutive combinations differ by one column, as in the
+    revolving-door order, the old column is removed with Givens rotations
+    and the new one appended with a triangular solve, in O(k^2) instead of
+    refactoring. Ill-conditioned subsets fall back to `GramStatistics.error`.
+    """
+
+    def __init__(self, stats):
+        self.stats = stats
+        self.num_samples = stats.num_samples
+        self.columns = None
+        self.factor = None
+        self.z = None
+        self.updates = 0
+
+    def _rebuild(self, column_indices):
+        self.columns = []
+        self.factor = np.zeros((0, 0))
+        self.z = np.zeros(0)
+        self.updates = 0
+        return all(self._append(column) for column in column_indices)
+
+    def _append(self, column):
+        size = len(self.columns)
+        cross = self.stats.cross_products(self.columns, column)
+        if size:
+            # scipy is slow to import and only needed by this solver.
+            from scipy.linalg import solve_triangular
+
+            r = solve_triangular(self.factor, cross, trans="T", check_finite=False)
+        else:
+            r = cross
+        pivot = self.stats.cross_products([column], column)[0] - r @ r
+        if pivot < 1 / MAX_CONDITION_NUMBER:
+            self.columns = None
+            return False
+        pivot = np.sqrt(pivot)
+        factor = np.zeros((size + 1, size + 1))
+        factor[:size, :size] = self.factor
+        factor[:size, size] = r
+        factor[size, size] = pivot
+        self.factor = factor
+        self.z = np.append(self.z, (self.stats.moment[column] - r @ self.z) / pivot)
+        self.columns.append(column)
+        return True
+
+    def _remove(self, position):
+        factor = np.delete(self.factor, position, axis=1)
+        z = self.z.copy()
+        for i in range(position, len(z) - 1):
+            a, b = factor[i, i], factor[i + 1, i]
+            h = np.hypot(a, b)
+            c, s = a / h, b / h
+            upper, lower = factor[i, i:].copy(), factor[i + 1, i:]
+            factor[i, i:] = c * upper + s * lower
+            factor[i + 1, i:] = c * lower - s * upper
+            z[i], z[i + 1] = c * z[i] + s * z[i + 1], c * z[i + 1] - s * z[i]
+        self.factor = factor[:-1]
+        self.z = z[:-1]
+        del self.columns[position]
+
+    def error(self, column_indices):
+        """Returns the MSE of a combination, updating from the previous one."""
+        column_indices = [int(column) for column in column_indices]
+        if not self.stats.valid[column_indices].all():
+            return float("inf")
+        if self.columns is None or self.updates >= REFACTOR_INTERVAL:
+            ok = self._rebuild(column_indices)
+        else:
+            current = set(self.columns)
+            removed = current.difference(column_indices)
+            added = set(column_indices).difference(current)
+            if len(removed) == 1 and len(added) == 1:
+                self._remove(self.columns.index(removed.pop()))
+                ok = self._append(added.pop())
+                self.updates += 1
+            else:
+                ok = self._rebuild(column_indices)
+        if not ok:
+            return self.stats.error(column_indices)
+        rss = self.stats.total_sum_of_squares - self.z @ self.z
+        return max(float(rss), 0.0) / self.stats.num_samples
+
+    def batch_errors(self, index_array):
+        """Returns the MSE of every combination in order, like `batch_errors`."""
+        return np.array([self.error(row) for row in index_array], dtype=np.float64)
@@ -1,5 +1,102 @@
-import pandas as pd
+import os
+
+import numpy as np
 
 
 def load_data(data_path):
+    """Reads a whole data file; the last column is the target.
+
+    CSV files are read with pandas, and .npy, Parquet or Arrow IPC files as
+    in `iter_data_chunks`, all into a DataFrame.
+    """
+    # pandas is imported on first use to keep the command-line startup fast.
+    import pandas as pd
+
+    extension = os.path.splitext(data_path)[1].lower()
+    if extension == ".npy":
+        return pd.DataFrame(np.load(data_path))
+    if extension in (".parquet", ".pq"):
+        return _import_pyarrow().parquet.read_table(data_path).to_pandas()
+    if extension in (".arrow", ".feather"):
+        pyarrow = _import_pyarrow()
+        reader = pyarrow.ipc.open_file(pyarrow.memory_map(data_path))
+        return reader.read_all().to_pandas()
     return pd.read_csv(data_path)
+
+
+def split_row_weights(data, weights):
+    """Returns the data without its weight column, and the per-row weights.
+
+    `weights` is None for an unweighted fit, "relative" for 1/y^2 weights,
+    which make the objective the squared relative error, or the name of a
+    data column holding non-negative weights.
+    """
+    if weights is None:
+        return data, None
+    if weights == "relative":
+        y_data = data.iloc[:, -1].values.astype(np.float64)
+        if np.any(y_data == 0):
+            raise ValueError("Relative error weights require non-zero targets.")
+        row_weights = 1.0 / y_data**2
+    elif weights in data.columns:
+        row_weights = data[weights].values.astype(np.float64)
+        data = data.drop(columns=weights)
+    else:
+        raise ValueError(
+            f"Invalid weights '{weights}'. Choose 'relative' or a data column."
+        )
+    if not np.isfinite(row_weights).all() or np.any(row_weights < 0):
+        raise ValueError("Row weights must be finite and non-negative.")
+    if not row_weights.sum() > 0:
+        raise ValueError("At least one row weight must be positive.")
+    return data, row_weights
+
+
+def _split_target(values):
+    values = np.asarray(values, dtype=np.float64)
+    return values[:, :-1], values[:, -1]
+
+
+def _import_pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.ipc
+        import pyarrow.parquet
+    except ImportError as error:
+        raise ImportError(
+            "Reading Parquet or Arrow files requires pyarrow "
+            "(pip install nd_r_complexity[parquet])."
+        ) from error
+    return pyarrow
+
+
+def iter_data_chunks(data_path, chunksize):
+    """Yields (X, y) float64 chunks of at most `chunksize` rows.
+
+    CSV files are parsed incrementally, .npy files are memory-mapped and
+    Parquet or Arrow IPC (.arrow, .feather) files are read batch by batch
+    with pyarrow, so only one chunk is held in memory. As with `load_data`,
+    the last column is the target.
+    """
+    extension = os.path.splitext(data_path)[1].lower()
+    if extension == ".npy":
+        data = np.load(data_path, mmap_mode="r")
+        for start in range(0, len(data), chunksize):
+            yield _split_target(data[start : start + chunksize])
+    elif extension in (".parquet", ".pq"):
+        pyarrow = _import_pyarrow()
+        parquet_file = pyarrow.parquet.ParquetFile(data_path)
+        for batch in parquet_file.iter_batches(batch_size=chunksize):
+            yield _split_target(batch.to_pandas().values)
+    elif extension in (".arrow", ".feather"):
+        pyarrow = _import_pyarrow()
+        reader = pyarrow.ipc.open_file(pyarrow.memory_map(data_path))
+        for i in range(reader.num_record_batches):
+            batch = reader.get_batch(i)
+            for start in range(0, batch.num_rows, chunksize):
+                yield _split_target(batch.slice(start, chunksize).to_pandas().values)
+    else:
+        import pandas as pd
+
+        for frame in pd.read_csv(data_path, chunksize=chunksize):
+            yield _split_target(frame.values)
@@ -1,9 +1,22 @@
 import argparse
+import os
 from nd_r_complexity.model_search import find_best_model
 from nd_r_complexity import constants
+from nd_r_complexity.cache import DEFAULT_CACHE_MAX_BYTES, default_cache_dir
 
 
-def main():
+def parse_shard(value):
+    """Parses a shard given as 'i/N' into an (index, count) tuple."""
+    try:
+        index, count = (int(part) for part in value.split("/"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Invalid shard '{value}', expected i/N.")
+    if not 0 <= index < count:
+        raise argparse.ArgumentTypeError(f"Shard index must be in [0, {count}).")
+    return index, count
+
+
+def main(argv=None):
     """Main function to run the grid search."""
     parser = argparse.ArgumentParser(
         description="Find the best complexity model for a given dataset."
@@ -19,7 +32,18 @@ def main():
         "--search_strategy",
         type=str,
         default="grid",
-        help="Search strategy to use ('grid' or 'random').",
+        help="Search strategy to use ('grid', 'random', 'stepwise' or 'bnb').",
+    )
+    parser.add_argument(
+        "--stepwise_method",
+        type=str,
+        default="forward",
+        help="Term selection rule of the stepwise strategy ('forward' or 'omp').",
+    )
+    parser.add_argument(
+        "--backward",
+        action="store_true",
+        help="Follow every stepwise addition with floating backward pruning.",
     )
     parser.add_argument(
         "--num_samples",
@@ -27,6 +51,12 @@ def main():
         default=100,
         help="Number of samples to use for random search.",
     )
+    parser.add_argument(
+        "--seed",
+        type=int,
+        default=None,
+        help="Random seed for reproducible random search.",
+    )
     parser.add_argument(
         "--num_terms",
         type=int,
@@ -54,16 +84,193 @@ def main():
         default=constants.DEFAULT_X_VALUES,
         help="A list of values for the base of the exponential terms (e.g., 2 10).",
     )
-    args = parser.parse_args()
+    parser.add_argument(
+        "--solver",
+        type=str,
+        default="sklearn",
+        help="Fitting engine to use ('sklearn', 'gram', 'batched' or "
+        "'incremental', which updates a factorization along a revolving-door "
+        "order and only supports grid search; it scores one combination at a "
+        "time and is much slower than 'batched'). Stepwise and bnb search "
+        "always fit with Gram statistics.",
+    )
+    parser.add_argument(
+        "--criterion",
+        type=str,
+        default="mse",
+        help="Model selection criterion ('mse', 'aic', 'bic', 'cv' for k-fold "
+        "cross-validation or 'loo' for leave-one-out; cv and loo require the "
+        "gram or batched solver, and grid search with aic or bic also tries "
+        "fewer terms).",
+    )
+    parser.add_argument(
+        "--cv_folds",
+        type=int,
+        default=5,
+        help="Number of folds for the cv criterion.",
+    )
+    parser.add_argument(
+        "--weights",
+        type=str,
+        default=None,
+        help="Weight the least-squares objective per row: 'relative' fits the "
+        "relative error (1/y^2 weights), any other value names a data column "
+        "holding the weights.",
+    )
+    parser.add_argument(
+        "--log_space",
+        action="store_true",
+        help="Evaluate bases in the log domain with per-column normalization, "
+        "so exponential and factorial terms stay finite on large inputs.",
+    )
+    parser.add_argument(
+        "--prune_equivalent",
+        action="store_true",
+        help="Keep one basis column per class of identical or collinear columns "
+        "(e.g. n^1 * n^2 and n^3).",
+    )
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="Read the data in chunks and keep only the basis column moments "
+        "(CSV, .npy, Parquet or Arrow; requires a Gram-based solver).",
+    )
+    parser.add_argument(
+        "--chunksize",
+        type=int,
+        default=100000,
+        help="Number of rows per chunk when streaming.",
+    )
+    parser.add_argument(
+        "--cache_dir",
+        type=str,
+        default=default_cache_dir(),
+        help="Directory caching evaluated basis matrices and Gram statistics.",
+    )
+    parser.add_argument(
+        "--cache_size_mb",
+        type=int,
+        default=DEFAULT_CACHE_MAX_BYTES // 2**20,
+        help="Size limit of the cache; least recently used entries are evicted.",
+    )
+    parser.add_argument(
+        "--no_cache",
+        action="store_true",
+        help="Neither read nor write the on-disk cache.",
+    )
+    parser.add_argument(
+        "--output",
+        type=str,
+        default=None,
+        help="Write the ranked models, search parameters and statistics to "
+        "this file (JSON, or a compact numpy archive if it ends in .npz).",
+    )
+    parser.add_argument(
+        "--quiet",
+        action="store_true",
+        help="Suppress progress bars and printed results.",
+    )
+    parser.add_argument(
+        "--metrics_out",
+        type=str,
+        default=None,
+        help="Write per-phase timings, throughput, fit counts and peak memory "
+        "to this JSON file.",
+    )
+    parser.add_argument(
+        "--profile",
+        type=str,
+        nargs="*",
+        default=[],
+        help="Phases to run under cProfile (e.g. basis_evaluation "
+        "gram_statistics search refit).",
+    )
+    parser.add_argument(
+        "--profile_dir",
+        type=str,
+        default=".",
+        help="Directory for the <phase>.prof files written by --profile.",
+    )
+    parser.add_argument(
+        "--batch_size",
+        type=int,
+        default=4096,
+        help="Number of combinations per task (solved in one call by the batched solver).",
+    )
+    parser.add_argument(
+        "--top_k",
+        type=int,
+        default=1,
+        help="Number of best combinations to keep and report, ranked by the "
+        "selection criterion.",
+    )
+    parser.add_argument(
+        "--chunk_size",
+        type=int,
+        default=None,
+        help="Number of combinations per worker range (default: split evenly).",
+    )
+    parser.add_argument(
+        "--shard",
+        type=parse_shard,
+        default=None,
+        help="Only search shard i of N equal slices of the grid (e.g. 0/4).",
+    )
+    parser.add_argument(
+        "--checkpoint",
+        type=str,
+        default=None,
+        help="File to periodically save grid search progress to (default: a "
+        "file named after the search in <cache_dir>/checkpoints, removed once "
+        "the search completes).",
+    )
+    parser.add_argument(
+        "--checkpoint_interval",
+        type=float,
+        default=60.0,
+        help="Minimum number of seconds between checkpoint writes.",
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Continue an interrupted grid search from its checkpoint file.",
+    )
+    args = parser.parse_args(argv)
     find_best_model(
         args.data_path,
         num_threads=args.num_threads,
         search_strategy=args.search_strategy,
         num_samples=args.num_samples,
+        stepwise_method=args.stepwise_method,
+        backward=args.backward,
+        seed=args.seed,
         num_terms=args.num_terms,
         p_values=args.p_values,
         q_values=args.q_values,
         X_values=args.X_values,
+        solver=args.solver,
+        log_space=args.log_space,
+        prune_equivalent=args.prune_equivalent,
+        criterion=args.criterion,
+        cv_folds=args.cv_folds,
+        weights=args.weights,
+        stream=args.stream,
+        chunksize=args.chunksize,
+        cache_dir=None if args.no_cache else args.cache_dir,
+        cache_max_bytes=args.cache_size_mb * 2**20,
+        metrics_out=args.metrics_out,
+        output=args.output,
+        quiet=args.quiet,
+        profile_phases=args.profile,
+        profile_dir=args.profile_dir,
+        batch_size=args.batch_size,
+        top_k=args.top_k,
+        chunk_size=args.chunk_size,
+        shard=args.shard,
+        checkpoint_path=args.checkpoint,
+        resume=args.resume,
+        checkpoint_interval=args.checkpoint_interval,
+        checkpoint_dir=os.path.join(args.cache_dir, "checkpoints"),
     )
 
 
@@ -0,0 +1,109 @@
+import cProfile
+import json
+import os
+import sys
+import time
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:  # Not available on Windows.
+    resource = None
+
+
+def peak_memory():
+    """Returns the peak resident set sizes of this process and reaped children."""
+    if resource is None:
+        return {"self_bytes": None, "children_bytes": None}
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS.
+    unit = 1 if sys.platform == "darwin" else 1024
+    return {
+        "self_bytes": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * unit,
+        "children_bytes": resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * unit,
+    }
+
+
+class Metrics:
+    """Collects per-phase timings, counters and peak memory of a search run.
+
+    Phases accumulate wall-clock and CPU seconds of this process; phases
+    named in `profile_phases` also run under cProfile, with the stats dumped
+    to `<profile_dir>/<phase>.prof` for inspection with pstats or snakeviz.
+    """
+
+    def __init__(self, profile_phases=(), profile_dir="."):
+        self.phases = {}
+        self.counters = {}
+        self.profile_phases = set(profile_phases)
+        self.profile_dir = profile_dir
+        self.num_workers = None
+        self._profiling = False
+
+    @contextmanager
+    def phase(self, name):
+        """Times the enclosed block as (one call of) the phase `name`."""
+        # Only one profiler can be active, so phases nested in a profiled
+        # phase are covered by its profile.
+        profiler = None
+        if name in self.profile_phases and not self._profiling:
+            profiler = cProfile.Profile()
+            self._profiling = True
+        wall_start, cpu_start = time.perf_counter(), time.process_time()
+        if profiler is not None:
+            profiler.enable()
+        try:
+            yield
+        finally:
+            if profiler is not None:
+                profiler.disable()
+                self._profiling = False
+                os.makedirs(self.profile_dir, exist_ok=True)
+                profiler.dump_stats(os.path.join(self.profile_dir, f"{name}.prof"))
+            self.add_time(
+                name,
+                time.perf_counter() - wall_start,
+                time.process_time() - cpu_start,
+            )
+
+    def add_time(self, name, wall_seconds, cpu_seconds=None, calls=1):
+        """Adds externally measured seconds, e.g. from worker processes."""
+        phase = self.phases.setdefault(
+            name, {"wall_seconds": 0.0, "cpu_seconds": None, "calls": 0}
+        )
+        phase["wall_seconds"] += wall_seconds
+        if cpu_seconds is not None:
+            phase["cpu_seconds"] = (phase["cpu_seconds"] or 0.0) + cpu_seconds
+        phase["calls"] += calls
+
+    def count(self, name, value=1):
+        """Increments the counter `name`."""
+        self.counters[name] = self.counters.get(name, 0) + int(value)
+
+    def to_dict(self):
+        """Returns the metrics, with derived throughput and peak memory."""
+        report = {
+            "phases": self.phases,
+            "counters": self.counters,
+            "peak_memory": peak_memory(),
+        }
+        search_seconds = self.phases.get("search", {}).get("wall_seconds")
+        if search_seconds:
+            report["combinations_per_second"] = (
+                self.counters.get("combinations_fitted", 0) / search_seconds
+            )
+            worker_seconds = sum(
+                self.phases.get(name, {}).get("wall_seconds", 0.0)
+                for name in ("worker_enumeration", "worker_fitting")
+            )
+            if self.num_workers and worker_seconds:
+                # The rest of the workers' time went to IPC, loading the fit
+                # data and waiting for tasks.
+                report["worker_utilization"] = worker_seconds / (
+                    search_seconds * self.num_workers
+                )
+        return report
+
+    def write(self, path):
+        """Writes the metrics as JSON."""
+        with open(path, "w") as f:
+            json.dump(self.to_dict(), f, indent=2)
@@ -1,39 +1,830 @@
+import inspect
 import itertools
+import os
+import tempfile
+import time
 import numpy as np
 from . import constants
-from scipy.special import gamma
-from sklearn.linear_model import LinearRegression
-from sklearn.metrics import mean_squared_error
-from .loader import load_data
-from joblib import Parallel, delayed
-from tqdm import tqdm
+from .cache import DEFAULT_CACHE_MAX_BYTES, ArrayCache, cached_arrays
+from .checkpoint import (
+    default_checkpoint_path,
+    load_checkpoint,
+    save_checkpoint,
+    search_fingerprint,
+)
+from .gram import GramStatistics, IncrementalSolver, MomentAccumulator, gram_fits
+from .loader import iter_data_chunks, load_data, split_row_weights
+from .metrics import Metrics
+from .results import SearchResult
+from .selection import CRITERIA, CrossValidationStatistics, information_criterion
+from .strategies import branch_and_bound_search, stepwise_search
+from .top_k import TopK
 from .search import (
-    generate_basis_function_combinations,
-    generate_random_basis_function_combinations,
+    count_combinations_up_to,
+    generate_1d_basis_functions,
+    get_nd_basis_function,
+    iter_combinations,
+    iter_revolving_door,
+    n_choose_k,
+    nd_basis_codes,
+    sample_combination_indices,
+    unrank_sized_combination,
 )
 
 
+def build_coded_basis_matrix(one_d_funcs, codes, X_data):
+    """Evaluates integer-coded ND basis functions into a column-major matrix.
+
+    Each 1-D basis function is evaluated once per input dimension; every ND
+    column is then the product of its gathered 1-D columns, so no ND basis
+    function objects are created. Columns with any non-finite factor or
+    product are NaN, as with `NDBasisFunction`.
+    """
+    basis_matrix = np.ones((len(X_data), len(codes)), dtype=np.float64, order="F")
+    with np.errstate(over="ignore", invalid="ignore"):
+        for dimension, values in enumerate(X_data.T):
+            one_d_columns = np.array([f(values) for f in one_d_funcs], dtype=np.float64)
+            basis_matrix *= one_d_columns[codes[:, dimension]].T
+    basis_matrix[:, ~np.isfinite(basis_matrix).all(axis=0)] = np.nan
+    return basis_matrix
+
+
+def build_coded_log_basis_matrix(one_d_funcs, codes, X_data):
+    """Evaluates integer-coded ND basis functions in the log domain.
+
+    ND log-values are sums of 1-D log-values (n*log(X) for X^n, gammaln for
+    Gamma(n), ...), so nothing overflows. Each column is then divided by its
+    largest value, i.e. shifted by its maximum in the log domain, which keeps
+    bases such as 10^n on large n finite and well scaled. Returns the basis
+    matrix and the per-column natural-log scales; a coefficient fitted on a
+    column maps back to the raw basis as coef * exp(-scale). The log-values
+    are of magnitudes, and the signs of the 1-D factors (e.g. log(n)^1 for
+    n < 1) are multiplied back into the columns. Columns that are undefined
+    anywhere are NaN.
+    """
+    log_matrix = np.zeros((len(X_data), len(codes)), dtype=np.float64, order="F")
+    sign_matrix = np.ones_like(log_matrix)
+    for dimension, values in enumerate(X_data.T):
+        one_d_logs = np.array([f.log_value(values) for f in one_d_funcs])
+        one_d_signs = np.array([f.log_sign(values) for f in one_d_funcs])
+        log_matrix += one_d_logs[codes[:, dimension]].T
+        sign_matrix *= one_d_signs[codes[:, dimension]].T
+    log_scale = log_matrix.max(axis=0)
+    # All -inf (an all-zero column) or NaN: the column is left unscaled.
+    log_scale[~np.isfinite(log_scale)] = 0.0
+    with np.errstate(invalid="ignore"):
+        log_matrix -= log_scale
+        np.exp(log_matrix, out=log_matrix)
+        log_matrix *= sign_matrix
+    log_matrix[:, np.isnan(log_matrix).any(axis=0)] = np.nan
+    return log_matrix, log_scale
+
+
+def stream_basis_statistics(data_path, one_d_funcs, chunksize):
+    """Accumulates basis column moments over the data file, chunk by chunk.
+
+    Only one chunk of rows and its basis matrix are held in memory at a time.
+    Returns the ND basis codes, the number of input dimensions and the
+    `MomentAccumulator`.
+    """
+    codes, num_dimensions, accumulator = None, None, None
+    for X_chunk, y_chunk in iter_data_chunks(data_path, chunksize):
+        if accumulator is None:
+            num_dimensions = X_chunk.shape[1]
+            codes = nd_basis_codes(len(one_d_funcs), num_dimensions)
+            if not gram_fits(len(codes)):
+                raise ValueError(
+                    f"Streaming accumulates a {len(codes)} x {len(codes)} "
+                    "cross-product matrix, which exceeds MAX_GRAM_BYTES; use "
+                    "fewer basis functions or search without streaming."
+                )
+            accumulator = MomentAccumulator(len(codes))
+        accumulator.update(
+            build_coded_basis_matrix(one_d_funcs, codes, X_chunk), y_chunk
+        )
+    if accumulator is None or not accumulator.num_samples:
+        raise ValueError(f"No rows could be read from {data_path}.")
+    return codes, num_dimensions, accumulator
+
+
+def equivalent_column_representatives(basis_matrix, decimals=9):
+    """Returns the sorted indices of one column per class of equivalent columns.
+
+    With an intercept in the model, a column is interchangeable with any
+    affine function of itself (e.g. n^1 * n^2 and n^3, or any two constant
+    columns). Columns are centered, scaled to unit norm and sign-normalized,
+    then rounded to `decimals` so that numerically collinear columns compare
+    equal; the first column of each class is kept.
+    """
+    amplitude = np.abs(basis_matrix).max(axis=0)
+    amplitude[amplitude == 0] = 1.0
+    normalized = basis_matrix / amplitude
+    normalized -= normalized.mean(axis=0)
+    norm = np.linalg.norm(normalized, axis=0)
+    norm[norm == 0] = 1.0
+    normalized = np.round(normalized / norm, decimals)
+    first_nonzero = np.argmax(normalized != 0, axis=0)
+    sign = np.sign(normalized[first_nonzero, np.arange(normalized.shape[1])])
+    sign[sign == 0] = 1.0
+    # Adding 0.0 turns -0.0 into 0.0 so both hash to the same bytes.
+    normalized = normalized * sign + 0.0
+    _, representatives = np.unique(normalized.T, axis=0, return_index=True)
+    return np.sort(representatives)
+
+
 def fit_model(basis_combination, X_data, y_data):
     X_design = np.zeros((len(X_data), len(basis_combination)))
     for i, basis_func in enumerate(basis_combination):
         X_design[:, i] = basis_func(*X_data.T)
 
+    error, model = _fit_design(X_design, y_data)
+    if model is None:
+        return error, None, None
+    return error, model, basis_combination
+
+
+def fit_cached_model(column_indices, basis_matrix, y_data, sample_weight=None):
+    """Fits a combination given as column indices into a precomputed basis matrix."""
+    X_design = basis_matrix[:, list(column_indices)]
+    error, model = _fit_design(X_design, y_data, sample_weight)
+    if model is None:
+        return error, None, None
+    return error, model, column_indices
+
+
+def iter_index_batches(index_combinations, num_terms, batch_size):
+    """Materializes combinations of column indices as (batch, k) index arrays."""
+    index_combinations = iter(index_combinations)
+    while True:
+        batch = np.fromiter(
+            itertools.chain.from_iterable(
+                itertools.islice(index_combinations, batch_size)
+            ),
+            dtype=np.intp,
+        )
+        if not batch.size:
+            return
+        yield batch.reshape(-1, num_terms)
+
+
+def chunk_errors(index_array, solver, fit_data, criterion="mse"):
+    """Returns the score of every combination in a (batch, k) index array.
+
+    The score is the MSE, or its AIC/BIC for those criteria; cross-validated
+    scores come from fit data wrapped in `CrossValidationStatistics`.
+    """
+    if solver in ("batched", "incremental"):
+        errors = fit_data.batch_errors(index_array)
+        num_samples = fit_data.num_samples
+    elif solver == "gram":
+        errors = np.array(
+            [fit_data.error(column_indices) for column_indices in index_array]
+        )
+        num_samples = fit_data.num_samples
+    else:
+        basis_matrix, y_data, row_weights = fit_data
+        errors = np.array(
+            [
+                fit_cached_model(column_indices, basis_matrix, y_data, row_weights)[0]
+                for column_indices in index_array
+            ]
+        )
+        num_samples = len(y_data)
+    if criterion in ("aic", "bic"):
+        errors = information_criterion(
+            errors, num_samples, index_array.shape[1], criterion
+        )
+    return errors
+
+
+def grid_sizes(num_terms, criterion="mse"):
+    """Returns the subset sizes searched by the grid, smallest first.
+
+    AIC and BIC trade the error against the number of terms, so with those
+    criteria every size up to `num_terms` competes; otherwise only subsets
+    of exactly `num_terms` columns are searched.
+    """
+    return range(1 if criterion in ("aic", "bic") else num_terms, num_terms + 1)
+
+
+def iter_ranges(start, stop, chunk_size):
+    """Partitions [start, stop) into contiguous ranges of at most chunk_size."""
+    for range_start in range(start, stop, chunk_size):
+        yield range_start, min(range_start + chunk_size, stop)
+
+
+def shard_range(total, shard):
+    """Returns the [start, stop) slice of [0, total) owned by shard (index, count)."""
+    index, count = shard
+    if not 0 <= index < count:
+        raise ValueError(f"Invalid shard {index}/{count}.")
+    return total * index // count, total * (index + 1) // count
+
+
+def share_fit_data(fit_data, directory):
+    """Dumps the fit data once so workers can memory-map it by path."""
+    import joblib
+
+    data_handle = os.path.join(directory, "fit_data.joblib")
+    joblib.dump(fit_data, data_handle)
+    return data_handle
+
+
+_worker_fit_data = {}
+
+
+def _load_fit_data(data_handle):
+    import joblib
+
+    if data_handle not in _worker_fit_data:
+        _worker_fit_data.clear()
+        _worker_fit_data[data_handle] = joblib.load(data_handle, mmap_mode="r")
+    return _worker_fit_data[data_handle]
+
+
+def search_range(
+    data_handle,
+    solver,
+    num_columns,
+    num_terms,
+    start,
+    stop,
+    top_k,
+    batch_size,
+    criterion="mse",
+):
+    """Searches the [start, stop) slice of the combination order.
+
+    Combinations are ordered by size (see `grid_sizes`), then
+    lexicographically, except that the incremental solver walks the
+    revolving-door order so that consecutive combinations differ by a single
+    column.
+    """
+    fit_data = _load_fit_data(data_handle)
+    iter_order = iter_combinations
+    if solver == "incremental":
+        fit_data = IncrementalSolver(fit_data)
+        iter_order = iter_revolving_door
+    # The slice of each size's order that falls within [start, stop).
+    size_ranges = []
+    offset = 0
+    for size in grid_sizes(num_terms, criterion):
+        count = n_choose_k(num_columns, size)
+        size_start, size_stop = max(start - offset, 0), min(stop - offset, count)
+        if size_start < size_stop:
+            size_ranges.append((size, size_start, size_stop))
+        offset += count
+    index_batches = (
+        index_array
+        for size, size_start, size_stop in size_ranges
+        for index_array in iter_index_batches(
+            iter_order(num_columns, size, size_start, size_stop), size, batch_size
+        )
+    )
+    best, stats = _search_batches(index_batches, solver, fit_data, top_k, criterion)
+    return start, stop, best, stats
+
+
+def search_samples(
+    data_handle,
+    solver,
+    num_columns,
+    num_terms,
+    sample_indices,
+    top_k,
+    batch_size,
+    criterion="mse",
+):
+    """Searches sampled indices over all combinations of 1..num_terms columns."""
+    fit_data = _load_fit_data(data_handle)
+    unrank_start = time.perf_counter()
+    by_size = {}
+    for index in sample_indices:
+        column_indices = unrank_sized_combination(index, num_columns, num_terms)
+        by_size.setdefault(len(column_indices), []).append(column_indices)
+    index_batches = (
+        index_array
+        for size, index_combinations in by_size.items()
+        for index_array in iter_index_batches(index_combinations, size, batch_size)
+    )
+    best, stats = _search_batches(index_batches, solver, fit_data, top_k, criterion)
+    # Combinations are unranked up front, so all but fitting is enumeration.
+    stats["enumeration_seconds"] = (
+        time.perf_counter() - unrank_start - stats["fitting_seconds"]
+    )
+    return len(sample_indices), best, stats
+
+
+def _search_batches(index_batches, solver, fit_data, top_k, criterion="mse"):
+    """Reduces index batches to a top-K heap, timing enumeration and fitting.
+
+    Returns the heap and the worker statistics: seconds spent generating
+    combinations and fitting them, and the number of fitted and failed
+    (non-finite error) combinations.
+    """
+    best = TopK(top_k)
+    stats = {
+        "enumeration_seconds": 0.0,
+        "fitting_seconds": 0.0,
+        "fitted": 0,
+        "failed": 0,
+    }
+    index_batches = iter(index_batches)
+    while True:
+        batch_start = time.perf_counter()
+        index_array = next(index_batches, None)
+        fit_start = time.perf_counter()
+        stats["enumeration_seconds"] += fit_start - batch_start
+        if index_array is None:
+            return best, stats
+        errors = chunk_errors(index_array, solver, fit_data, criterion)
+        best.push_many(errors, index_array)
+        stats["fitting_seconds"] += time.perf_counter() - fit_start
+        stats["fitted"] += len(errors)
+        stats["failed"] += int(np.count_nonzero(~np.isfinite(errors)))
+
+
+def _record_worker_stats(metrics, worker_stats):
+    metrics.add_time("worker_enumeration", worker_stats["enumeration_seconds"])
+    metrics.add_time("worker_fitting", worker_stats["fitting_seconds"])
+    metrics.count("combinations_fitted", worker_stats["fitted"])
+    metrics.count("failed_fits", worker_stats["failed"])
+
+
+def _refit(column_indices, solver, fit_data):
+    if solver == "sklearn":
+        error, model, _ = fit_cached_model(column_indices, *fit_data)
+    else:
+        error, model, _ = fit_data.fit(column_indices)
+    return error, model
+
+
+def _fit_design(X_design, y_data, sample_weight=None):
+    # scikit-learn is slow to import and only needed by the sklearn solver.
+    from sklearn.linear_model import LinearRegression
+    from sklearn.metrics import mean_squared_error
+
+    if not np.isfinite(X_design).all():
+        return float("inf"), None
+    # Columns are fitted scaled to their maximum absolute value, as in
+    # `GramStatistics`: badly scaled columns otherwise lose precision and
+    # can rank a worse combination first.
+    amplitude = np.abs(X_design).max(axis=0, initial=0.0)
+    amplitude[amplitude == 0] = 1.0
     model = LinearRegression()
-    try:
-        model.fit(X_design, y_data)
-        y_pred = model.predict(X_design)
-        error = mean_squared_error(y_data, y_pred)
-        return error, model, basis_combination
-    except ValueError as e:
-        if "Input X contains infinity or a value too large" in str(
-            e
-        ) or "Input X contains NaN" in str(e):
-            return float("inf"), None, None
-        else:
-            raise e
+    model.fit(X_design / amplitude, y_data, sample_weight=sample_weight)
+    model.coef_ = model.coef_ / amplitude
+    y_pred = model.predict(X_design)
+    error = mean_squared_error(y_data, y_pred, sample_weight=sample_weight)
+    return error, model
 
 
-def find_best_model(
+def _check_search_options(search_strategy, solver, criterion, shard, checkpoint_path):
+    """Raises ValueError for an unknown or incompatible strategy and solver."""
+    if search_strategy not in ("grid", "random", "stepwise", "bnb"):
+        raise ValueError(
+            "Invalid search strategy. Choose 'grid', 'random', 'stepwise' or 'bnb'."
+        )
+    if shard is not None and search_strategy != "grid":
+        raise ValueError("Sharding is only supported for the grid strategy.")
+    if checkpoint_path is not None and search_strategy != "grid":
+        raise ValueError("Checkpointing is only supported for the grid strategy.")
+    if solver not in ("sklearn", "gram", "batched", "incremental"):
+        raise ValueError(
+            "Invalid solver. Choose 'sklearn', 'gram', 'batched' or 'incremental'."
+        )
+    if solver == "incremental" and search_strategy != "grid":
+        raise ValueError("The incremental solver is only supported for grid search.")
+    if criterion not in CRITERIA:
+        raise ValueError(
+            "Invalid criterion. Choose 'mse', 'aic', 'bic', 'cv' or 'loo'."
+        )
+    if criterion != "mse" and search_strategy not in ("grid", "random"):
+        raise ValueError(
+            "Selection criteria other than mse require grid or random search."
+        )
+
+
+def _check_data_options(
+    search_strategy, solver, criterion, stream, weights, log_space, prune_equivalent
+):
+    """Raises ValueError for data handling the solver and criterion cannot use."""
+    if criterion in ("cv", "loo") and (solver not in ("gram", "batched") or stream):
+        raise ValueError(
+            "Cross-validation requires the gram or batched solver without streaming."
+        )
+    if weights is not None and (stream or criterion in ("cv", "loo")):
+        raise ValueError(
+            "Row weights are not supported with streaming or cross-validation."
+        )
+    if stream and (solver == "sklearn" or search_strategy == "stepwise"):
+        raise ValueError(
+            "Streaming requires a Gram-based solver and a strategy other "
+            "than stepwise search."
+        )
+    if stream and (log_space or prune_equivalent):
+        raise ValueError("Streaming does not support log_space or prune_equivalent.")
+
+
+def _load_streamed_statistics(
+    data_path, one_d_funcs, chunksize, cache, basis_params, metrics
+):
+    """Streams the data file into Gram statistics over its finite basis columns.
+
+    Returns the number of input dimensions, the indices of the finite basis
+    columns and their `GramStatistics`.
+    """
+
+    def stream_statistics():
+        # Only the moments of the basis columns are kept, never the rows.
+        codes, num_dimensions, accumulator = stream_basis_statistics(
+            data_path, one_d_funcs, chunksize
+        )
+        active_columns = np.flatnonzero(accumulator.valid)
+        stats = accumulator.statistics(active_columns)
+        return dict(
+            stats.arrays(),
+            num_dimensions=num_dimensions,
+            active_columns=active_columns,
+        )
+
+    with metrics.phase("stream"):
+        arrays = cached_arrays(
+            cache, data_path, stream_statistics, kind="streamed", **basis_params
+        )
+    num_dimensions = int(arrays.pop("num_dimensions"))
+    active_columns = np.asarray(arrays.pop("active_columns"))
+    return num_dimensions, active_columns, GramStatistics.from_arrays(arrays)
+
+
+def _load_basis_matrix(
+    data_path, one_d_funcs, log_space, weights, cache, basis_params, metrics
+):
+    """Loads the data file and evaluates its finite basis columns.
+
+    Returns the number of input dimensions, the indices of the finite basis
+    columns, those columns, their log-scales with `log_space` (else None),
+    the targets and the row weights.
+    """
+    with metrics.phase("load"):
+        data, row_weights = split_row_weights(load_data(data_path), weights)
+        # Floating-point inputs make overflowing bases (e.g. 2^n) show up
+        # as inf rather than silently wrapping around in integer math.
+        X_data = data.iloc[:, :-1].values.astype(np.float64)
+        y_data = data.iloc[:, -1].values
+    num_dimensions = X_data.shape[1]
+    codes = nd_basis_codes(len(one_d_funcs), num_dimensions)
+
+    def evaluate_basis():
+        if log_space:
+            basis_matrix, log_scale = build_coded_log_basis_matrix(
+                one_d_funcs, codes, X_data
+            )
+            return {"basis_matrix": basis_matrix, "log_scale": log_scale}
+        return {"basis_matrix": build_coded_basis_matrix(one_d_funcs, codes, X_data)}
+
+    with metrics.phase("basis_evaluation"):
+        arrays = cached_arrays(
+            cache,
+            data_path,
+            evaluate_basis,
+            kind="basis",
+            log_space=log_space,
+            # A weight column is not an input dimension.
+            **({} if weights in (None, "relative") else dict(weights=weights)),
+            **basis_params,
+        )
+    basis_matrix = arrays["basis_matrix"]
+
+    # Any combination containing a basis column that overflowed can never
+    # be fitted, so such columns are dropped before enumerating
+    # combinations. Combinations are indices into the active columns.
+    with metrics.phase("column_pruning"):
+        active_columns = np.flatnonzero(np.isfinite(basis_matrix).all(axis=0))
+        basis_matrix = np.asfortranarray(basis_matrix[:, active_columns])
+    return (
+        num_dimensions,
+        active_columns,
+        basis_matrix,
+        arrays.get("log_scale"),
+        y_data,
+        row_weights,
+    )
+
+
+def _merge_equivalent_columns(
+    basis_matrix, active_columns, num_terms, count_combinations, metrics, log
+):
+    """Keeps one basis column of each class of equivalent columns."""
+    num_columns = len(active_columns)
+    with metrics.phase("column_pruning"):
+        representatives = equivalent_column_representatives(basis_matrix)
+        active_columns = active_columns[representatives]
+        basis_matrix = np.asfortranarray(basis_matrix[:, representatives])
+    metrics.count(
+        "merged_equivalent_combinations",
+        count_combinations(num_columns, num_terms)
+        - count_combinations(len(representatives), num_terms),
+    )
+    log(
+        f"Merged equivalent basis columns: {num_columns} -> "
+        f"{len(representatives)} columns, "
+        f"{count_combinations(num_columns, num_terms)} -> "
+        f"{count_combinations(len(representatives), num_terms)} combinations"
+    )
+    return basis_matrix, active_columns
+
+
+def _build_fit_data(
+    basis_matrix,
+    y_data,
+    row_weights,
+    search_strategy,
+    criterion,
+    cv_folds,
+    seed,
+    cache,
+    data_path,
+    cache_params,
+    metrics,
+):
+    """Returns the Gram statistics, wrapped for cross-validation criteria."""
+    # The Gram statistics are computed once; every combination is then
+    # solved from its k x k sub-block. Stepwise search only projects
+    # columns, so it skips the quadratic-size Gram matrix.
+    with_gram = search_strategy != "stepwise"
+    with metrics.phase("gram_statistics"):
+        fit_data = GramStatistics.from_arrays(
+            cached_arrays(
+                cache,
+                data_path,
+                lambda: GramStatistics(
+                    basis_matrix, y_data, with_gram, row_weights
+                ).arrays(),
+                kind="gram",
+                with_gram=with_gram,
+                **cache_params,
+            )
+        )
+    if criterion in ("cv", "loo"):
+        # Per-fold sums are accumulated once; every combination is then
+        # cross-validated from k x k sub-blocks.
+        with metrics.phase("cv_statistics"):
+            fit_data = CrossValidationStatistics(
+                fit_data,
+                num_folds=cv_folds if criterion == "cv" else None,
+                seed=0 if seed is None else seed,
+            )
+    return fit_data
+
+
+def _search_fingerprint(data_path, criterion, cv_folds, seed, weights, **search_params):
+    """Identifies a grid search for checkpointing."""
+    return search_fingerprint(
+        data_path,
+        **search_params,
+        # Checkpoints of unweighted MSE searches keep their fingerprint from
+        # before criteria and weights.
+        **({} if criterion == "mse" else dict(criterion=criterion, cv_folds=cv_folds)),
+        # The cross-validation folds are assigned from the seed.
+        **(dict(seed=0 if seed is None else seed) if criterion == "cv" else {}),
+        **({} if weights is None else dict(weights=weights)),
+    )
+
+
+def _checkpoint_settings(
+    search_strategy, checkpoint_path, checkpoint_dir, data_path, **search_params
+):
+    """Returns the checkpoint path, the search fingerprint and whether to remove it.
+
+    Grid searches checkpoint to a file named after the search in
+    `checkpoint_dir` unless given a `checkpoint_path`, so an interrupted
+    run can be resumed without having asked for a checkpoint; that default
+    file is removed once the search completes. Without either, nothing is
+    checkpointed and (None, None, False) is returned.
+    """
+    if checkpoint_path is None and (
+        checkpoint_dir is None or search_strategy != "grid"
+    ):
+        return None, None, False
+    fingerprint = _search_fingerprint(data_path, **search_params)
+    if checkpoint_path is not None:
+        return checkpoint_path, fingerprint, False
+    os.makedirs(checkpoint_dir, exist_ok=True)
+    return default_checkpoint_path(checkpoint_dir, fingerprint), fingerprint, True
+
+
+def _grid_search(
+    parallel,
+    data_handle,
+    solver,
+    num_columns,
+    num_terms,
+    top_k,
+    batch_size,
+    criterion,
+    chunk_size,
+    num_threads,
+    shard,
+    checkpoint_path,
+    fingerprint,
+    resume,
+    checkpoint_interval,
+    remove_checkpoint,
+    metrics,
+    log,
+    verbose,
+):
+    """Searches the grid, or a shard of it, across workers.
+
+    With `checkpoint_path`, progress is saved every `checkpoint_interval`
+    seconds and, with `resume`, a search with the same `fingerprint`
+    continues from its last checkpoint. With `remove_checkpoint`, the
+    checkpoint is deleted once the search completes instead of recording
+    it. Returns the top-K heap.
+    """
+    from joblib import delayed
+    from tqdm import tqdm
+
+    best = TopK(top_k)
+    search_start, search_stop = 0, sum(
+        n_choose_k(num_columns, size) for size in grid_sizes(num_terms, criterion)
+    )
+    if shard is not None:
+        search_start, search_stop = shard_range(search_stop, shard)
+        log(
+            f"Searching shard {shard[0]}/{shard[1]}: "
+            f"combinations [{search_start}, {search_stop})"
+        )
+    total_combinations = search_stop - search_start
+    if resume and checkpoint_path is not None and os.path.exists(checkpoint_path):
+        search_start, best = load_checkpoint(checkpoint_path, fingerprint, top_k)
+        log(f"Resuming from combination {search_start}")
+    if chunk_size is None:
+        chunk_size = max(
+            batch_size, -(-(search_stop - search_start) // (num_threads * 8))
+        )
+
+    range_results = parallel(
+        delayed(search_range)(
+            data_handle,
+            solver,
+            num_columns,
+            num_terms,
+            start,
+            stop,
+            top_k,
+            batch_size,
+            criterion,
+        )
+        for start, stop in iter_ranges(search_start, search_stop, chunk_size)
+    )
+    # Ranges complete in submission order, so everything before the last
+    # merged range is done and can be checkpointed as one index.
+    last_saved = time.monotonic()
+    with tqdm(
+        total=total_combinations,
+        disable=not verbose,
+        initial=total_combinations - (search_stop - search_start),
+    ) as progress:
+        for start, stop, range_best, worker_stats in range_results:
+            _record_worker_stats(metrics, worker_stats)
+            with metrics.phase("reduction"):
+                best.merge(range_best)
+                progress.update(stop - start)
+                if checkpoint_path is not None and (
+                    (stop == search_stop and not remove_checkpoint)
+                    or time.monotonic() - last_saved >= checkpoint_interval
+                ):
+                    save_checkpoint(checkpoint_path, fingerprint, stop, best)
+                    last_saved = time.monotonic()
+    if remove_checkpoint and os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+    return best
+
+
+def _random_search(
+    parallel,
+    data_handle,
+    solver,
+    num_columns,
+    num_terms,
+    num_samples,
+    seed,
+    top_k,
+    batch_size,
+    criterion,
+    chunk_size,
+    num_threads,
+    metrics,
+    verbose,
+):
+    """Searches `num_samples` random combinations across workers.
+
+    Returns the top-K heap.
+    """
+    from joblib import delayed
+    from tqdm import tqdm
+
+    best = TopK(top_k)
+    sample_indices = sample_combination_indices(
+        num_columns, num_terms, num_samples, seed
+    )
+    if chunk_size is None:
+        chunk_size = max(batch_size, -(-len(sample_indices) // (num_threads * 8)))
+    sample_results = parallel(
+        delayed(search_samples)(
+            data_handle,
+            solver,
+            num_columns,
+            num_terms,
+            sample_indices[start:stop],
+            top_k,
+            batch_size,
+            criterion,
+        )
+        for start, stop in iter_ranges(0, len(sample_indices), chunk_size)
+    )
+    with tqdm(total=len(sample_indices), disable=not verbose) as progress:
+        for num_fitted, samples_best, worker_stats in sample_results:
+            _record_worker_stats(metrics, worker_stats)
+            with metrics.phase("reduction"):
+                best.merge(samples_best)
+                progress.update(num_fitted)
+    return best
+
+
+def _subset_search(
+    search_strategy,
+    fit_data,
+    num_terms,
+    top_k,
+    stepwise_method,
+    backward,
+    metrics,
+    log,
+):
+    """Runs stepwise or branch-and-bound selection and returns the top-K heap."""
+    if search_strategy == "stepwise":
+        best, num_scored = stepwise_search(
+            fit_data,
+            num_terms,
+            top_k=top_k,
+            method=stepwise_method,
+            backward=backward,
+        )
+        metrics.count("combinations_fitted", num_scored)
+        log(f"Stepwise search scored {num_scored} combinations")
+        return best
+    best, counters = branch_and_bound_search(fit_data, num_terms, top_k=top_k)
+    metrics.count("combinations_fitted", counters["scored"])
+    metrics.count("bnb_nodes", counters["nodes"])
+    metrics.count("bnb_pruned_subtrees", counters["pruned"])
+    log(
+        f"Branch and bound visited {counters['nodes']} nodes, pruned "
+        f"{counters['pruned']} subtrees and scored {counters['scored']} "
+        "combinations"
+    )
+    return best
+
+
+def _rank_models(
+    best,
+    fit_solver,
+    fit_data,
+    active_columns,
+    criterion,
+    log_scale,
+    one_d_funcs,
+    num_dimensions,
+):
+    """Refits the top-K combinations into result dicts, best first."""
+    ranked = []
+    for score, column_indices in best.items():
+        error, model = _refit(column_indices, fit_solver, fit_data)
+        basis_ids = [int(active_columns[i]) for i in column_indices]
+        entry = {"error": error, "model": model, "basis_ids": basis_ids}
+        if criterion != "mse":
+            entry["score"] = score
+        if log_scale is not None:
+            scales = log_scale[basis_ids]
+            entry["log_normalized_coef"] = model.coef_
+            entry["log_scales"] = np.asarray(scales)
+            # Coefficients may underflow to 0 for huge scales; the
+            # normalized coefficients and scales are reported as well,
+            # and kept on the model for `CompiledModel.from_estimator`.
+            model.log_normalized_coef_ = entry["log_normalized_coef"]
+            model.log_scales_ = entry["log_scales"]
+            with np.errstate(over="ignore", under="ignore"):
+                model.coef_ = model.coef_ * np.exp(-scales)
+        entry["basis_functions"] = tuple(
+            get_nd_basis_function(i, one_d_funcs, num_dimensions) for i in basis_ids
+        )
+        ranked.append(entry)
+    return ranked
+
+
+def search_models(
     data_path,
     num_terms,
     p_values,
@@ -42,43 +833,340 @@ def find_best_model(
     num_threads=4,
     search_strategy="grid",
     num_samples=100,
+    solver="sklearn",
+    batch_size=4096,
+    top_k=1,
+    chunk_size=None,
+    shard=None,
+    checkpoint_path=None,
+    resume=False,
+    checkpoint_interval=60.0,
+    checkpoint_dir=None,
+    seed=None,
+    log_space=False,
+    prune_equivalent=False,
+    stepwise_method="forward",
+    backward=False,
+    stream=False,
+    chunksize=100000,
+    cache_dir=None,
+    cache_max_bytes=DEFAULT_CACHE_MAX_BYTES,
+    criterion="mse",
+    cv_folds=5,
+    weights=None,
+    metrics=None,
+    verbose=True,
 ):
-    """Performs a search to find the best model."""
-    data = load_data(data_path)
-    X_data = data.iloc[:, :-1].values
-    y_data = data.iloc[:, -1].values
-    num_dimensions = X_data.shape[1]
+    """Searches basis function combinations and returns the best fitted models.
 
-    if search_strategy == "grid":
-        basis_combinations = generate_basis_function_combinations(
-            num_dimensions, num_terms, p_values, q_values, X_values
-        )
-    elif search_strategy == "random":
-        basis_combinations = generate_random_basis_function_combinations(
-            num_dimensions, num_terms, p_values, q_values, X_values, num_samples
+    Returns up to `top_k` dicts, best first, with the MSE ("error"), the
+    fitted "model", its "basis_functions" and their ND "basis_ids". With
+    `log_space`, the coefficients fitted on the log-normalized columns and
+    the column "log_scales" are included too. Phase timings and counters are
+    recorded into `metrics` when given. With `verbose=False`, progress bars
+    and messages are suppressed.
+
+    Combinations are ranked by `criterion`: the training MSE, AIC, BIC, the
+    `cv_folds`-fold cross-validated MSE ("cv") or the leave-one-out MSE
+    ("loo"); other criteria than the MSE add their "score" to each dict.
+    Ranked by AIC or BIC, the grid searches every size up to `num_terms`.
+    With `weights` ("relative" for 1/y^2 or the name of a weight column),
+    fits minimize and report the weighted MSE.
+
+    Grid searches save their progress to `checkpoint_path`, or else to a
+    file named after the search in `checkpoint_dir`, which is removed once
+    the search completes; with `resume`, they continue from it.
+    """
+    from joblib import Parallel
+
+    log = print if verbose else lambda *args, **kwargs: None
+    _check_search_options(search_strategy, solver, criterion, shard, checkpoint_path)
+    _check_data_options(
+        search_strategy, solver, criterion, stream, weights, log_space, prune_equivalent
+    )
+
+    # ND basis functions are handled as rows of 1-D function ids and each is
+    # evaluated exactly once; combinations are then assembled by indexing
+    # into the cached columns. Function objects are only built for reporting.
+    one_d_funcs = list(generate_1d_basis_functions(p_values, q_values, X_values))
+    metrics = Metrics() if metrics is None else metrics
+    # Evaluated bases and Gram statistics are cached on disk, keyed by the
+    # data file contents and everything they are computed from.
+    cache = ArrayCache(cache_dir, cache_max_bytes) if cache_dir else None
+    basis_params = dict(p_values=p_values, q_values=q_values, X_values=X_values)
+    if stream:
+        num_dimensions, active_columns, fit_data = _load_streamed_statistics(
+            data_path, one_d_funcs, chunksize, cache, basis_params, metrics
         )
+        log_scale = None
+        log(f"Streamed {fit_data.num_samples} rows")
     else:
-        raise ValueError("Invalid search strategy. Choose 'grid' or 'random'.")
+        (
+            num_dimensions,
+            active_columns,
+            basis_matrix,
+            log_scale,
+            y_data,
+            row_weights,
+        ) = _load_basis_matrix(
+            data_path, one_d_funcs, log_space, weights, cache, basis_params, metrics
+        )
+    num_basis_columns = len(one_d_funcs) ** num_dimensions
+    # Only random search, and the grid ranked by AIC or BIC, consider
+    # combinations of fewer than num_terms columns.
+    count_combinations = (
+        count_combinations_up_to
+        if search_strategy == "random" or criterion in ("aic", "bic")
+        else n_choose_k
+    )
+    num_pruned = count_combinations(num_basis_columns, num_terms) - count_combinations(
+        len(active_columns), num_terms
+    )
+    metrics.count("pruned_invalid_combinations", num_pruned)
+    if num_pruned:
+        log(
+            f"Pruned {num_pruned} combinations containing "
+            f"{num_basis_columns - len(active_columns)} invalid basis columns"
+        )
+    if prune_equivalent:
+        basis_matrix, active_columns = _merge_equivalent_columns(
+            basis_matrix, active_columns, num_terms, count_combinations, metrics, log
+        )
+    num_columns = len(active_columns)
+    # Stepwise and branch-and-bound search rank subsets with the Gram
+    # statistics whatever the solver, so they refit from them as well.
+    fit_solver = solver if search_strategy in ("grid", "random") else "gram"
+    if fit_solver == "sklearn":
+        fit_data = (basis_matrix, y_data, row_weights)
+    elif not stream:
+        fit_data = _build_fit_data(
+            basis_matrix,
+            y_data,
+            row_weights,
+            search_strategy,
+            criterion,
+            cv_folds,
+            seed,
+            cache,
+            data_path,
+            dict(
+                log_space=log_space,
+                prune_equivalent=prune_equivalent,
+                weights=weights,
+                **basis_params,
+            ),
+            metrics,
+        )
 
-    results = Parallel(n_jobs=num_threads)(
-        delayed(fit_model)(basis_combination, X_data, y_data)
-        for basis_combination in tqdm(basis_combinations)
+    checkpoint_path, fingerprint, remove_checkpoint = _checkpoint_settings(
+        search_strategy,
+        checkpoint_path,
+        checkpoint_dir,
+        data_path,
+        num_terms=num_terms,
+        p_values=p_values,
+        q_values=q_values,
+        X_values=X_values,
+        solver=solver,
+        top_k=top_k,
+        shard=shard,
+        log_space=log_space,
+        prune_equivalent=prune_equivalent,
+        criterion=criterion,
+        cv_folds=cv_folds,
+        seed=seed,
+        weights=weights,
     )
 
-    best_error = float("inf")
-    best_model = None
-    best_basis_functions = None
+    # Workers receive only a description of their slice of the search plus a
+    # path to the memory-mapped fit data, regenerate their combinations
+    # locally and reduce them to a top-K heap. The heaps are merged as they
+    # stream back, so no per-combination result is kept.
+    with tempfile.TemporaryDirectory() as shared_dir:
+        with metrics.phase("share_fit_data"):
+            data_handle = share_fit_data(fit_data, shared_dir)
+        parallel = Parallel(n_jobs=num_threads, return_as="generator")
+        with metrics.phase("search"):
+            if search_strategy == "grid":
+                best = _grid_search(
+                    parallel,
+                    data_handle,
+                    solver,
+                    num_columns,
+                    num_terms,
+                    top_k,
+                    batch_size,
+                    criterion,
+                    chunk_size,
+                    num_threads,
+                    shard,
+                    checkpoint_path,
+                    fingerprint,
+                    resume,
+                    checkpoint_interval,
+                    remove_checkpoint,
+                    metrics,
+                    log,
+                    verbose,
+                )
+            elif search_strategy == "random":
+                best = _random_search(
+                    parallel,
+                    data_handle,
+                    solver,
+                    num_columns,
+                    num_terms,
+                    num_samples,
+                    seed,
+                    top_k,
+                    batch_size,
+                    criterion,
+                    chunk_size,
+                    num_threads,
+                    metrics,
+                    verbose,
+                )
+            else:
+                best = _subset_search(
+                    search_strategy,
+                    fit_data,
+                    num_terms,
+                    top_k,
+                    stepwise_method,
+                    backward,
+                    metrics,
+                    log,
+                )
 
-    for error, model, basis_functions in results:
-        if error < best_error:
-            best_error = error
-            best_model = model
-            best_basis_functions = basis_functions
+    with metrics.phase("refit"):
+        ranked = _rank_models(
+            best,
+            fit_solver,
+            fit_data,
+            active_columns,
+            criterion,
+            log_scale,
+            one_d_funcs,
+            num_dimensions,
+        )
+    if not ranked:
+        raise ValueError("No combination of basis functions could be fitted.")
+    metrics.num_workers = num_threads
+    return ranked
 
+
+def _print_ranked(ranked, top_k, criterion, weights, log_space):
+    """Prints the best model and, with `top_k` above one, the ranking."""
+    best = ranked[0]
     print("Best combination of basis functions:")
-    print(" + ".join([str(func) for func in best_basis_functions]))
-    print(f"Best model coefficients: {best_model.coef_}")
-    print(f"Best model intercept: {best_model.intercept_}")
-    print(f"Mean squared error: {best_error}")
+    print(" + ".join([str(func) for func in best["basis_functions"]]))
+    print(f"Best model coefficients: {best['model'].coef_}")
+    print(f"Best model intercept: {best['model'].intercept_}")
+    if weights is None:
+        print(f"Mean squared error: {best['error']}")
+    else:
+        print(f"Weighted mean squared error ({weights}): {best['error']}")
+    if criterion != "mse":
+        print(f"Selection criterion ({criterion}): {best['score']}")
+    if log_space:
+        print(f"Best model log-normalized coefficients: {best['log_normalized_coef']}")
+        print(f"Best model column log-scales: {best['log_scales']}")
+    if top_k <= 1:
+        return
+    if criterion == "mse" and weights is None:
+        print(f"\nTop {len(ranked)} combinations by mean squared error:")
+    elif criterion == "mse":
+        print(f"\nTop {len(ranked)} combinations by weighted mean squared error:")
+    else:
+        print(f"\nTop {len(ranked)} combinations by {criterion}:")
+    for rank, entry in enumerate(ranked, start=1):
+        print(
+            f"{rank}. {entry.get('score', entry['error'])}: "
+            + " + ".join(str(f) for f in entry["basis_functions"])
+        )
+
+
+# Search parameters recorded with the ranked models in a `SearchResult`.
+RESULT_PARAMETERS = (
+    "search_strategy",
+    "num_samples",
+    "solver",
+    "top_k",
+    "shard",
+    "seed",
+    "log_space",
+    "prune_equivalent",
+    "stream",
+    "criterion",
+    "cv_folds",
+    "weights",
+)
+
+
+def find_best_model(
+    data_path,
+    num_terms,
+    p_values,
+    q_values,
+    X_values,
+    num_threads=4,
+    search_strategy="grid",
+    num_samples=100,
+    *,
+    metrics_out=None,
+    profile_phases=(),
+    profile_dir=".",
+    output=None,
+    quiet=False,
+    **search_kwargs,
+):
+    """Performs a search to find the best model.
 
+    The remaining keyword arguments are passed on to `search_models`.
+    Per-phase timings, throughput and fit counters and peak memory are
+    written as JSON to `metrics_out`; phases listed in `profile_phases` run
+    under cProfile with their stats dumped into `profile_dir`. The ranked
+    models are written to `output` as a `SearchResult` (JSON, or .npz), and
+    `quiet` suppresses all progress and result printing.
+    """
+    # Bind the arguments up front, so that unknown ones fail before the
+    # search and the defaults of search_models are recorded in the result.
+    arguments = inspect.signature(search_models).bind(
+        data_path,
+        num_terms,
+        p_values,
+        q_values,
+        X_values,
+        num_threads,
+        search_strategy,
+        num_samples,
+        **search_kwargs,
+    )
+    arguments.apply_defaults()
+    search_params = arguments.arguments
+    metrics = Metrics(profile_phases, profile_dir)
+    search_params.update(metrics=metrics, verbose=not quiet)
+    ranked = search_models(**search_params)
+    best_model, best_basis_functions = ranked[0]["model"], ranked[0]["basis_functions"]
+    if output is not None:
+        parameters = dict(
+            data_path=data_path,
+            num_dimensions=len(best_basis_functions[0].funcs),
+            num_terms=num_terms,
+            p_values=list(p_values),
+            q_values=list(q_values),
+            X_values=list(X_values),
+            **{name: search_params[name] for name in RESULT_PARAMETERS},
+        )
+        SearchResult.from_ranked(ranked, parameters, metrics).write(output)
+    if metrics_out is not None:
+        metrics.write(metrics_out)
+    if not quiet:
+        _print_ranked(
+            ranked,
+            search_params["top_k"],
+            search_params["criterion"],
+            search_params["weights"],
+            search_params["log_space"],
+        )
     return best_model, best_basis_functions
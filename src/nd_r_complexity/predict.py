@@ -0,0 +1,262 @@
+import re
+
+import numpy as np
+
+from .results import SearchResult, load_result
+from .search import (
+    Exponential,
+    Factorial,
+    MixedBasisFunction,
+    Polylog,
+    Polynomial,
+    generate_1d_basis_functions,
+    get_nd_basis_function,
+)
+
+DEFAULT_PREDICT_CHUNKSIZE = 65536
+# Per-dimension temporaries, defined before the factors that use them.
+_BASE_DEFINITIONS = (
+    # Matches Polylog, which avoids log(0).
+    ("log{d}", "np.log(x{d} + 1e-9)"),
+    ("logx{d}", "np.log(x{d})"),
+    ("logabslog{d}", "np.log(np.abs(log{d}))"),
+)
+_BASE_NAME = re.compile(r"(log|logx|logabslog)\d+")
+
+
+def _factor_expressions(func, dimension):
+    """Returns the NumPy expressions whose product is `func` of input `dimension`."""
+    x = f"x{dimension}"
+    if isinstance(func, MixedBasisFunction):
+        return [e for f in func.funcs for e in _factor_expressions(f, dimension)]
+    if isinstance(func, Polynomial):
+        if func.p == 0:
+            return []
+        return [x] if func.p == 1 else [f"{x} ** {float(func.p)!r}"]
+    if isinstance(func, Polylog):
+        if func.q == 0:
+            return []
+        log = f"log{dimension}"
+        return [log] if func.q == 1 else [f"{log} ** {float(func.q)!r}"]
+    if isinstance(func, Exponential):
+        return [f"{float(func.X)!r} ** {x}"]
+    if isinstance(func, Factorial):
+        return [f"gamma({x} + 1)"]
+    raise TypeError(f"Cannot compile basis function {func}.")
+
+
+def _log_factor_expressions(func, dimension):
+    """Returns the NumPy expressions whose sum is log|`func`| of input `dimension`.
+
+    Like `BasisFunction.log_value`, these are log-magnitudes; the signs are
+    given by `_sign_expressions`.
+    """
+    x = f"x{dimension}"
+    if isinstance(func, MixedBasisFunction):
+        return [e for f in func.funcs for e in _log_factor_expressions(f, dimension)]
+    if isinstance(func, Polynomial):
+        if func.p == 0:
+            return []
+        log = f"logx{dimension}"
+        return [log] if func.p == 1 else [f"{float(func.p)!r} * {log}"]
+    if isinstance(func, Polylog):
+        if func.q == 0:
+            return []
+        log = f"logabslog{dimension}"
+        return [log] if func.q == 1 else [f"{float(func.q)!r} * {log}"]
+    if isinstance(func, Exponential):
+        return [f"{float(np.log(func.X))!r} * {x}"]
+    if isinstance(func, Factorial):
+        return [f"gammaln({x} + 1)"]
+    raise TypeError(f"Cannot compile basis function {func}.")
+
+
+def _sign_expressions(func, dimension):
+    """Returns the NumPy expressions whose product is the sign of `func`.
+
+    Matches `BasisFunction.log_sign`; factors that are always positive have
+    no expression.
+    """
+    if isinstance(func, MixedBasisFunction):
+        return [e for f in func.funcs for e in _sign_expressions(f, dimension)]
+    if isinstance(func, Polylog):
+        log = f"log{dimension}"
+        if not float(func.q).is_integer():
+            return [f"np.where({log} < 0, np.nan, 1.0)"]
+        return [f"np.sign({log})"] if int(func.q) % 2 else []
+    if isinstance(func, Factorial):
+        return [f"gammasgn(x{dimension} + 1)"]
+    return []
+
+
+def _term_expressions(coefficients, basis_functions, log_scales, inputs):
+    """Returns the shared factor expressions, mapped to their names, and the terms."""
+    factor_expressions = (
+        _factor_expressions if log_scales is None else _log_factor_expressions
+    )
+    factors = {}
+    terms = []
+    for i, (coefficient, nd_func) in enumerate(zip(coefficients, basis_functions)):
+        names, signs = [], []
+        for dimension, func in enumerate(nd_func.funcs):
+            for expression in factor_expressions(func, dimension):
+                if expression not in inputs and not _BASE_NAME.fullmatch(expression):
+                    expression = factors.setdefault(expression, f"f{len(factors)}")
+                names.append(expression)
+            if log_scales is not None:
+                signs.extend(
+                    factors.setdefault(expression, f"f{len(factors)}")
+                    for expression in _sign_expressions(func, dimension)
+                )
+        if log_scales is None:
+            terms.append(" * ".join([repr(float(coefficient))] + names))
+        else:
+            exponent = " + ".join(names + [repr(-float(log_scales[i]))])
+            terms.append(
+                " * ".join([repr(float(coefficient))] + signs + [f"np.exp({exponent})"])
+            )
+    return factors, terms
+
+
+def _base_lines(factors, terms, num_dimensions):
+    """Returns the assignments of the per-dimension bases the factors and terms use."""
+    used = set(re.findall(r"\w+", " ".join(list(factors) + terms)))
+    bases = [
+        (name.format(d=d), definition.format(d=d))
+        for d in range(num_dimensions)
+        for name, definition in _BASE_DEFINITIONS
+    ]
+    # Bases may be defined in terms of earlier ones, e.g. loglog from log.
+    for name, definition in reversed(bases):
+        if name in used:
+            used.update(re.findall(r"\w+", definition))
+    return [f"    {name} = {definition}" for name, definition in bases if name in used]
+
+
+def generate_source(coefficients, intercept, basis_functions, log_scales=None):
+    """Generates the source of a fused NumPy evaluator for a fitted model.
+
+    The returned function takes one array per input dimension. Every
+    distinct factor (a power, polylog or exponential of one input) is
+    evaluated once into a temporary and shared by all terms using it, and
+    log(n) is computed once per dimension for all polylog factors.
+
+    With `log_scales`, the coefficients are those fitted on log-normalized
+    columns and every term is evaluated in the log domain as
+    coef * exp(log f(x) - scale), so a term stays finite when its raw
+    coefficient underflows or its basis function overflows.
+    """
+    num_dimensions = len(basis_functions[0].funcs)
+    inputs = [f"x{d}" for d in range(num_dimensions)]
+    factors, terms = _term_expressions(
+        coefficients, basis_functions, log_scales, inputs
+    )
+    lines = [f"def evaluate({', '.join(inputs)}):"]
+    lines.extend(_base_lines(factors, terms, num_dimensions))
+    for expression, name in factors.items():
+        lines.append(f"    {name} = {expression}")
+    expression = " + ".join([repr(float(intercept))] + terms).replace("+ -", "- ")
+    lines.append(f"    return {expression}")
+    return "\n".join(lines) + "\n"
+
+
+class CompiledModel:
+    """A fitted complexity model compiled into a single NumPy function.
+
+    Unlike evaluating `NDBasisFunction`s and calling sklearn's `predict`,
+    no per-term design matrix is built: the generated function (see
+    `source`) computes shared factors once and sums the weighted terms.
+    Non-finite values only affect the rows producing them, rather than the
+    whole column as during the search.
+    """
+
+    def __init__(self, coefficients, intercept, basis_functions, log_scales=None):
+        self.coefficients = np.asarray(coefficients, dtype=np.float64)
+        self.intercept = float(intercept)
+        self.basis_functions = tuple(basis_functions)
+        self.log_scales = log_scales
+        self.num_dimensions = len(self.basis_functions[0].funcs)
+        self.source = generate_source(
+            self.coefficients, self.intercept, self.basis_functions, log_scales
+        )
+        namespace = {"np": np}
+        if "gamma" in self.source:
+            # scipy.special is only imported for models with factorial terms.
+            from scipy.special import gamma, gammaln, gammasgn
+
+            namespace.update(gamma=gamma, gammaln=gammaln, gammasgn=gammasgn)
+        exec(compile(self.source, "<compiled complexity model>", "exec"), namespace)
+        self._evaluate = namespace["evaluate"]
+
+    @classmethod
+    def from_estimator(cls, model, basis_functions):
+        """Compiles a fitted estimator, as returned by `find_best_model`."""
+        if getattr(model, "log_scales_", None) is not None:
+            return cls(
+                model.log_normalized_coef_,
+                model.intercept_,
+                basis_functions,
+                model.log_scales_,
+            )
+        return cls(model.coef_, model.intercept_, basis_functions)
+
+    @classmethod
+    def from_result(cls, result, rank=1):
+        """Compiles the model of `rank` from a `SearchResult` or its path."""
+        if not isinstance(result, SearchResult):
+            result = load_result(result)
+        parameters = result.parameters
+        one_d_funcs = list(
+            generate_1d_basis_functions(
+                parameters["p_values"], parameters["q_values"], parameters["X_values"]
+            )
+        )
+        model = result.models[rank - 1]
+        basis_functions = [
+            get_nd_basis_function(i, one_d_funcs, parameters["num_dimensions"])
+            for i in model["basis_ids"]
+        ]
+        if "log_scales" in model:
+            return cls(
+                model["log_normalized_coefficients"],
+                model["intercept"],
+                basis_functions,
+                model["log_scales"],
+            )
+        return cls(model["coefficients"], model["intercept"], basis_functions)
+
+    def __call__(self, X):
+        """Evaluates the model on the rows of a (rows, dimensions) array."""
+        X = np.asarray(X, dtype=np.float64).reshape(len(X), -1)
+        if X.shape[1] != self.num_dimensions:
+            raise ValueError(
+                f"Expected {self.num_dimensions} input columns, got {X.shape[1]}."
+            )
+        # Contiguous columns keep the element-wise kernels vectorized.
+        columns = np.ascontiguousarray(X.T)
+        with np.errstate(over="ignore", invalid="ignore", divide="ignore"):
+            values = self._evaluate(*columns)
+        return np.broadcast_to(values, len(X))
+
+
+def predict(model, X, chunksize=DEFAULT_PREDICT_CHUNKSIZE):
+    """Predicts the target for every row of `X`, `chunksize` rows at a time.
+
+    `model` is a `CompiledModel` or a `SearchResult` (whose best model is
+    compiled). Chunking keeps the temporaries small, so arbitrarily large,
+    e.g. memory-mapped, inputs are evaluated in bounded memory.
+    """
+    if isinstance(model, SearchResult):
+        model = CompiledModel.from_result(model)
+    predictions = np.empty(len(X), dtype=np.float64)
+    for start in range(0, len(X), chunksize):
+        predictions[start : start + chunksize] = model(X[start : start + chunksize])
+    return predictions
+
+
+def predict_chunks(model, chunks):
+    """Yields the predictions for each input chunk of an iterable of arrays."""
+    if isinstance(model, SearchResult):
+        model = CompiledModel.from_result(model)
+    for chunk in chunks:
+        yield model(chunk)
@@ -1,7 +1,11 @@
 import argparse
+import itertools
 from nd_r_complexity.search import (
-    generate_basis_function_combinations,
     count_basis_function_combinations,
+    count_nd_basis_functions,
+    generate_1d_basis_functions,
+    get_nd_basis_function,
+    unrank_combination,
 )
 from . import constants
 
@@ -18,14 +22,22 @@ def print_functions(
     if total_only:
         return
 
-    basis_combinations = generate_basis_function_combinations(
-        num_dimensions, num_terms, p_values, q_values, X_values
+    # Only the printed combinations are unranked and rendered.
+    one_d_funcs = list(generate_1d_basis_functions(p_values, q_values, X_values))
+    num_nd_functions = count_nd_basis_functions(
+        num_dimensions, p_values, q_values, X_values
     )
-
-    for i, basis_combination in enumerate(basis_combinations):
-        if i % 1000000 == 0 or i == 0 or i == total_combinations - 1:
-            print(f"\n--- Combination {i} ---")
-            print(" + ".join([str(func) for func in basis_combination]))
+    printed = range(0, total_combinations, 1000000)
+    if total_combinations and (total_combinations - 1) % 1000000:
+        # The range is iterated lazily; the last combination is added once.
+        printed = itertools.chain(printed, [total_combinations - 1])
+    for i in printed:
+        basis_combination = [
+            get_nd_basis_function(index, one_d_funcs, num_dimensions)
+            for index in unrank_combination(i, num_nd_functions, num_terms)
+        ]
+        print(f"\n--- Combination {i} ---")
+        print(" + ".join([str(func) for func in basis_combination]))
 
 
 def main():
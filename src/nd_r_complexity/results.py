@@ -0,0 +1,150 @@
+import json
+import os
+
+import numpy as np
+
+RESULT_FORMAT_VERSION = 1
+# The per-model error: the MSE, or the weighted MSE of weighted searches.
+_ERROR_FIELDS = ("mse", "weighted_mse")
+# Per-model numeric fields, stored as flat arrays in the binary form.
+_RAGGED_FIELDS = (
+    "coefficients",
+    "basis_ids",
+    "log_normalized_coefficients",
+    "log_scales",
+)
+
+
+class SearchResult:
+    """The ranked models of a search, with its parameters and statistics.
+
+    Each model is a dict with its "rank", "mse", "coefficients", "intercept",
+    ND "basis_ids" and rendered "formula", its selection "score" for
+    criteria other than the MSE (and, for log-space searches, the
+    "log_normalized_coefficients" and column "log_scales"), holding only
+    plain numbers, lists and strings. Searches with row weights store the
+    weighted MSE they minimize under "weighted_mse" instead of "mse". Results are written as JSON, or, for
+    paths ending in .npz, as a compact numpy archive that loads without
+    pickle.
+    """
+
+    def __init__(self, models, parameters=None, statistics=None):
+        self.models = models
+        self.parameters = parameters or {}
+        self.statistics = statistics or {}
+
+    @classmethod
+    def from_ranked(cls, ranked, parameters=None, metrics=None):
+        """Builds a result from the ranked entries of `search_models`.
+
+        The errors are weighted MSEs when `parameters` has "weights".
+        """
+        weighted = (parameters or {}).get("weights") is not None
+        models = []
+        for rank, entry in enumerate(ranked, start=1):
+            model = {
+                "rank": rank,
+                "weighted_mse" if weighted else "mse": float(entry["error"]),
+                "coefficients": np.asarray(entry["model"].coef_, float).tolist(),
+                "intercept": float(entry["model"].intercept_),
+                "basis_ids": [int(i) for i in entry["basis_ids"]],
+                "formula": " + ".join(str(f) for f in entry["basis_functions"]),
+            }
+            if "score" in entry:
+                model["score"] = float(entry["score"])
+            if "log_scales" in entry:
+                model["log_normalized_coefficients"] = np.asarray(
+                    entry["log_normalized_coef"], float
+                ).tolist()
+                model["log_scales"] = np.asarray(entry["log_scales"], float).tolist()
+            models.append(model)
+        statistics = metrics.to_dict() if metrics is not None else None
+        return cls(models, parameters, statistics)
+
+    @property
+    def best(self):
+        """Returns the best-ranked model."""
+        return self.models[0]
+
+    def to_dict(self):
+        return {
+            "format_version": RESULT_FORMAT_VERSION,
+            "models": self.models,
+            "parameters": self.parameters,
+            "statistics": self.statistics,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        if data.get("format_version") != RESULT_FORMAT_VERSION:
+            raise ValueError(
+                f"Unsupported result format version {data.get('format_version')}."
+            )
+        return cls(data["models"], data["parameters"], data["statistics"])
+
+    def to_arrays(self):
+        """Returns the result as a dict of numpy arrays.
+
+        Per-model numeric fields are concatenated into flat arrays split by
+        `offsets`; the remaining fields are kept as a JSON header.
+        """
+        lengths = [len(model["basis_ids"]) for model in self.models]
+        arrays = {
+            "offsets": np.cumsum([0] + lengths, dtype=np.int64),
+            "intercept": np.array(
+                [model["intercept"] for model in self.models], np.float64
+            ),
+        }
+        for field in _ERROR_FIELDS:
+            if all(field in model for model in self.models):
+                arrays[field] = np.array(
+                    [model[field] for model in self.models], np.float64
+                )
+        for field in _RAGGED_FIELDS:
+            if all(field in model for model in self.models):
+                dtype = np.int64 if field == "basis_ids" else np.float64
+                arrays[field] = np.array(
+                    [value for model in self.models for value in model[field]], dtype
+                )
+        header = self.to_dict()
+        header["models"] = [
+            {
+                name: model[name]
+                for name in ("rank", "formula", "score")
+                if name in model
+            }
+            for model in self.models
+        ]
+        arrays["header"] = np.frombuffer(json.dumps(header).encode(), np.uint8)
+        return arrays
+
+    @classmethod
+    def from_arrays(cls, arrays):
+        data = json.loads(bytes(np.asarray(arrays["header"])).decode())
+        offsets = arrays["offsets"]
+        for i, model in enumerate(data["models"]):
+            for field in _ERROR_FIELDS:
+                if field in arrays:
+                    model[field] = float(arrays[field][i])
+            model["intercept"] = float(arrays["intercept"][i])
+            for field in _RAGGED_FIELDS:
+                if field in arrays:
+                    model[field] = arrays[field][offsets[i] : offsets[i + 1]].tolist()
+        return cls.from_dict(data)
+
+    def write(self, path):
+        """Writes the result as .npz if `path` ends in .npz, else as JSON."""
+        if os.path.splitext(path)[1].lower() == ".npz":
+            np.savez_compressed(path, **self.to_arrays())
+        else:
+            with open(path, "w") as f:
+                json.dump(self.to_dict(), f, indent=2)
+
+
+def load_result(path):
+    """Reads a result written by `SearchResult.write`."""
+    if os.path.splitext(path)[1].lower() == ".npz":
+        with np.load(path, allow_pickle=False) as arrays:
+            return SearchResult.from_arrays(dict(arrays))
+    with open(path) as f:
+        return SearchResult.from_dict(json.load(f))
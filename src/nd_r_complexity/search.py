@@ -1,7 +1,12 @@
+import functools
 import itertools
+import math
 import random
+import sys
 import numpy as np
-from scipy.special import gamma
+
+# math.comb is only available from Python 3.8.
+_comb = getattr(math, "comb", None)
 
 
 # 1-D Basis Functions
@@ -12,6 +17,17 @@ class BasisFunction:
     def __call__(self, n):
         raise NotImplementedError
 
+    def log_value(self, n):
+        """Returns log|f(n)|, or NaN where f(n) is undefined.
+
+        Together with `log_sign`, f(n) = log_sign(n) * exp(log_value(n)).
+        """
+        raise NotImplementedError
+
+    def log_sign(self, n):
+        """Returns the sign of f(n) to go with `log_value`, NaN where undefined."""
+        return np.ones_like(n, dtype=np.float64)
+
     def __str__(self, dimension_index=None):
         if dimension_index is not None:
             return self.name_template.replace("n", f"n_{dimension_index+1}")
@@ -26,6 +42,12 @@ class Polynomial(BasisFunction):
     def __call__(self, n):
         return n**self.p
 
+    def log_value(self, n):
+        if self.p == 0:
+            return np.zeros_like(n, dtype=np.float64)
+        with np.errstate(divide="ignore"):
+            return self.p * np.log(n)
+
 
 class Polylog(BasisFunction):
     def __init__(self, q):
@@ -36,6 +58,20 @@ class Polylog(BasisFunction):
         # Avoid log(0)
         return np.log(n + 1e-9) ** self.q
 
+    def log_value(self, n):
+        if self.q == 0:
+            return np.zeros_like(n, dtype=np.float64)
+        with np.errstate(divide="ignore"):
+            return self.q * np.log(np.abs(np.log(n + 1e-9)))
+
+    def log_sign(self, n):
+        log_n = np.log(n + 1e-9)
+        if float(self.q).is_integer():
+            # Negative for odd q where n < 1.
+            return np.sign(log_n) ** int(self.q)
+        # Non-integer powers of log(n) < 0 are NaN, as in __call__.
+        return np.where(log_n < 0, np.nan, 1.0)
+
 
 class Exponential(BasisFunction):
     def __init__(self, X):
@@ -45,14 +81,30 @@ class Exponential(BasisFunction):
     def __call__(self, n):
         return self.X**n
 
+    def log_value(self, n):
+        return n * np.log(self.X)
+
 
 class Factorial(BasisFunction):
     def __init__(self):
         super().__init__("Gamma(n)")
 
+    # scipy.special is imported on first use to keep the CLI startup fast.
     def __call__(self, n):
+        from scipy.special import gamma
+
         return gamma(n + 1)
 
+    def log_value(self, n):
+        from scipy.special import gammaln
+
+        return gammaln(n + 1)
+
+    def log_sign(self, n):
+        from scipy.special import gammasgn
+
+        return gammasgn(n + 1)
+
 
 class MixedBasisFunction(BasisFunction):
     def __init__(self, funcs):
@@ -62,15 +114,20 @@ class MixedBasisFunction(BasisFunction):
 
     def __call__(self, n):
         res = np.ones_like(n, dtype=np.float64)
-        for f in self.funcs:
-            term = f(n)
-            if np.any(np.isnan(term)) or np.any(np.isinf(term)):
-                return np.full_like(res, np.nan)
-            res *= term
-            if np.any(np.isnan(res)) or np.any(np.isinf(res)):
-                return np.full_like(res, np.nan)
+        with np.errstate(over="ignore", invalid="ignore"):
+            for f in self.funcs:
+                res *= f(n)
+        # Any non-finite factor leaves the product non-finite, so one check suffices.
+        if not np.isfinite(res).all():
+            return np.full_like(res, np.nan)
         return res
 
+    def log_value(self, n):
+        return sum(f.log_value(n) for f in self.funcs)
+
+    def log_sign(self, n):
+        return np.prod([f.log_sign(n) for f in self.funcs], axis=0)
+
 
 # N-Dimensional Basis Functions
 class NDBasisFunction:
@@ -79,15 +136,23 @@ class NDBasisFunction:
 
     def __call__(self, *args):
         res = np.ones_like(args[0], dtype=np.float64)
-        for i, arg in enumerate(args):
-            term = self.funcs[i](arg)
-            if np.any(np.isnan(term)) or np.any(np.isinf(term)):
-                return np.full_like(res, np.nan)
-            res *= term
-            if np.any(np.isnan(res)) or np.any(np.isinf(res)):
-                return np.full_like(res, np.nan)
+        with np.errstate(over="ignore", invalid="ignore"):
+            for i, arg in enumerate(args):
+                res *= self.funcs[i](arg)
+        if not np.isfinite(res).all():
+            return np.full_like(res, np.nan)
         return res
 
+    def log_value(self, *args):
+        """Returns the log-magnitude of the product as a sum of per-dimension terms."""
+        return sum(self.funcs[i].log_value(arg) for i, arg in enumerate(args))
+
+    def log_sign(self, *args):
+        """Returns the sign of the product, to go with `log_value`."""
+        return np.prod(
+            [self.funcs[i].log_sign(arg) for i, arg in enumerate(args)], axis=0
+        )
+
     def __str__(self):
 
         return " * ".join(
@@ -123,11 +188,40 @@ def generate_nd_basis_functions(num_dimensions, p_values, q_values, X_values):
         yield NDBasisFunction(list(combo))
 
 
+@functools.lru_cache(maxsize=None)
+def nd_basis_codes(num_1d_functions, num_dimensions):
+    """Encodes every ND basis function as a row of 1-D basis function ids.
+
+    Row i of the returned (M, num_dimensions) array holds the indices into
+    `generate_1d_basis_functions` of the i-th function yielded by
+    `generate_nd_basis_functions`. The table is built once per process for
+    each configuration and shared read-only between searches.
+    """
+    dtype = np.uint16 if num_1d_functions <= np.iinfo(np.uint16).max else np.uint32
+    codes = np.indices((num_1d_functions,) * num_dimensions, dtype=dtype)
+    codes = codes.reshape(num_dimensions, -1).T
+    codes.flags.writeable = False
+    return codes
+
+
+def get_nd_basis_function(index, one_d_funcs, num_dimensions):
+    """Returns the ND basis function at `index` of `generate_nd_basis_functions`."""
+    funcs = []
+    for _ in range(num_dimensions):
+        index, digit = divmod(index, len(one_d_funcs))
+        funcs.append(one_d_funcs[digit])
+    # itertools.product varies the last dimension fastest.
+    return NDBasisFunction(funcs[::-1])
+
+
 
 def n_choose_k(n, k):
     """Calculates the number of combinations (n choose k)."""
     if k < 0 or k > n:
         return 0
+    if _comb is not None:
+        # Ranking and unranking call this in their inner loops.
+        return _comb(n, k)
     if k == 0 or k == n:
         return 1
     if k > n // 2:
@@ -139,6 +233,195 @@ def n_choose_k(n, k):
     return result
 
 
+def rank_combination(combination, num_items):
+    """Returns the lexicographic index of a sorted combination of range(num_items).
+
+    Uses the combinatorial number system, so the index matches the position
+    of the combination in `itertools.combinations(range(num_items), k)`.
+    """
+    num_terms = len(combination)
+    colex_rank = sum(
+        n_choose_k(num_items - 1 - item, num_terms - i)
+        for i, item in enumerate(combination)
+    )
+    return n_choose_k(num_items, num_terms) - 1 - colex_rank
+
+
+def _largest_item(bound, size, upper):
+    """Returns the largest a < upper with C(a, size) <= bound.
+
+    C(a, size) is close to (a - (size - 1) / 2)^size / size!, so the binary
+    search over [size - 1, upper) is narrowed to a couple of items around
+    that estimate whenever it holds, which is almost always.
+    """
+    low, high = size - 1, upper - 1
+    bound = int(bound)
+    if bound > 0:
+        try:
+            log_estimate = (math.log(bound) + math.lgamma(size + 1)) / size
+            estimate = int(math.exp(log_estimate) + (size - 1) / 2)
+        except OverflowError:
+            estimate = high
+        estimate = min(max(estimate, low), high)
+        if n_choose_k(estimate, size) <= bound:
+            low = estimate
+            if estimate + 2 <= high and n_choose_k(estimate + 2, size) > bound:
+                high = estimate + 1
+        else:
+            high = estimate - 1
+            if estimate - 2 >= low and n_choose_k(estimate - 2, size) <= bound:
+                low = estimate - 2
+    while low < high:
+        mid = (low + high + 1) // 2
+        if n_choose_k(mid, size) <= bound:
+            low = mid
+        else:
+            high = mid - 1
+    return low
+
+
+def unrank_combination(index, num_items, num_terms):
+    """Returns the combination of range(num_items) at a lexicographic index."""
+    total = n_choose_k(num_items, num_terms)
+    if not 0 <= index < total:
+        raise IndexError(f"Combination index {index} out of range [0, {total}).")
+    remainder = total - 1 - index
+    combination = []
+    upper = num_items
+    for i in range(num_terms):
+        size = num_terms - i
+        low = _largest_item(remainder, size, upper)
+        remainder -= n_choose_k(low, size)
+        combination.append(num_items - 1 - low)
+        upper = low
+    return tuple(combination)
+
+
+def iter_combinations(num_items, num_terms, start=0, stop=None):
+    """Iterates the [start, stop) slice of the lexicographic combination order.
+
+    Only the first combination is unranked; the rest follow by successor
+    steps, so the setup cost does not depend on `start`.
+    """
+    total = n_choose_k(num_items, num_terms)
+    stop = total if stop is None else min(stop, total)
+    if start >= stop:
+        return
+    combination = list(unrank_combination(start, num_items, num_terms))
+    for _ in range(stop - start - 1):
+        yield tuple(combination)
+        i = num_terms - 1
+        while combination[i] == num_items - num_terms + i:
+            i -= 1
+        combination[i] += 1
+        for j in range(i + 1, num_terms):
+            combination[j] = combination[j - 1] + 1
+    yield tuple(combination)
+
+
+def rank_revolving_door(combination):
+    """Returns the index of a sorted combination in the revolving-door order.
+
+    The order is defined recursively as R(n, k) = R(n - 1, k) followed by
+    reversed R(n - 1, k - 1) with n - 1 appended, so consecutive combinations
+    differ by swapping a single item and the index does not depend on n.
+    """
+    rank, sign = 0, 1
+    for size in range(len(combination), 0, -1):
+        largest = combination[size - 1]
+        rank += sign * (n_choose_k(largest, size) + n_choose_k(largest, size - 1) - 1)
+        sign = -sign
+    return rank
+
+
+def unrank_revolving_door(index, num_items, num_terms):
+    """Returns the combination of range(num_items) at a revolving-door index."""
+    total = n_choose_k(num_items, num_terms)
+    if not 0 <= index < total:
+        raise IndexError(f"Combination index {index} out of range [0, {total}).")
+    combination = [0] * num_terms
+    upper = num_items
+    for size in range(num_terms, 0, -1):
+        low = _largest_item(index, size, upper)
+        combination[size - 1] = low
+        index = n_choose_k(low, size) + n_choose_k(low, size - 1) - 1 - index
+        upper = low
+    return tuple(combination)
+
+
+def _revolving_door_next(combination):
+    size = len(combination)
+    largest, head = combination[-1], combination[:-1]
+    if size == 1:
+        return [largest + 1]
+    if head != list(range(size - 1)):
+        return _revolving_door_previous(head) + [largest]
+    return list(range(size - 2)) + [largest, largest + 1]
+
+
+def _revolving_door_previous(combination):
+    size = len(combination)
+    largest, head = combination[-1], combination[:-1]
+    if size == 1:
+        return [largest - 1]
+    if head != list(range(size - 2)) + [largest - 1]:
+        return _revolving_door_next(head) + [largest]
+    return list(range(size - 1)) + [largest - 1]
+
+
+def iter_revolving_door(num_items, num_terms, start=0, stop=None):
+    """Iterates the [start, stop) slice of the revolving-door combination order.
+
+    Consecutive combinations share all but one item, which lets solvers
+    update a factorization instead of recomputing it.
+    """
+    total = n_choose_k(num_items, num_terms)
+    stop = total if stop is None else min(stop, total)
+    if start >= stop:
+        return
+    combination = list(unrank_revolving_door(start, num_items, num_terms))
+    for _ in range(stop - start - 1):
+        yield tuple(combination)
+        combination = _revolving_door_next(combination)
+    yield tuple(combination)
+
+
+def count_combinations_up_to(num_items, num_terms):
+    """Calculates the number of combinations of 1 to num_terms items."""
+    return sum(n_choose_k(num_items, size) for size in range(1, num_terms + 1))
+
+
+def unrank_sized_combination(index, num_items, num_terms):
+    """Returns the combination at `index` of all 1..num_terms item combinations.
+
+    Combinations are ordered by size first and lexicographically within a size.
+    """
+    for size in range(1, num_terms + 1):
+        count = n_choose_k(num_items, size)
+        if index < count:
+            return unrank_combination(index, num_items, size)
+        index -= count
+    raise IndexError("Combination index out of range.")
+
+
+def sample_combination_indices(num_items, num_terms, num_samples, seed=None):
+    """Uniformly samples distinct, sorted indices for `unrank_sized_combination`.
+
+    Sampling happens over the index range, so neither the basis functions
+    nor their combinations are ever materialized.
+    """
+    total = count_combinations_up_to(num_items, num_terms)
+    rng = random.Random(seed)
+    if total <= sys.maxsize:
+        return sorted(rng.sample(range(total), min(num_samples, total)))
+    # range() objects longer than sys.maxsize cannot be sampled; with that
+    # many combinations, redrawing duplicates almost never happens.
+    samples = set()
+    while len(samples) < num_samples:
+        samples.add(rng.randrange(total))
+    return sorted(samples)
+
+
 def count_1d_basis_functions(p_values, q_values, X_values):
     """Calculates the number of 1D basis functions."""
     num_elementary = len(p_values) + len(q_values) + len(X_values) + 1
@@ -171,17 +454,13 @@ def generate_basis_function_combinations(
 
 
 def generate_random_basis_function_combinations(
-    num_dimensions, num_terms, p_values, q_values, X_values, num_samples
+    num_dimensions, num_terms, p_values, q_values, X_values, num_samples, seed=None
 ):
-    basis_functions = generate_nd_basis_functions(
-        num_dimensions, p_values, q_values, X_values
-    )
-
-    basis_function_combinations = []
-    for _ in range(num_samples):
-        num_selected_terms = random.randint(1, num_terms)
-        basis_function_combinations.append(
-            tuple(random.sample(basis_functions, num_selected_terms))
+    """Generates distinct random combinations of 1 to num_terms basis functions."""
+    one_d_funcs = list(generate_1d_basis_functions(p_values, q_values, X_values))
+    num_items = count_nd_basis_functions(num_dimensions, p_values, q_values, X_values)
+    for index in sample_combination_indices(num_items, num_terms, num_samples, seed):
+        yield tuple(
+            get_nd_basis_function(i, one_d_funcs, num_dimensions)
+            for i in unrank_sized_combination(index, num_items, num_terms)
         )
-
-    return basis_function_combinations
@@ -0,0 +1,184 @@
+import numpy as np
+
+from .gram import MAX_CONDITION_NUMBER, column_sub_grams, gram_fits
+
+CRITERIA = ("mse", "aic", "bic", "cv", "loo")
+# Bounds the (combinations, rows, terms) arrays of the leave-one-out scores.
+LOO_BATCH_CELLS = 2**22
+
+
+def information_criterion(errors, num_samples, num_terms, criterion):
+    """Returns the AIC or BIC of fits given their MSE and number of terms.
+
+    Both count the intercept as a parameter; MSE ranks the same as either
+    among combinations with the same number of terms.
+    """
+    errors = np.asarray(errors, dtype=np.float64)
+    num_parameters = num_terms + 1
+    penalty = 2.0 if criterion == "aic" else np.log(num_samples)
+    with np.errstate(divide="ignore"):
+        log_likelihood = num_samples * np.log(
+            np.maximum(errors, np.finfo(np.float64).tiny)
+        )
+    return log_likelihood + penalty * num_parameters
+
+
+def _batch_solve(sub_gram, sub_moment):
+    """Solves a batch of normal equations, with a pseudo-inverse fallback."""
+    coef = np.empty(sub_moment.shape)
+    # The matrices are symmetric, so their eigenvalues give the condition
+    # number at about half the cost of the SVD in np.linalg.cond.
+    eigenvalues = np.linalg.eigvalsh(sub_gram)
+    well_conditioned = (eigenvalues[..., 0] > 0) & (
+        eigenvalues[..., -1] < MAX_CONDITION_NUMBER * eigenvalues[..., 0]
+    )
+    coef[well_conditioned] = np.linalg.solve(
+        sub_gram[well_conditioned], sub_moment[well_conditioned][..., None]
+    )[..., 0]
+    if not well_conditioned.all():
+        # Same cutoff as GramStatistics.solve without the columns.
+        pseudo_inverse = np.linalg.pinv(
+            sub_gram[~well_conditioned], rcond=1e-12, hermitian=True
+        )
+        coef[~well_conditioned] = np.einsum(
+            "...ij,...j->...i", pseudo_inverse, sub_moment[~well_conditioned]
+        )
+    return coef
+
+
+class CrossValidationStatistics:
+    """Scores combinations by cross-validated MSE from statistics built once.
+
+    With `num_folds`, rows are shuffled into folds and the sums of each
+    fold's normalized columns, their cross-products and their products with
+    y are accumulated in a single pass. A fold's training statistics are the
+    full `GramStatistics` minus the fold's sums, so every combination is
+    scored from k x k sub-blocks without touching the rows again; this keeps
+    `num_folds` Gram-sized arrays, or when those exceed `MAX_GRAM_BYTES`,
+    the rows of each fold, from which the sub-blocks are computed. With
+    `num_folds=None`, the leave-one-out MSE is computed from the full fit
+    with the hat-matrix shortcut e_i / (1 - h_ii), which needs the
+    normalized columns.
+
+    Like `GramStatistics`, `batch_errors` and `error` score combinations and
+    `fit` refits one on all rows, so it can stand in for the fit data.
+    """
+
+    def __init__(self, stats, num_folds=5, seed=0):
+        if stats.centered is None:
+            raise ValueError("Cross-validation requires the normalized columns.")
+        self.stats = stats
+        self.valid = stats.valid
+        self.num_samples = stats.num_samples
+        self.num_folds = num_folds
+        if num_folds is None:
+            return
+        if num_folds < 2:
+            raise ValueError("Cross-validation requires at least 2 folds.")
+        num_folds = min(num_folds, self.num_samples)
+        rng = np.random.default_rng(seed)
+        folds = rng.permutation(self.num_samples) % num_folds
+        num_columns = stats.centered.shape[1]
+        self.fold_size = np.bincount(folds, minlength=num_folds)
+        self.fold_sum = np.empty((num_folds, num_columns))
+        if gram_fits(num_columns, num_folds):
+            self.fold_gram = np.empty((num_folds, num_columns, num_columns))
+            self.fold_columns = None
+        else:
+            self.fold_gram = None
+            self.fold_columns = []
+        self.fold_moment = np.empty((num_folds, num_columns))
+        self.fold_y_sum = np.empty(num_folds)
+        self.fold_y_squares = np.empty(num_folds)
+        for fold in range(num_folds):
+            columns = stats.centered[folds == fold]
+            y_centered = stats.y_centered[folds == fold]
+            self.fold_sum[fold] = columns.sum(axis=0)
+            if self.fold_gram is None:
+                self.fold_columns.append(np.asfortranarray(columns))
+            else:
+                self.fold_gram[fold] = columns.T @ columns
+            self.fold_moment[fold] = columns.T @ y_centered
+            self.fold_y_sum[fold] = y_centered.sum()
+            self.fold_y_squares[fold] = y_centered @ y_centered
+
+    def batch_errors(self, index_array):
+        """Returns the cross-validated MSE of every combination in a batch."""
+        index_array = np.asarray(index_array, dtype=np.intp)
+        errors = np.full(len(index_array), np.inf)
+        valid = self.valid[index_array].all(axis=1)
+        rows = index_array[valid]
+        if not len(rows):
+            return errors
+        if self.num_folds is None:
+            errors[valid] = self._leave_one_out_errors(rows)
+        else:
+            errors[valid] = self._k_fold_errors(rows)
+        return errors
+
+    def error(self, column_indices):
+        """Returns the cross-validated MSE of one combination."""
+        return float(self.batch_errors(np.asarray([column_indices]))[0])
+
+    def fit(self, column_indices):
+        """Fits a combination on all rows; the error is the training MSE."""
+        return self.stats.fit(column_indices)
+
+    def _k_fold_errors(self, rows):
+        stats = self.stats
+        sub_gram = stats.sub_grams(rows)
+        sub_moment = stats.moment[rows]
+        # Arrays are (fold, combination, ...).
+        if self.fold_gram is None:
+            fold_gram = np.stack(
+                [column_sub_grams(columns, rows) for columns in self.fold_columns]
+            )
+        else:
+            fold_gram = self.fold_gram[:, rows[:, :, None], rows[:, None, :]]
+        fold_sum = self.fold_sum[:, rows]
+        fold_moment = self.fold_moment[:, rows]
+        fold_size = self.fold_size[:, None]
+        fold_y_sum = self.fold_y_sum[:, None]
+        train_size = self.num_samples - fold_size
+        # The full sums of the globally centered columns and y are zero.
+        train_mean = -fold_sum / train_size[..., None]
+        train_y_mean = -fold_y_sum / train_size
+        train_gram = (sub_gram - fold_gram) - train_size[..., None, None] * (
+            train_mean[..., :, None] * train_mean[..., None, :]
+        )
+        train_moment = (sub_moment - fold_moment) - train_size[
+            ..., None
+        ] * train_mean * train_y_mean[..., None]
+        coef = _batch_solve(train_gram, train_moment)
+        intercept = train_y_mean - np.einsum("fbk,fbk->fb", train_mean, coef)
+        # Held-out sum of (y - intercept - x'coef)^2, expanded over fold sums.
+        held_out = (
+            self.fold_y_squares[:, None]
+            - 2 * intercept * fold_y_sum
+            - 2 * np.einsum("fbk,fbk->fb", coef, fold_moment)
+            + fold_size * intercept**2
+            + 2 * intercept * np.einsum("fbk,fbk->fb", coef, fold_sum)
+            + np.einsum("fbi,fbij,fbj->fb", coef, fold_gram, coef)
+        )
+        return np.maximum(held_out, 0.0).sum(axis=0) / self.num_samples
+
+    def _leave_one_out_errors(self, rows):
+        stats = self.stats
+        num_terms = rows.shape[1]
+        step = max(1, LOO_BATCH_CELLS // (self.num_samples * num_terms))
+        errors = np.empty(len(rows))
+        for start in range(0, len(rows), step):
+            batch = rows[start : start + step]
+            sub_gram = stats.sub_grams(batch)
+            coef = _batch_solve(sub_gram, stats.moment[batch])
+            design = np.moveaxis(stats.centered[:, batch], 0, 1)
+            residual = stats.y_centered - np.einsum("bnk,bk->bn", design, coef)
+            inverse = np.linalg.pinv(sub_gram, rcond=1e-12, hermitian=True)
+            # The intercept adds 1/n to the leverage of centered columns.
+            leverage = 1 / self.num_samples + np.einsum(
+                "bni,bij,bnj->bn", design, inverse, design
+            )
+            with np.errstate(divide="ignore", invalid="ignore"):
+                press = np.sum((residual / (1 - leverage)) ** 2, axis=1)
+            errors[start : start + step] = press / self.num_samples
+        return errors
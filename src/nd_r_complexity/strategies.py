@@ -0,0 +1,237 @@
+import numpy as np
+
+from .top_k import TopK
+
+# Candidates whose normalized column is this close to the span of the
+# selected columns would make the subset rank-deficient and are skipped.
+MIN_RESIDUAL_NORM = 1e-6
+
+
+def _check_num_terms(num_terms, num_columns):
+    # Grid search finds no combination in this case; fail the same way
+    # rather than returning smaller subsets.
+    if num_terms > num_columns:
+        raise ValueError("No combination of basis functions could be fitted.")
+
+
+def _extension_errors(stats, selected, candidates):
+    """Returns the MSE of `selected` plus each candidate, by orthogonal projection.
+
+    With Q an orthonormal basis of the selected columns and r the current
+    residual, adding column z lowers the RSS by (z'r)^2 / |z'|^2 where z' is
+    z projected off Q. This costs O(n * M * k) and never forms a Gram matrix.
+    """
+    residual = stats.y_centered
+    columns = stats.centered[:, candidates]
+    if selected:
+        q, _ = np.linalg.qr(stats.centered[:, selected])
+        residual = residual - q @ (q.T @ residual)
+        columns = columns - q @ (q.T @ columns)
+    squared_norms = np.einsum("ij,ij->j", columns, columns)
+    rss = residual @ residual
+    with np.errstate(divide="ignore", invalid="ignore"):
+        new_rss = rss - (columns.T @ residual) ** 2 / squared_norms
+    new_rss[squared_norms < MIN_RESIDUAL_NORM**2] = np.inf
+    return np.maximum(new_rss, 0.0) / stats.num_samples, columns.T @ residual
+
+
+def stepwise_search(stats, num_terms, top_k=1, method="forward", backward=False):
+    """Selects basis columns one at a time from the normalized cached columns.
+
+    `method="forward"` adds the column giving the lowest MSE at each step,
+    while `method="omp"` adds the column most correlated with the current
+    residual, as in orthogonal matching pursuit. With `backward=True`,
+    every addition is followed by floating backward pruning: a column is
+    dropped while that beats the best subset of the smaller size seen so far.
+
+    Returns the top-K subsets of `num_terms` columns among those evaluated,
+    and the number of candidate subsets that were scored. Raises ValueError
+    when there are fewer columns than `num_terms`.
+    """
+    if method not in ("forward", "omp"):
+        raise ValueError("Invalid stepwise method. Choose 'forward' or 'omp'.")
+    num_columns = stats.centered.shape[1]
+    _check_num_terms(num_terms, num_columns)
+    best = TopK(top_k)
+    best_error_by_size = {}
+    selected = []
+    num_scored = 0
+    # Floating pruning can revisit sizes; bound the number of steps.
+    for _ in range(4 * num_terms * num_terms + num_terms):
+        if len(selected) == num_terms:
+            break
+        candidates = np.setdiff1d(np.arange(num_columns), selected)
+        errors, correlation = _extension_errors(stats, selected, candidates)
+        num_scored += len(candidates)
+        if method == "forward":
+            choice = int(np.argmin(errors))
+        else:
+            # Normalized columns make |z'r| a correlation with the residual.
+            correlation[~np.isfinite(errors)] = 0.0
+            choice = int(np.argmax(np.abs(correlation)))
+        if not np.isfinite(errors[choice]):
+            break
+        extended = [sorted(selected + [int(c)]) for c in candidates]
+        if len(selected) + 1 == num_terms:
+            best.push_many(errors, extended)
+        selected = extended[choice]
+        size = len(selected)
+        best_error_by_size[size] = min(
+            best_error_by_size.get(size, np.inf), errors[choice]
+        )
+
+        while backward and len(selected) > 2:
+            reduced = [selected[:i] + selected[i + 1 :] for i in range(len(selected))]
+            reduced_errors = [stats.solve(r)[1] / stats.num_samples for r in reduced]
+            num_scored += len(reduced)
+            drop = int(np.argmin(reduced_errors))
+            size = len(selected) - 1
+            if reduced_errors[drop] >= best_error_by_size.get(size, np.inf) * (
+                1 - 1e-12
+            ):
+                break
+            selected = reduced[drop]
+            best_error_by_size[size] = reduced_errors[drop]
+    return best, num_scored
+
+
+def _square_root_columns(stats):
+    """Returns columns A and a target t with A'A, A't and t't the Gram statistics.
+
+    Least squares on (A, t) has the same RSS as on the normalized columns,
+    but A has at most one row per column plus one, whatever the number of
+    samples.
+    """
+    if stats.centered is not None:
+        augmented = np.column_stack([stats.centered, stats.y_centered])
+        if len(augmented) > augmented.shape[1]:
+            augmented = np.linalg.qr(augmented, mode="r")
+    else:
+        # Streamed statistics keep no rows; factor the augmented Gram matrix.
+        num_columns = len(stats.moment)
+        gram = np.empty((num_columns + 1, num_columns + 1))
+        gram[:-1, :-1] = stats.gram
+        gram[:-1, -1] = gram[-1, :-1] = stats.moment
+        gram[-1, -1] = stats.total_sum_of_squares
+        eigenvalues, eigenvectors = np.linalg.eigh(gram)
+        augmented = np.sqrt(np.maximum(eigenvalues, 0.0))[:, None] * eigenvectors.T
+    return augmented[:, :-1], augmented[:, -1]
+
+
+def _suffix_bounds(columns, target, selected, tail):
+    """Returns the RSS of `selected` plus each suffix tail[i:], for every i.
+
+    The columns are orthogonalized once in the order selected, tail[-1],
+    tail[-2], ..., so the RSS of every nested suffix is read off a single QR
+    decomposition. The span of the first j orthogonal columns contains the
+    first j columns, so the values never exceed the exact RSS and remain
+    valid lower bounds when columns are collinear.
+    """
+    ordered = np.concatenate([np.asarray(selected, dtype=np.intp), tail[::-1]])
+    q, _ = np.linalg.qr(columns[:, ordered])
+    explained = np.cumsum((q.T @ target) ** 2)
+    # The union with tail[i:] is the first len(ordered) - i ordered columns.
+    num_ordered = len(ordered) - np.arange(len(tail))
+    rss = target @ target - explained[np.minimum(num_ordered, len(explained)) - 1]
+    return np.maximum(rss, 0.0)
+
+
+def _exceeds_incumbent(best, bound):
+    """Returns whether `bound` exceeds the K-th best MSE kept in `best`."""
+    if len(best) < best.k:
+        return False
+    # The tolerance keeps ties with the incumbent, so the result matches the
+    # grid including its tie-breaking.
+    return bound > best.items()[-1][0] * (1 + 1e-9) + 1e-12
+
+
+def _score_completions(stats, best, counters, selected, candidates):
+    """Scores `selected` completed by each row of `candidates` in one batch."""
+    index_array = np.empty(
+        (len(candidates), len(selected) + candidates.shape[1]), dtype=np.intp
+    )
+    index_array[:, : len(selected)] = selected
+    index_array[:, len(selected) :] = candidates
+    index_array.sort(axis=1)
+    best.push_many(stats.batch_errors(index_array), index_array)
+    counters["scored"] += len(candidates)
+
+
+def _score_pair_completions(stats, best, counters, selected, order, start, bounds):
+    """Scores the completions of `selected` by two columns of order[start:].
+
+    Each child adding order[position] is a node whose completions are
+    pruned when its bound exceeds the incumbent; the completions of every
+    surviving child are scored in a single batch.
+    """
+    pairs = []
+    for position in range(start, len(order) - 1):
+        counters["nodes"] += 1
+        if _exceeds_incumbent(best, bounds[position - start]):
+            counters["pruned"] += 1
+            continue
+        tail = order[position + 1 :]
+        pairs.append(np.column_stack([np.full_like(tail, order[position]), tail]))
+        if len(best) < best.k:
+            # Without an incumbent nothing can be pruned yet.
+            _score_completions(stats, best, counters, selected, np.concatenate(pairs))
+            pairs = []
+    if pairs:
+        _score_completions(stats, best, counters, selected, np.concatenate(pairs))
+
+
+def _explore(stats, best, counters, square_root, order, num_terms, selected, start):
+    """Explores the subtree of subsets extending `selected` with order[start:]."""
+    counters["nodes"] += 1
+    remaining = num_terms - len(selected)
+    if remaining == 1:
+        _score_completions(stats, best, counters, selected, order[start:, None])
+        return
+    bounds = _suffix_bounds(*square_root, selected, order[start:]) / stats.num_samples
+    if remaining == 2:
+        _score_pair_completions(stats, best, counters, selected, order, start, bounds)
+        return
+    for position in range(start, len(order) - remaining + 1):
+        if _exceeds_incumbent(best, bounds[position - start]):
+            counters["pruned"] += 1
+            continue
+        _explore(
+            stats,
+            best,
+            counters,
+            square_root,
+            order,
+            num_terms,
+            selected + [order[position]],
+            position + 1,
+        )
+
+
+def branch_and_bound_search(stats, num_terms, top_k=1):
+    """Finds the exact top-K subsets of `num_terms` columns by branch and bound.
+
+    Columns are sorted by their single-column MSE and subsets are explored
+    depth-first as increasing sequences over that order. Adding columns can
+    never increase the RSS, so the RSS of a node's selected columns together
+    with every column after it bounds all of its completions from below;
+    subtrees whose bound exceeds the current K-th best MSE are pruned. The
+    bounds of all children of a node are nested, and are computed together
+    by `_suffix_bounds`. A union spanning as many columns as there are
+    samples fits exactly and bounds nothing, so subtrees are only pruned
+    where the remaining columns are fewer than the samples. The last two
+    columns of a subset are scored together in one batch.
+
+    Returns the top-K subsets and a dict of node counters. Raises ValueError
+    when there are fewer columns than `num_terms`.
+    """
+    num_columns = len(stats.moment)
+    _check_num_terms(num_terms, num_columns)
+    single_errors = stats.batch_errors(np.arange(num_columns)[:, None])
+    order = np.argsort(single_errors, kind="stable")
+    best = TopK(top_k)
+    counters = {"nodes": 0, "pruned": 0, "scored": 0}
+    if num_terms > 0:
+        _explore(
+            stats, best, counters, _square_root_columns(stats), order, num_terms, [], 0
+        )
+    return best, counters
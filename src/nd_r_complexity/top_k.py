@@ -0,0 +1,59 @@
+import heapq
+
+import numpy as np
+
+
+class TopK:
+    """Keeps the K lowest-error combinations seen so far in a bounded heap.
+
+    Ties on the error are broken by the column indices, so the ranking does
+    not depend on the order in which combinations are pushed or merged.
+    """
+
+    def __init__(self, k):
+        if k < 1:
+            raise ValueError("top_k must be at least 1.")
+        self.k = k
+        self._heap = []
+
+    def __len__(self):
+        return len(self._heap)
+
+    def push(self, error, column_indices):
+        error = float(error)
+        if not np.isfinite(error):
+            return
+        column_indices = tuple(int(i) for i in column_indices)
+        # heapq is a min-heap, so the root holds the worst entry kept so far.
+        key = (-error, tuple(-i for i in column_indices))
+        if len(self._heap) < self.k:
+            heapq.heappush(self._heap, (key, error, column_indices))
+        elif key > self._heap[0][0]:
+            heapq.heapreplace(self._heap, (key, error, column_indices))
+
+    def push_many(self, errors, index_array):
+        """Pushes a vector of errors for the rows of a (batch, k) index array."""
+        errors = np.asarray(errors, dtype=np.float64)
+        # Failed fits (inf or NaN) are never kept, and a NaN threshold would
+        # compare false against every finite error.
+        candidates = np.flatnonzero(np.isfinite(errors))
+        if len(candidates) > self.k:
+            # Only the k smallest errors of a batch can enter the heap, but
+            # ties at the boundary must all be offered for deterministic order.
+            finite = errors[candidates]
+            threshold = np.partition(finite, self.k - 1)[self.k - 1]
+            candidates = candidates[finite <= threshold]
+        for i in candidates:
+            self.push(errors[i], index_array[i])
+
+    def merge(self, other):
+        for _, error, column_indices in other._heap:
+            self.push(error, column_indices)
+        return self
+
+    def items(self):
+        """Returns the kept (error, column_indices) pairs, best first."""
+        return [
+            (error, column_indices)
+            for _, error, column_indices in sorted(self._heap, reverse=True)
+        ]
@@ -0,0 +1,27 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from helpers import KNAPSACK_DATA, finite_basis_columns
+
+
+@pytest.fixture
+def knapsack_data():
+    """Returns the knapsack inputs, as float64, and targets."""
+    data = pd.read_csv(KNAPSACK_DATA)
+    return data.iloc[:, :-1].values.astype(np.float64), data.iloc[:, -1].values
+
+
+@pytest.fixture
+def knapsack_basis(knapsack_data):
+    """Returns a function building the finite knapsack basis columns and targets.
+
+    The function takes the basis parameters; its columns are the active
+    columns searched by `search_models`.
+    """
+    X_data, y_data = knapsack_data
+
+    def evaluate(p_values, q_values, X_values):
+        return finite_basis_columns(X_data, p_values, q_values, X_values), y_data
+
+    return evaluate
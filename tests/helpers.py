@@ -0,0 +1,18 @@
+import os
+
+import numpy as np
+
+from nd_r_complexity.model_search import build_coded_basis_matrix
+from nd_r_complexity.search import generate_1d_basis_functions, nd_basis_codes
+
+EXPERIMENTAL = os.path.join(os.path.dirname(__file__), "..", "src", "experimental")
+KNAPSACK_DATA = os.path.join(EXPERIMENTAL, "knapsack_data.csv")
+BFS_DATA = os.path.join(EXPERIMENTAL, "bfs_data.csv")
+
+
+def finite_basis_columns(X_data, p_values, q_values, X_values):
+    """Evaluates the coded ND basis on X_data and keeps its finite columns."""
+    one_d_funcs = list(generate_1d_basis_functions(p_values, q_values, X_values))
+    codes = nd_basis_codes(len(one_d_funcs), X_data.shape[1])
+    basis_matrix = build_coded_basis_matrix(one_d_funcs, codes, X_data)
+    return basis_matrix[:, np.isfinite(basis_matrix).all(axis=0)]
@@ -0,0 +1,116 @@
+import csv
+import json
+import os
+import shutil
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from nd_r_complexity.batch import find_datasets, fit_dataset, main
+from nd_r_complexity.model_search import find_best_model
+
+from helpers import EXPERIMENTAL
+
+SEARCH_ARGS = ["--num_terms", "2", "--p_values", "1", "2", "--q_values", "0", "1"]
+SEARCH_ARGS += ["--X_values", "--solver", "batched", "--num_threads", "2", "--no_cache"]
+
+
+@pytest.fixture
+def datasets(tmp_path):
+    directory = tmp_path / "datasets"
+    directory.mkdir()
+    for name in ("knapsack_data.csv", "bfs_data.csv"):
+        shutil.copy(os.path.join(EXPERIMENTAL, name), directory / name)
+    (directory / "notes.txt").write_text("not a dataset")
+    return directory
+
+
+def test_find_datasets(datasets, tmp_path):
+    """Tests dataset discovery from a directory and from a manifest."""
+    assert [os.path.basename(p) for p in find_datasets(str(datasets))] == [
+        "bfs_data.csv",
+        "knapsack_data.csv",
+    ]
+    manifest = tmp_path / "manifest.txt"
+    manifest.write_text("# datasets\ndatasets/knapsack_data.csv\n\n")
+    assert find_datasets(str(manifest)) == [
+        os.path.join(str(tmp_path), "datasets/knapsack_data.csv")
+    ]
+
+
+def test_batch_matches_find_best_model(datasets, tmp_path, capsys):
+    """Tests that each batch row matches a single-dataset search."""
+    output = str(tmp_path / "summary.json")
+    main([str(datasets), "--output", output] + SEARCH_ARGS)
+    rows = json.load(open(output))
+    assert len(rows) == 2
+    for row in rows:
+        assert row["error_message"] is None
+        _, basis = find_best_model(
+            row["dataset"],
+            num_terms=2,
+            p_values=[1.0, 2.0],
+            q_values=[0.0, 1.0],
+            X_values=[],
+            solver="batched",
+        )
+        assert row["formula"] == " + ".join(str(f) for f in basis)
+        assert len(row["coefficients"]) == 2
+        assert "search" in row["phases"]
+    assert "Fitted 2/2 datasets" in capsys.readouterr().out
+
+
+def test_batch_fits_npy_datasets(datasets, tmp_path, capsys):
+    """Tests that binary datasets found by discovery are fitted like CSV."""
+    knapsack = pd.read_csv(datasets / "knapsack_data.csv").values.astype(np.float64)
+    np.save(datasets / "knapsack_copy.npy", knapsack)
+    output = str(tmp_path / "summary.json")
+    main([str(datasets), "--output", output] + SEARCH_ARGS)
+    rows = {os.path.basename(row["dataset"]): row for row in json.load(open(output))}
+    assert rows["knapsack_copy.npy"]["error_message"] is None
+    assert rows["knapsack_copy.npy"]["formula"] == rows["knapsack_data.csv"]["formula"]
+    assert rows["knapsack_copy.npy"]["mse"] == pytest.approx(
+        rows["knapsack_data.csv"]["mse"]
+    )
+    assert "Fitted 3/3 datasets" in capsys.readouterr().out
+
+
+def test_batch_csv_output_and_failures(datasets, tmp_path, capsys):
+    """Tests CSV output and that a failing dataset does not abort the batch."""
+    (datasets / "broken.csv").write_text("a,b\n")
+    output = str(tmp_path / "summary.csv")
+    with pytest.raises(SystemExit):
+        main([str(datasets), "--output", output] + SEARCH_ARGS)
+    rows = list(csv.DictReader(open(output)))
+    assert [os.path.basename(row["dataset"]) for row in rows] == [
+        "bfs_data.csv",
+        "broken.csv",
+        "knapsack_data.csv",
+    ]
+    assert rows[1]["error_message"]
+    assert float(rows[0]["mse"]) >= 0
+    assert "Fitted 2/3 datasets" in capsys.readouterr().out
+
+
+def test_batch_records_unreadable_parquet(datasets, tmp_path, monkeypatch, capsys):
+    """Tests that Parquet files failing to load, e.g. without pyarrow, are recorded."""
+    (datasets / "corrupt.parquet").write_bytes(b"not parquet")
+    output = str(tmp_path / "summary.json")
+    with pytest.raises(SystemExit):
+        main([str(datasets), "--output", output] + SEARCH_ARGS)
+    rows = {os.path.basename(row["dataset"]): row for row in json.load(open(output))}
+    assert rows["corrupt.parquet"]["error_message"]
+    assert rows["corrupt.parquet"]["formula"] is None
+    assert rows["knapsack_data.csv"]["error_message"] is None
+    assert "Fitted 2/3 datasets" in capsys.readouterr().out
+
+    # Workers are separate processes; block pyarrow in this one instead.
+    monkeypatch.setitem(sys.modules, "pyarrow", None)
+    row = fit_dataset(
+        str(datasets / "corrupt.parquet"),
+        dict(num_terms=1, p_values=[1], q_values=[], X_values=[]),
+    )
+    assert row["error_message"].startswith("ImportError: ")
+    assert "pip install nd_r_complexity[parquet]" in row["error_message"]
@@ -0,0 +1,68 @@
+import json
+
+import pytest
+
+from nd_r_complexity.benchmark import compare_results, main
+
+
+def test_benchmark_writes_results_and_detects_regressions(tmp_path, capsys):
+    """Tests a minimal benchmark run, its JSON output and the regression check."""
+    output = tmp_path / "results.json"
+    main(
+        [
+            "--dimensions",
+            "1",
+            "--constants",
+            "default",
+            "--sizes",
+            "25",
+            "--repeat",
+            "1",
+            "--num_threads",
+            "1",
+            "--output",
+            str(output),
+        ]
+    )
+    with open(output) as f:
+        report = json.load(f)
+    names = {result["name"] for result in report["results"]}
+    assert {
+        "basis_evaluation",
+        "fit_batched",
+        "end_to_end",
+        "startup_main_help",
+        "predict_compiled",
+    } <= names
+    assert all("seconds" in result for result in report["results"])
+
+    assert compare_results(report, report, tolerance=0.0) == []
+    faster_baseline = json.loads(json.dumps(report))
+    for result in faster_baseline["results"]:
+        result["seconds"] /= 10
+    regressions = compare_results(report, faster_baseline, tolerance=0.5)
+    assert len(regressions) == len(report["results"])
+
+    slow = tmp_path / "slow.json"
+    with open(slow, "w") as f:
+        json.dump(faster_baseline, f)
+    with pytest.raises(SystemExit):
+        main(
+            [
+                "--dimensions",
+                "1",
+                "--constants",
+                "default",
+                "--sizes",
+                "25",
+                "--repeat",
+                "1",
+                "--output",
+                str(tmp_path / "again.json"),
+                "--compare",
+                str(slow),
+                "--tolerance",
+                "0.5",
+            ]
+        )
+    assert "REGRESSION" in capsys.readouterr().err
@@ -0,0 +1,69 @@
+import os
+import time
+
+import numpy as np
+
+from nd_r_complexity.cache import ArrayCache, cached_arrays
+from nd_r_complexity.model_search import find_best_model
+
+from helpers import KNAPSACK_DATA
+
+
+def test_cache_round_trip_and_keys(tmp_path):
+    """Tests that entries are memory-mapped and keyed by data and parameters."""
+    cache = ArrayCache(str(tmp_path))
+    arrays = {"matrix": np.asfortranarray(np.arange(12.0).reshape(3, 4))}
+    key = cache.key(KNAPSACK_DATA, p_values=[1, 2])
+    assert key == cache.key(KNAPSACK_DATA, p_values=(1, 2))
+    assert key != cache.key(KNAPSACK_DATA, p_values=[1])
+    assert cache.load(key) is None
+
+    cache.store(key, arrays)
+    loaded = cache.load(key)
+    assert isinstance(loaded["matrix"], np.memmap)
+    assert loaded["matrix"].flags.f_contiguous
+    np.testing.assert_array_equal(loaded["matrix"], arrays["matrix"])
+
+    def fail():
+        raise AssertionError("cached entry was recomputed")
+
+    cached = cached_arrays(cache, KNAPSACK_DATA, fail, p_values=[1, 2])
+    np.testing.assert_array_equal(cached["matrix"], arrays["matrix"])
+
+
+def test_cache_evicts_least_recently_used(tmp_path):
+    """Tests that the oldest unused entries are evicted beyond the size limit."""
+    entry = {"values": np.zeros(1000)}
+    cache = ArrayCache(str(tmp_path), max_bytes=2 * 8000 + 1000)
+    for name in ("a", "b"):
+        cache.store(name, entry)
+        os.utime(tmp_path / name, (time.time() - 100, time.time() - 100))
+    assert cache.load("a") is not None
+    cache.store("c", entry)
+
+    assert sorted(key for key, _, _ in cache.entries()) == ["a", "c"]
+    cache.store("too_big", {"values": np.zeros(10000)})
+    assert cache.load("too_big") is None
+
+
+def test_find_best_model_uses_cache(tmp_path, capsys):
+    """Tests that a cached search reuses its entries and finds the same model."""
+    kwargs = dict(
+        num_terms=2,
+        p_values=[1],
+        q_values=[1, 2],
+        X_values=[2],
+        solver="batched",
+        cache_dir=str(tmp_path),
+    )
+    expected_model, expected = find_best_model(KNAPSACK_DATA, **kwargs)
+    entries = ArrayCache(str(tmp_path)).entries()
+    assert len(entries) == 2
+
+    model, functions = find_best_model(KNAPSACK_DATA, **kwargs)
+    assert len(ArrayCache(str(tmp_path)).entries()) == 2
+    assert [str(f) for f in functions] == [str(f) for f in expected]
+    np.testing.assert_allclose(model.coef_, expected_model.coef_)
+
+    find_best_model(KNAPSACK_DATA, stream=True, **kwargs)
+    assert len(ArrayCache(str(tmp_path)).entries()) == 3
@@ -0,0 +1,122 @@
+import json
+import os
+
+import pytest
+
+from nd_r_complexity import model_search
+from nd_r_complexity.checkpoint import save_checkpoint, search_fingerprint
+from nd_r_complexity.main import main
+from nd_r_complexity.model_search import find_best_model
+from nd_r_complexity.search import rank_combination
+from nd_r_complexity.top_k import TopK
+
+from helpers import KNAPSACK_DATA
+
+SEARCH_PARAMS = dict(
+    num_terms=2, p_values=[1, 2], q_values=[1], X_values=[], solver="batched"
+)
+
+
+def _ranking(output):
+    return output.split("Top 3 combinations by mean squared error:\n")[1]
+
+
+def test_resume_matches_uninterrupted_run(tmp_path, capsys, knapsack_basis):
+    """Tests that resuming from a partial checkpoint gives the same top-K."""
+    checkpoint_path = str(tmp_path / "search.checkpoint.json")
+    find_best_model(
+        KNAPSACK_DATA,
+        top_k=3,
+        chunk_size=100,
+        checkpoint_path=checkpoint_path,
+        checkpoint_interval=0,
+        **SEARCH_PARAMS,
+    )
+    expected = _ranking(capsys.readouterr().out)
+    with open(checkpoint_path) as f:
+        state = json.load(f)
+    assert len(state["top_k"]) == 3
+
+    # Pretend the run was preempted after 1000 combinations, keeping only the
+    # winners found by then: resuming must still search everything after it.
+    fingerprint = search_fingerprint(
+        KNAPSACK_DATA,
+        num_terms=2,
+        p_values=[1, 2],
+        q_values=[1],
+        X_values=[],
+        solver="batched",
+        top_k=3,
+        shard=None,
+        log_space=False,
+        prune_equivalent=False,
+    )
+    assert fingerprint == state["fingerprint"]
+    # Combinations index the basis columns that survive the finiteness check.
+    num_columns = knapsack_basis([1, 2], [1], [])[0].shape[1]
+    partial = TopK(3)
+    for error, indices in state["top_k"]:
+        if rank_combination(indices, num_columns) < 1000:
+            partial.push(error, indices)
+    save_checkpoint(checkpoint_path, fingerprint, 1000, partial)
+
+    find_best_model(
+        KNAPSACK_DATA,
+        top_k=3,
+        checkpoint_path=checkpoint_path,
+        resume=True,
+        **SEARCH_PARAMS,
+    )
+    output = capsys.readouterr().out
+    assert "Resuming from combination 1000" in output
+    assert _ranking(output) == expected
+
+
+def test_resume_rejects_other_search(tmp_path):
+    """Tests that a checkpoint is not reused for different search parameters."""
+    checkpoint_path = str(tmp_path / "search.checkpoint.json")
+    save_checkpoint(checkpoint_path, {"num_terms": 1}, 10, TopK(1))
+    with pytest.raises(ValueError, match="different dataset"):
+        find_best_model(
+            KNAPSACK_DATA, checkpoint_path=checkpoint_path, resume=True, **SEARCH_PARAMS
+        )
+
+
+def test_resume_rejects_other_cv_seed(tmp_path):
+    """Tests that a cross-validated checkpoint is not reused with other folds."""
+    checkpoint_path = str(tmp_path / "search.checkpoint.json")
+    kwargs = dict(
+        criterion="cv", checkpoint_path=checkpoint_path, quiet=True, **SEARCH_PARAMS
+    )
+    find_best_model(KNAPSACK_DATA, seed=1, **kwargs)
+    with pytest.raises(ValueError, match="different dataset"):
+        find_best_model(KNAPSACK_DATA, seed=2, resume=True, **kwargs)
+
+
+def test_default_checkpoint_resumes_interrupted_run(tmp_path, capsys, monkeypatch):
+    """Tests that a grid search run without --checkpoint can still be resumed."""
+    argv = [KNAPSACK_DATA, "--num_terms", "2", "--p_values", "1", "2"]
+    argv += ["--q_values", "1", "--X_values", "--solver", "batched", "--top_k", "3"]
+    argv += ["--num_threads", "1", "--chunk_size", "100", "--cache_dir", str(tmp_path)]
+    main(argv)
+    expected = _ranking(capsys.readouterr().out)
+    checkpoint_dir = tmp_path / "checkpoints"
+    assert os.listdir(checkpoint_dir) == []
+
+    def save_then_crash(*args):
+        save_checkpoint(*args)
+        raise KeyboardInterrupt
+
+    monkeypatch.setattr(model_search, "save_checkpoint", save_then_crash)
+    with pytest.raises(KeyboardInterrupt):
+        main(argv + ["--checkpoint_interval", "0"])
+    assert len(os.listdir(checkpoint_dir)) == 1
+    monkeypatch.undo()
+    capsys.readouterr()
+
+    main(argv + ["--resume"])
+    output = capsys.readouterr().out
+    assert "Resuming from combination 100" in output
+    assert _ranking(output) == expected
+    assert os.listdir(checkpoint_dir) == []
+    assert not os.path.exists(f"{KNAPSACK_DATA}.checkpoint.json")
@@ -0,0 +1,207 @@
+import itertools
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from nd_r_complexity.gram import GramStatistics, IncrementalSolver
+from nd_r_complexity.model_search import (
+    build_coded_basis_matrix,
+    find_best_model,
+    fit_cached_model,
+    iter_index_batches,
+    iter_ranges,
+    search_range,
+    share_fit_data,
+)
+from nd_r_complexity.search import (
+    generate_1d_basis_functions,
+    iter_revolving_door,
+    n_choose_k,
+    nd_basis_codes,
+)
+from nd_r_complexity.top_k import TopK
+
+from helpers import BFS_DATA, KNAPSACK_DATA
+
+
+def _reference_error(X_design, y_data):
+    """Least-squares MSE on max-scaled columns."""
+    scale = np.abs(X_design).max(axis=0)
+    scale[scale == 0] = 1.0
+    design = np.column_stack([X_design / scale, np.ones(len(y_data))])
+    residual = y_data - design @ np.linalg.lstsq(design, y_data, rcond=None)[0]
+    return residual @ residual / len(y_data)
+
+
+def test_gram_fit_matches_least_squares(knapsack_basis):
+    """Tests that the Gram engine reproduces least-squares errors and predictions."""
+    basis_matrix, y_data = knapsack_basis([1, 2], [1], [2])
+    # An overflowed column is never fitted by either engine.
+    basis_matrix = np.column_stack([basis_matrix, np.full(len(y_data), np.nan)])
+    stats = GramStatistics(basis_matrix, y_data)
+    invalid = (0, basis_matrix.shape[1] - 1)
+    assert fit_cached_model(invalid, basis_matrix, y_data) == (float("inf"), None, None)
+    assert stats.fit(invalid)[:2] == (float("inf"), None)
+
+    for column_indices in itertools.islice(
+        itertools.combinations(range(basis_matrix.shape[1] - 1), 2), 0, None, 37
+    ):
+        expected_error, _, _ = fit_cached_model(column_indices, basis_matrix, y_data)
+        error, model, _ = stats.fit(column_indices)
+        X_design = basis_matrix[:, list(column_indices)]
+        assert error == pytest.approx(
+            _reference_error(X_design, y_data), rel=1e-6, abs=1e-6
+        )
+        assert error == pytest.approx(expected_error, rel=1e-6, abs=1e-6)
+        assert np.mean((y_data - model.predict(X_design)) ** 2) == pytest.approx(
+            error, rel=1e-6, abs=1e-6
+        )
+
+
+def test_find_best_model_gram_solver(capsys):
+    """Tests that the Gram solver picks the same model as the sklearn solver."""
+    kwargs = dict(num_terms=2, p_values=[1], q_values=[1, 2], X_values=[])
+    _, sklearn_functions = find_best_model(KNAPSACK_DATA, **kwargs)
+    for solver in ("gram", "batched", "incremental"):
+        model, functions = find_best_model(
+            KNAPSACK_DATA, solver=solver, batch_size=7, chunk_size=50, **kwargs
+        )
+        assert [str(f) for f in functions] == [str(f) for f in sklearn_functions]
+        assert model.coef_.shape == (2,)
+
+
+def test_sklearn_fit_scales_columns():
+    """Tests that sklearn fits badly scaled columns as exactly as least squares."""
+    data = pd.read_csv(BFS_DATA)
+    X_data = data.iloc[:, :-1].values.astype(np.float64)
+    y_data = data.iloc[:, -1].values
+    one_d_funcs = list(generate_1d_basis_functions([1, 2, 3], [1, 2], [2]))
+    codes = nd_basis_codes(len(one_d_funcs), X_data.shape[1])
+    basis_matrix = build_coded_basis_matrix(one_d_funcs, codes, X_data)
+    # This pair lost two orders of magnitude of MSE without column scaling.
+    error, model, _ = fit_cached_model((227, 616), basis_matrix, y_data)
+    X_design = basis_matrix[:, [227, 616]]
+    assert error == pytest.approx(_reference_error(X_design, y_data), rel=1e-6)
+    assert np.mean((y_data - model.predict(X_design)) ** 2) == pytest.approx(
+        error, rel=1e-9
+    )
+
+
+def test_batch_errors_match_single_fits(knapsack_basis):
+    """Tests that batched solves agree with per-combination Gram fits."""
+    basis_matrix, y_data = knapsack_basis([1, 2], [1], [2])
+    stats = GramStatistics(basis_matrix, y_data)
+    combinations = list(itertools.combinations(range(basis_matrix.shape[1]), 2))
+    index_batches = list(iter_index_batches(iter(combinations), 2, 1000))
+
+    assert sum(len(batch) for batch in index_batches) == len(combinations)
+    assert all(batch.shape == (1000, 2) for batch in index_batches[:-1])
+    errors = np.concatenate([stats.batch_errors(batch) for batch in index_batches])
+    expected = np.array([stats.fit(c)[0] for c in combinations])
+    np.testing.assert_allclose(errors, expected, rtol=1e-6, atol=1e-6)
+
+
+def test_search_ranges_cover_the_grid(tmp_path, knapsack_basis):
+    """Tests that worker ranges over shared fit data reproduce a full search."""
+    basis_matrix, y_data = knapsack_basis([1, 2], [1], [2])
+    stats = GramStatistics(basis_matrix, y_data)
+    num_columns = basis_matrix.shape[1]
+    total = n_choose_k(num_columns, 2)
+    data_handle = share_fit_data(stats, str(tmp_path))
+
+    merged = TopK(4)
+    covered = 0
+    for start, stop in iter_ranges(0, total, 3001):
+        range_start, range_stop, range_best, worker_stats = search_range(
+            data_handle, "batched", num_columns, 2, start, stop, 4, 512
+        )
+        assert (range_start, range_stop) == (start, stop)
+        assert worker_stats["fitted"] == stop - start
+        covered += stop - start
+        merged.merge(range_best)
+
+    full = TopK(4)
+    index_array = np.array(list(itertools.combinations(range(num_columns), 2)))
+    full.push_many(stats.batch_errors(index_array), index_array)
+    assert covered == total
+    assert merged.items() == full.items()
+
+
+def test_incremental_solver_matches_batch_errors(knapsack_basis):
+    """Tests that updating along the revolving-door order matches direct solves."""
+    basis_matrix, y_data = knapsack_basis([1, 2], [1], [2])
+    stats = GramStatistics(basis_matrix, y_data)
+    index_array = np.array(list(iter_revolving_door(basis_matrix.shape[1], 2)))
+    solver = IncrementalSolver(stats)
+
+    errors = solver.batch_errors(index_array)
+    expected = stats.batch_errors(index_array)
+    assert np.array_equal(np.isfinite(errors), np.isfinite(expected))
+    finite = np.isfinite(expected)
+    np.testing.assert_allclose(errors[finite], expected[finite], rtol=1e-6, atol=1e-6)
+
+
+def test_oversized_gram_falls_back_to_column_products(monkeypatch, knapsack_basis):
+    """Tests that scoring without a Gram matrix matches scoring with one."""
+    basis_matrix, y_data = knapsack_basis([1, 2], [1], [2])
+    stats = GramStatistics(basis_matrix, y_data)
+    index_array = np.array(list(iter_revolving_door(basis_matrix.shape[1], 2)))
+    expected = stats.batch_errors(index_array)
+
+    monkeypatch.setattr("nd_r_complexity.gram.MAX_GRAM_BYTES", 0)
+    monkeypatch.setattr("nd_r_complexity.gram.SUB_GRAM_BATCH_CELLS", 1000)
+    columns_only = GramStatistics(basis_matrix, y_data)
+    assert columns_only.gram is None
+    finite = np.isfinite(expected)
+    for errors in (
+        columns_only.batch_errors(index_array),
+        IncrementalSolver(columns_only).batch_errors(index_array),
+    ):
+        assert np.array_equal(np.isfinite(errors), finite)
+        np.testing.assert_allclose(
+            errors[finite], expected[finite], rtol=1e-6, atol=1e-6
+        )
+
+
+def test_weighted_gram_fit_matches_weighted_least_squares(knapsack_basis):
+    """Tests that row weights give the weighted least-squares fit and error."""
+    basis_matrix, y_data = knapsack_basis([1, 2], [1], [2])
+    weights = 1.0 / y_data.astype(np.float64) ** 2
+    stats = GramStatistics(basis_matrix, y_data, weights=weights)
+    root_weights = np.sqrt(weights / weights.mean())
+
+    usable = np.flatnonzero(stats.valid & (np.ptp(basis_matrix, axis=0) > 0))
+    for column_indices in itertools.combinations(usable[::7], 2):
+        X_design = basis_matrix[:, list(column_indices)]
+        scale = np.abs(X_design).max(axis=0)
+        design = np.column_stack([X_design / scale, np.ones(len(y_data))])
+        coef = np.linalg.lstsq(
+            design * root_weights[:, None], y_data * root_weights, rcond=None
+        )[0]
+        residual = (y_data - design @ coef) * root_weights
+        error, model, _ = stats.fit(column_indices)
+        assert error == pytest.approx(residual @ residual / len(y_data), rel=1e-6)
+        np.testing.assert_allclose(model.predict(X_design), design @ coef, rtol=1e-6)
+        assert stats.batch_errors([column_indices])[0] == pytest.approx(error)
+
+
+def test_find_best_model_weights(tmp_path, capsys):
+    """Tests relative and column weights across the sklearn and Gram solvers."""
+    kwargs = dict(num_terms=2, p_values=[1], q_values=[1, 2], X_values=[])
+    _, sklearn_functions = find_best_model(BFS_DATA, weights="relative", **kwargs)
+    assert "Weighted mean squared error (relative)" in capsys.readouterr().out
+    _, gram_functions = find_best_model(
+        BFS_DATA, solver="batched", weights="relative", **kwargs
+    )
+    assert [str(f) for f in gram_functions] == [str(f) for f in sklearn_functions]
+
+    # The same weights given as a column, which is not an input dimension.
+    data = pd.read_csv(BFS_DATA)
+    data.insert(0, "w", 1.0 / data.iloc[:, -1] ** 2)
+    weighted_path = str(tmp_path / "weighted.csv")
+    data.to_csv(weighted_path, index=False)
+    _, column_functions = find_best_model(
+        weighted_path, solver="batched", weights="w", **kwargs
+    )
+    assert [str(f) for f in column_functions] == [str(f) for f in gram_functions]
@@ -0,0 +1,39 @@
+import json
+import subprocess
+import sys
+
+import pytest
+
+# Slow-to-import dependencies that the command-line startup must not load.
+HEAVY_MODULES = ["joblib", "pandas", "scipy", "sklearn", "tqdm"]
+
+
+def _imported_heavy_modules(code):
+    script = (
+        f"{code}\n"
+        "import json, sys\n"
+        f"print(json.dumps([m for m in {HEAVY_MODULES!r} if m in sys.modules]))"
+    )
+    output = subprocess.run(
+        [sys.executable, "-c", script], check=True, capture_output=True, text=True
+    ).stdout
+    return json.loads(output.splitlines()[-1])
+
+
+@pytest.mark.parametrize(
+    "module", ["nd_r_complexity.main", "nd_r_complexity.print_functions"]
+)
+def test_cli_modules_import_lazily(module):
+    """Tests that importing an entry point does not load heavy dependencies."""
+    assert _imported_heavy_modules(f"import {module}") == []
+
+
+def test_counting_combinations_imports_lazily():
+    """Tests that sizing a grid, as --total_only does, stays lightweight."""
+    code = (
+        "import sys\n"
+        "sys.argv = ['print_functions', '--num_dimensions', '2', '--total_only']\n"
+        "from nd_r_complexity.print_functions import main\n"
+        "main()"
+    )
+    assert _imported_heavy_modules(code) == []
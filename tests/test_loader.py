@@ -0,0 +1,153 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from nd_r_complexity.gram import GramStatistics, MomentAccumulator
+from nd_r_complexity.loader import iter_data_chunks, load_data, split_row_weights
+from nd_r_complexity.model_search import find_best_model, search_models
+
+from helpers import KNAPSACK_DATA
+
+
+def test_iter_data_chunks_csv_and_npy(tmp_path):
+    """Tests that CSV and .npy chunks reassemble the full dataset."""
+    data = pd.read_csv(KNAPSACK_DATA).values.astype(np.float64)
+    npy_path = str(tmp_path / "knapsack.npy")
+    np.save(npy_path, data)
+
+    for path in (KNAPSACK_DATA, npy_path):
+        chunks = list(iter_data_chunks(path, 10))
+        assert [len(y) for _, y in chunks][:-1] == [10] * (len(chunks) - 1)
+        np.testing.assert_array_equal(np.vstack([X for X, _ in chunks]), data[:, :-1])
+        np.testing.assert_array_equal(
+            np.concatenate([y for _, y in chunks]), data[:, -1]
+        )
+
+
+def test_load_data_npy(tmp_path):
+    """Tests that a .npy file loads like the CSV it was saved from."""
+    expected = pd.read_csv(KNAPSACK_DATA)
+    npy_path = str(tmp_path / "knapsack.npy")
+    np.save(npy_path, expected.values.astype(np.float64))
+    np.testing.assert_array_equal(load_data(npy_path).values, expected.values)
+
+
+def _write_arrow_file(data, path, batch_rows):
+    """Writes `data` as Parquet row groups or Arrow IPC record batches."""
+    pyarrow = pytest.importorskip("pyarrow")
+    import pyarrow.ipc
+    import pyarrow.parquet
+
+    table = pyarrow.Table.from_pandas(data, preserve_index=False)
+    if path.endswith(".parquet"):
+        pyarrow.parquet.write_table(table, path, row_group_size=batch_rows)
+        assert pyarrow.parquet.ParquetFile(path).num_row_groups > 1
+    else:
+        with pyarrow.ipc.new_file(path, table.schema) as writer:
+            for batch in table.to_batches(max_chunksize=batch_rows):
+                writer.write_batch(batch)
+        assert pyarrow.ipc.open_file(path).num_record_batches > 1
+
+
+@pytest.mark.parametrize("extension", [".parquet", ".feather"])
+def test_parquet_and_arrow_match_csv(tmp_path, extension):
+    """Tests chunked reads and a streamed search of Parquet and Arrow files."""
+    data = pd.read_csv(KNAPSACK_DATA).astype(np.float64)
+    path = str(tmp_path / f"knapsack{extension}")
+    _write_arrow_file(data, path, batch_rows=20)
+
+    np.testing.assert_array_equal(load_data(path).values, data.values)
+    chunks = list(iter_data_chunks(path, 15))
+    assert len(chunks) > len(data) // 20
+    assert all(0 < len(y) <= 15 for _, y in chunks)
+    np.testing.assert_array_equal(
+        np.vstack([X for X, _ in chunks]), data.values[:, :-1]
+    )
+    np.testing.assert_array_equal(
+        np.concatenate([y for _, y in chunks]), data.values[:, -1]
+    )
+
+    kwargs = dict(
+        num_terms=2,
+        p_values=[1],
+        q_values=[1, 2],
+        X_values=[2],
+        solver="batched",
+        stream=True,
+        chunksize=15,
+        verbose=False,
+    )
+    (expected,) = search_models(KNAPSACK_DATA, **kwargs)
+    (best,) = search_models(path, **kwargs)
+    assert best["basis_ids"] == expected["basis_ids"]
+    assert best["error"] == pytest.approx(expected["error"], rel=1e-9)
+    np.testing.assert_allclose(best["model"].coef_, expected["model"].coef_)
+
+
+def test_moment_accumulator_matches_gram_statistics():
+    """Tests that chunked moments reproduce the in-memory Gram statistics."""
+    rng = np.random.default_rng(0)
+    basis_matrix = rng.normal(size=(500, 6)) * [1, 10, 1e3, 1e6, 1, 1]
+    basis_matrix[:, 2] += 1e4
+    basis_matrix[250:, 3] *= 50
+    basis_matrix[:, 5] = 0.0
+    y_data = basis_matrix[:, 1] + rng.normal(size=500)
+
+    accumulator = MomentAccumulator(6)
+    for start in range(0, 500, 77):
+        accumulator.update(basis_matrix[start : start + 77], y_data[start : start + 77])
+    streamed = accumulator.statistics(np.arange(6))
+    expected = GramStatistics(basis_matrix, y_data)
+
+    np.testing.assert_allclose(streamed.gram, expected.gram, atol=1e-12)
+    np.testing.assert_allclose(streamed.moment, expected.moment, atol=1e-9)
+    for columns in ([0, 1], [2, 3, 4], [1, 5]):
+        assert streamed.error(columns) == pytest.approx(expected.error(columns))
+        np.testing.assert_allclose(
+            streamed.fit(columns)[1].coef_, expected.fit(columns)[1].coef_
+        )
+
+
+def test_find_best_model_streaming(capsys):
+    """Tests that a streamed search finds the same model as an in-memory one."""
+    kwargs = dict(
+        num_terms=2, p_values=[1], q_values=[1, 2], X_values=[2], solver="batched"
+    )
+    expected_model, expected = find_best_model(KNAPSACK_DATA, **kwargs)
+    capsys.readouterr()
+    model, functions = find_best_model(
+        KNAPSACK_DATA, stream=True, chunksize=9, **kwargs
+    )
+    out = capsys.readouterr().out
+    assert [str(f) for f in functions] == [str(f) for f in expected]
+    np.testing.assert_allclose(model.coef_, expected_model.coef_, rtol=1e-6)
+    assert "Streamed 64 rows" in out
+    assert "Pruned" in out
+
+    with pytest.raises(ValueError):
+        find_best_model(
+            KNAPSACK_DATA,
+            stream=True,
+            num_terms=1,
+            p_values=[1],
+            q_values=[],
+            X_values=[],
+        )
+
+
+def test_split_row_weights():
+    """Tests relative and column weights and their validation."""
+    data = pd.DataFrame({"n": [1.0, 2.0, 3.0], "w": [1.0, 0.0, 2.0], "y": [2, 4, 8]})
+    assert split_row_weights(data, None)[1] is None
+    np.testing.assert_allclose(
+        split_row_weights(data, "relative")[1], [0.25, 1 / 16, 1 / 64]
+    )
+    features, weights = split_row_weights(data, "w")
+    assert list(features.columns) == ["n", "y"]
+    np.testing.assert_array_equal(weights, [1.0, 0.0, 2.0])
+    with pytest.raises(ValueError):
+        split_row_weights(data, "missing")
+    with pytest.raises(ValueError):
+        split_row_weights(data.assign(w=[-1.0, 1.0, 1.0]), "w")
+    with pytest.raises(ValueError):
+        split_row_weights(data.assign(y=[0, 1, 2]), "relative")
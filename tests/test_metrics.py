@@ -0,0 +1,96 @@
+import json
+import time
+
+import pytest
+
+from nd_r_complexity.metrics import Metrics
+from nd_r_complexity.model_search import find_best_model, search_models
+from nd_r_complexity.search import (
+    count_combinations_up_to,
+    count_nd_basis_functions,
+    n_choose_k,
+)
+
+from helpers import KNAPSACK_DATA
+
+
+def test_metrics_accumulate_phases_and_counters():
+    """Tests that repeated phases and counters accumulate."""
+    metrics = Metrics()
+    for _ in range(2):
+        with metrics.phase("search"):
+            time.sleep(0.01)
+    metrics.count("combinations_fitted", 30)
+    metrics.count("combinations_fitted", 10)
+
+    report = metrics.to_dict()
+    assert report["phases"]["search"]["calls"] == 2
+    assert report["phases"]["search"]["wall_seconds"] >= 0.02
+    assert report["counters"] == {"combinations_fitted": 40}
+    assert report["combinations_per_second"] == pytest.approx(
+        40 / report["phases"]["search"]["wall_seconds"]
+    )
+
+
+def test_find_best_model_writes_metrics_and_profiles(tmp_path, capsys):
+    """Tests the metrics JSON and the cProfile hook of a grid search."""
+    metrics_out = tmp_path / "metrics.json"
+    find_best_model(
+        KNAPSACK_DATA,
+        num_terms=2,
+        p_values=[1],
+        q_values=[1, 2],
+        X_values=[2],
+        solver="batched",
+        num_threads=2,
+        metrics_out=str(metrics_out),
+        profile_phases=["gram_statistics"],
+        profile_dir=str(tmp_path),
+    )
+    with open(metrics_out) as f:
+        report = json.load(f)
+
+    phases = report["phases"]
+    for name in (
+        "load",
+        "basis_evaluation",
+        "column_pruning",
+        "gram_statistics",
+        "search",
+        "worker_enumeration",
+        "worker_fitting",
+        "reduction",
+        "refit",
+    ):
+        assert name in phases
+    counters = report["counters"]
+    assert counters["pruned_invalid_combinations"] > 0
+    assert counters["combinations_fitted"] > 0
+    assert counters["failed_fits"] >= 0
+    assert report["combinations_per_second"] > 0
+    assert 0 < report["worker_utilization"]
+    assert report["peak_memory"]["self_bytes"] > 0
+    assert (tmp_path / "gram_statistics.prof").exists()
+
+
+@pytest.mark.parametrize("search_strategy", ["grid", "stepwise", "bnb", "random"])
+def test_pruned_combinations_match_strategy(knapsack_basis, search_strategy):
+    """Tests that pruned combinations are counted over the searched sizes."""
+    basis = dict(p_values=[1], q_values=[1, 2], X_values=[2])
+    num_valid = knapsack_basis(**basis)[0].shape[1]
+    count = count_combinations_up_to if search_strategy == "random" else n_choose_k
+
+    metrics = Metrics()
+    search_models(
+        KNAPSACK_DATA,
+        num_terms=3,
+        solver="batched",
+        search_strategy=search_strategy,
+        num_threads=1,
+        metrics=metrics,
+        verbose=False,
+        **basis,
+    )
+    assert metrics.counters["pruned_invalid_combinations"] == count(
+        count_nd_basis_functions(2, **basis), 3
+    ) - count(num_valid, 3)
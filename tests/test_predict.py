@@ -0,0 +1,102 @@
+import numpy as np
+import pandas as pd
+
+from nd_r_complexity.model_search import find_best_model, search_models
+from nd_r_complexity.predict import CompiledModel, predict, predict_chunks
+from nd_r_complexity.results import load_result
+from nd_r_complexity.search import NDBasisFunction, generate_1d_basis_functions
+
+from helpers import KNAPSACK_DATA
+
+
+def test_compiled_model_shares_factors():
+    """Tests that shared logs and powers are evaluated once."""
+    one_d_funcs = {str(f): f for f in generate_1d_basis_functions([1, 2], [1, 2], [2])}
+    names = ["log(n)^1 * Gamma(n)", "n^2 * log(n)^2", "2^n * Gamma(n)"]
+    basis_functions = [NDBasisFunction([one_d_funcs[n]] * 2) for n in names]
+    compiled = CompiledModel([1.5, -2.0, 0.5], 3.0, basis_functions)
+    assert compiled.source.count("np.log(x0") == 1
+    assert compiled.source.count("gamma(x1") == 1
+    assert " - 2.0 * " in compiled.source
+
+    X = np.array([[1.0, 2.0], [3.0, 4.0], [5.0, 0.5]])
+    expected = 3.0 + sum(c * f(*X.T) for c, f in zip([1.5, -2.0, 0.5], basis_functions))
+    np.testing.assert_allclose(compiled(X), expected, rtol=1e-12)
+
+
+def test_predict_matches_estimator(tmp_path):
+    """Tests chunked prediction against sklearn and through a saved result."""
+    output = str(tmp_path / "result.json")
+    model, basis = find_best_model(
+        KNAPSACK_DATA,
+        num_terms=3,
+        p_values=[1, 2],
+        q_values=[1],
+        X_values=[],
+        solver="batched",
+        output=output,
+        quiet=True,
+    )
+    X = pd.read_csv(KNAPSACK_DATA).iloc[:, :-1].values.astype(np.float64)
+    expected = model.predict(np.column_stack([f(*X.T) for f in basis]))
+
+    compiled = CompiledModel.from_estimator(model, basis)
+    np.testing.assert_allclose(predict(compiled, X, chunksize=7), expected)
+    np.testing.assert_allclose(predict(compiled, X), expected)
+    np.testing.assert_allclose(
+        predict(CompiledModel.from_result(output), X), expected, rtol=1e-12
+    )
+    chunks = list(predict_chunks(compiled, np.array_split(X, 3)))
+    np.testing.assert_allclose(np.concatenate(chunks), expected)
+
+
+def test_compiled_model_evaluates_log_space_results(tmp_path):
+    """Tests log-space models whose raw coefficients underflow to zero."""
+    rng = np.random.default_rng(0)
+    n, m = rng.uniform(1e3, 5e6, 60), rng.uniform(1, 10, 60)
+    data_path = str(tmp_path / "large.csv")
+    pd.DataFrame({"n": n, "m": m, "t": 3 * n * m + rng.normal(0, 1, 60)}).to_csv(
+        data_path, index=False
+    )
+    output = str(tmp_path / "result.npz")
+    kwargs = dict(num_terms=1, p_values=[1], q_values=[], X_values=[2])
+    kwargs.update(solver="gram", log_space=True, top_k=7)
+    find_best_model(data_path, output=output, quiet=True, **kwargs)
+    result = load_result(output)
+    X = np.column_stack([n, m])
+
+    model = result.models[6]
+    assert model["formula"] == "2^n_1 * n_2^1"
+    assert model["coefficients"] == [0.0] and model["log_scales"][0] > 1e6
+    expected = model["intercept"] + model["log_normalized_coefficients"][0] * np.exp(
+        n * np.log(2) + np.log(m) - model["log_scales"][0]
+    )
+    predictions = predict(CompiledModel.from_result(result, rank=7), X)
+    assert np.isfinite(predictions).all()
+    np.testing.assert_allclose(predictions, expected, rtol=1e-9)
+    entry = search_models(data_path, verbose=False, **kwargs)[6]
+    compiled = CompiledModel.from_estimator(entry["model"], entry["basis_functions"])
+    np.testing.assert_allclose(compiled(X), expected, rtol=1e-9)
+
+    best = result.best
+    np.testing.assert_allclose(
+        CompiledModel.from_result(result)(X),
+        best["intercept"] + best["coefficients"][0] * n * m,
+        rtol=1e-9,
+    )
+
+
+def test_compiled_log_space_model_keeps_signs():
+    """Tests log-domain terms that are negative, such as log(n)^1 for n < 1."""
+    one_d_funcs = {str(f): f for f in generate_1d_basis_functions([1], [1, 3], [])}
+    names = ["log(n)^1", "n^1 * log(n)^3", "log(n)^3"]
+    basis_functions = [NDBasisFunction([one_d_funcs[n]] * 2) for n in names]
+    X = np.array([[0.2, 3.0], [0.5, 0.1], [4.0, 0.9]])
+    log_scales = np.array([0.5, -1.0, 2.0])
+    coefficients = np.array([1.5, -2.0, 0.5])
+    compiled = CompiledModel(coefficients, 3.0, basis_functions, log_scales)
+    expected = 3.0 + sum(
+        c * np.exp(-s) * f(*X.T)
+        for c, s, f in zip(coefficients, log_scales, basis_functions)
+    )
+    np.testing.assert_allclose(compiled(X), expected, rtol=1e-12)
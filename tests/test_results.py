@@ -0,0 +1,63 @@
+import json
+
+import numpy as np
+import pytest
+
+from nd_r_complexity.model_search import find_best_model
+from nd_r_complexity.results import load_result
+
+from helpers import KNAPSACK_DATA
+
+SEARCH_KWARGS = dict(num_terms=2, p_values=[1, 2], q_values=[0, 1], X_values=[])
+
+
+@pytest.mark.parametrize("extension", [".json", ".npz"])
+@pytest.mark.parametrize("log_space", [False, True])
+def test_result_round_trip(tmp_path, capsys, extension, log_space):
+    """Tests that written results match the returned model and reload."""
+    output = str(tmp_path / f"result{extension}")
+    model, basis = find_best_model(
+        KNAPSACK_DATA,
+        solver="batched",
+        top_k=3,
+        log_space=log_space,
+        output=output,
+        quiet=True,
+        **SEARCH_KWARGS,
+    )
+    captured = capsys.readouterr()
+    assert captured.out == "" and captured.err == ""
+
+    result = load_result(output)
+    assert [m["rank"] for m in result.models] == [1, 2, 3]
+    assert result.best["formula"] == " + ".join(str(f) for f in basis)
+    np.testing.assert_allclose(result.best["coefficients"], model.coef_)
+    assert result.best["intercept"] == pytest.approx(model.intercept_)
+    assert len(result.best["basis_ids"]) == 2
+    assert ("log_scales" in result.best) == log_space
+    assert result.parameters["solver"] == "batched"
+    assert result.statistics["counters"]["combinations_fitted"] > 0
+    if extension == ".json":
+        assert json.load(open(output))["models"][0] == result.best
+    else:
+        assert load_result(output).to_dict() == result.to_dict()
+        json_output = str(tmp_path / "result.json")
+        result.write(json_output)
+        assert load_result(json_output).models == result.models
+
+
+@pytest.mark.parametrize("extension", [".json", ".npz"])
+def test_weighted_result_names_its_objective(tmp_path, extension):
+    """Tests that weighted searches store their error as weighted_mse."""
+    output = str(tmp_path / f"result{extension}")
+    find_best_model(
+        KNAPSACK_DATA,
+        solver="batched",
+        weights="relative",
+        output=output,
+        quiet=True,
+        **SEARCH_KWARGS,
+    )
+    best = load_result(output).best
+    assert "mse" not in best
+    assert best["weighted_mse"] >= 0
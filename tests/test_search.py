@@ -4,9 +4,12 @@ from nd_r_complexity.model_search import find_best_model
 from nd_r_complexity.search import NDBasisFunction
 import tempfile
 import os
+import itertools
 from sklearn.metrics import mean_squared_error
 import numpy as np
 
+from helpers import BFS_DATA, KNAPSACK_DATA
+
 
 def test_model_search_knapsack(capsys):
     """Tests the find_best_model function with grid search and knapsack data."""
@@ -364,3 +367,353 @@ def test_model_search_bfs(capsys):
 
     finally:
         os.remove(temp_file_path)
+
+
+def test_fit_cached_model_matches_fit_model():
+    """Tests that fitting from the basis-column cache matches per-combination evaluation."""
+    from nd_r_complexity.model_search import (
+        build_coded_basis_matrix,
+        fit_cached_model,
+        fit_model,
+    )
+    from nd_r_complexity.search import (
+        generate_1d_basis_functions,
+        generate_nd_basis_functions,
+        nd_basis_codes,
+    )
+
+    rng = np.random.default_rng(0)
+    X_data = rng.integers(1, 50, size=(30, 2)).astype(np.float64)
+    y_data = X_data[:, 0] * X_data[:, 1] + rng.normal(size=30)
+    one_d_funcs = list(generate_1d_basis_functions([1, 2], [1], []))
+    nd_basis_functions = list(generate_nd_basis_functions(2, [1, 2], [1], []))
+    basis_matrix = build_coded_basis_matrix(
+        one_d_funcs, nd_basis_codes(len(one_d_funcs), 2), X_data
+    )
+
+    assert basis_matrix.shape == (30, len(nd_basis_functions))
+    for column_indices in [(0, 1), (3, 7), (5, 11)]:
+        cached_error, _, _ = fit_cached_model(column_indices, basis_matrix, y_data)
+        combination = tuple(nd_basis_functions[i] for i in column_indices)
+        error, _, _ = fit_model(combination, X_data, y_data)
+        assert cached_error == pytest.approx(error)
+
+
+def test_model_search_reports_top_k(capsys):
+    """Tests that the runner-up combinations are reported ranked by MSE."""
+    find_best_model(
+        KNAPSACK_DATA,
+        num_terms=1,
+        p_values=[1],
+        q_values=[1],
+        X_values=[],
+        solver="batched",
+        top_k=3,
+    )
+
+    captured = capsys.readouterr()
+    ranking = captured.out.split("Top 3 combinations by mean squared error:\n")[1]
+    lines = ranking.strip().splitlines()
+    assert len(lines) == 3
+    assert lines[0].startswith("1. ") and lines[0].endswith(": n_1^1 * n_2^1")
+    errors = [float(line.split(" ")[1].rstrip(":")) for line in lines]
+    assert errors == sorted(errors)
+
+
+def test_rank_and_unrank_combinations():
+    """Tests that combination ranks match the itertools.combinations order."""
+    from nd_r_complexity.search import (
+        iter_combinations,
+        rank_combination,
+        unrank_combination,
+    )
+
+    combinations = list(itertools.combinations(range(9), 3))
+    for index, combination in enumerate(combinations):
+        assert rank_combination(combination, 9) == index
+        assert unrank_combination(index, 9, 3) == combination
+    assert list(iter_combinations(9, 3, 17, 40)) == combinations[17:40]
+    assert list(iter_combinations(9, 3, 80, 1000)) == combinations[80:]
+
+    # Far into a huge grid without walking it.
+    huge = unrank_combination(10**14, 123201, 3)
+    assert rank_combination(huge, 123201) == 10**14
+    # Beyond float range, where the item estimate cannot be used.
+    astronomical = unrank_combination(10**400, 10**200, 4)
+    assert rank_combination(astronomical, 10**200) == 10**400
+    with pytest.raises(IndexError):
+        unrank_combination(len(combinations), 9, 3)
+
+
+def test_print_functions_samples(capsys):
+    """Tests that only every millionth and the last combination are printed."""
+    from nd_r_complexity.print_functions import print_functions
+
+    print_functions(1, 2, [1, 2], [1], [2], total_only=False)
+    output = capsys.readouterr().out
+    assert "Total possible combinations: 105" in output
+    assert "--- Combination 0 ---" in output
+    assert "--- Combination 104 ---" in output
+    assert output.count("--- Combination") == 2
+
+
+def test_revolving_door_order():
+    """Tests that the revolving-door order swaps one item per step and ranks."""
+    from nd_r_complexity.search import (
+        iter_revolving_door,
+        rank_revolving_door,
+        unrank_revolving_door,
+    )
+
+    combinations = list(iter_revolving_door(9, 3))
+    assert sorted(combinations) == list(itertools.combinations(range(9), 3))
+    for previous, current in zip(combinations, combinations[1:]):
+        assert len(set(previous) - set(current)) == 1
+    for index, combination in enumerate(combinations):
+        assert rank_revolving_door(combination) == index
+        assert unrank_revolving_door(index, 9, 3) == combination
+    assert list(iter_revolving_door(9, 3, 17, 40)) == combinations[17:40]
+    assert combinations[:4] == [(0, 1, 2), (0, 2, 3), (1, 2, 3), (0, 1, 3)]
+
+    huge = unrank_revolving_door(10**14, 123201, 3)
+    assert rank_revolving_door(huge) == 10**14
+    with pytest.raises(IndexError):
+        unrank_revolving_door(len(combinations), 9, 3)
+
+
+def test_model_search_shards_cover_grid(capsys, knapsack_data):
+    """Tests that the best shard result matches an unsharded search."""
+    kwargs = dict(
+        num_terms=2, p_values=[1], q_values=[1, 2], X_values=[], solver="gram"
+    )
+    _, expected = find_best_model(KNAPSACK_DATA, **kwargs)
+    shard_results = [
+        find_best_model(KNAPSACK_DATA, shard=(i, 3), num_threads=1, **kwargs)
+        for i in range(3)
+    ]
+    X_data, y_data = knapsack_data
+    errors = [
+        mean_squared_error(
+            y_data,
+            model.predict(np.column_stack([f(*X_data.T) for f in functions])),
+        )
+        for model, functions in shard_results
+    ]
+    _, best = shard_results[int(np.argmin(errors))]
+    assert [str(f) for f in best] == [str(f) for f in expected]
+    assert "Searching shard 2/3" in capsys.readouterr().out
+
+
+@pytest.mark.parametrize("search_strategy", ["random", "stepwise", "bnb"])
+def test_model_search_rejects_shard_outside_grid(search_strategy):
+    """Tests that only the grid can be sharded."""
+    with pytest.raises(ValueError, match="Sharding is only supported"):
+        find_best_model(
+            KNAPSACK_DATA,
+            1,
+            [1],
+            [1],
+            [],
+            search_strategy=search_strategy,
+            solver="gram",
+            shard=(2, 4),
+        )
+
+
+def test_random_combinations_are_distinct_and_reproducible():
+    """Tests random search sampling by index without materializing functions."""
+    from nd_r_complexity.search import (
+        count_combinations_up_to,
+        generate_nd_basis_functions,
+        generate_random_basis_function_combinations,
+        get_nd_basis_function,
+        generate_1d_basis_functions,
+        sample_combination_indices,
+    )
+
+    one_d_funcs = list(generate_1d_basis_functions([1, 2], [1], [2]))
+    for index, nd_func in enumerate(generate_nd_basis_functions(2, [1, 2], [1], [2])):
+        assert str(get_nd_basis_function(index, one_d_funcs, 2)) == str(nd_func)
+
+    samples = sample_combination_indices(10**6, 3, 50000, seed=7)
+    assert len(set(samples)) == 50000
+    assert samples == sample_combination_indices(10**6, 3, 50000, seed=7)
+    assert sample_combination_indices(4, 2, 100, seed=1) == list(range(10))
+    # About 1.3e22 combinations, as with the 3-D BEST basis and 3 terms.
+    huge = sample_combination_indices(351**3, 3, 1000, seed=7)
+    assert len(set(huge)) == 1000 and huge == sorted(huge)
+    assert huge[-1] < count_combinations_up_to(351**3, 3)
+    assert huge == sample_combination_indices(351**3, 3, 1000, seed=7)
+
+    combinations = list(
+        generate_random_basis_function_combinations(2, 2, [1], [1], [], 20, seed=3)
+    )
+    assert len(combinations) == 20
+    assert all(1 <= len(c) <= 2 for c in combinations)
+    assert len({" + ".join(str(f) for f in c) for c in combinations}) == 20
+
+
+def test_model_search_random(capsys):
+    """Tests the find_best_model function with random search and a seed."""
+    kwargs = dict(
+        num_terms=2,
+        p_values=[1],
+        q_values=[1, 2],
+        X_values=[],
+        search_strategy="random",
+        num_samples=200,
+        seed=0,
+    )
+    model, basis_functions = find_best_model(KNAPSACK_DATA, **kwargs)
+    output = capsys.readouterr().out
+    assert model is not None
+    assert 1 <= len(basis_functions) <= 2
+    _, repeated = find_best_model(KNAPSACK_DATA, solver="batched", **kwargs)
+    assert [str(f) for f in repeated] == [str(f) for f in basis_functions]
+    assert "Best combination of basis functions:" in output
+
+
+def test_coded_basis_matrix_matches_nd_basis_functions(knapsack_data):
+    """Tests that integer-coded evaluation reproduces NDBasisFunction columns."""
+    from nd_r_complexity.model_search import build_coded_basis_matrix
+    from nd_r_complexity.search import (
+        generate_1d_basis_functions,
+        generate_nd_basis_functions,
+        nd_basis_codes,
+    )
+
+    X_data, _ = knapsack_data
+    one_d_funcs = list(generate_1d_basis_functions([1, 2], [1], [2]))
+    codes = nd_basis_codes(len(one_d_funcs), 2)
+    nd_basis_functions = list(generate_nd_basis_functions(2, [1, 2], [1], [2]))
+    assert codes.shape == (len(nd_basis_functions), 2)
+
+    expected = np.column_stack([f(*X_data.T) for f in nd_basis_functions])
+    basis_matrix = build_coded_basis_matrix(one_d_funcs, codes, X_data)
+    finite = np.isfinite(expected)
+    np.testing.assert_array_equal(np.isfinite(basis_matrix), finite)
+    np.testing.assert_array_equal(np.isnan(basis_matrix), ~finite)
+    np.testing.assert_allclose(basis_matrix[finite], expected[finite], rtol=1e-12)
+
+
+def test_invalid_basis_columns_are_pruned(capsys):
+    """Tests that overflowing bases are screened out before any fitting work."""
+    from nd_r_complexity.search import Exponential, MixedBasisFunction, Polynomial
+
+    n = np.array([10.0, 5000000.0])
+    mixed = MixedBasisFunction([Polynomial(1), Exponential(10)])
+    assert np.isnan(mixed(n)).all()
+    assert np.isnan(NDBasisFunction([Exponential(10), Polynomial(1)])(n, n)).all()
+
+    # 1-D bases: n^1, 10^n, Gamma(n), n^1 * 10^n, n^1 * Gamma(n), 10^n * Gamma(n);
+    # only n^1 survives in each dimension, so only n_1^1 * n_2^1 is fitted.
+    model, basis_functions = find_best_model(
+        BFS_DATA, num_terms=1, p_values=[1], q_values=[], X_values=[10]
+    )
+    output = capsys.readouterr().out
+    assert "Pruned 35 combinations containing 35 invalid basis columns" in output
+    assert [str(f) for f in basis_functions] == ["n_1^1 * n_2^1"]
+
+
+def test_log_space_basis_matrix(capsys, knapsack_data):
+    """Tests that log-domain evaluation matches linear columns and never overflows."""
+    from nd_r_complexity.model_search import (
+        build_coded_basis_matrix,
+        build_coded_log_basis_matrix,
+    )
+    from nd_r_complexity.search import generate_1d_basis_functions, nd_basis_codes
+
+    X_data, _ = knapsack_data
+    one_d_funcs = list(generate_1d_basis_functions([0, 1, 2], [1], [2]))
+    codes = nd_basis_codes(len(one_d_funcs), 2)
+    linear = build_coded_basis_matrix(one_d_funcs, codes, X_data)
+    normalized, log_scale = build_coded_log_basis_matrix(one_d_funcs, codes, X_data)
+
+    assert np.isfinite(normalized).all()
+    assert np.abs(normalized).max() <= 1.0
+    finite = np.isfinite(linear).all(axis=0)
+    assert not finite.all()
+    np.testing.assert_allclose(
+        normalized[:, finite] * np.exp(log_scale[finite]),
+        linear[:, finite],
+        rtol=1e-9,
+    )
+
+    find_best_model(
+        BFS_DATA,
+        num_terms=1,
+        p_values=[1],
+        q_values=[],
+        X_values=[10],
+        solver="gram",
+        log_space=True,
+    )
+    output = capsys.readouterr().out
+    assert "Pruned" not in output
+    assert "Best model column log-scales:" in output
+
+
+def test_polylog_log_value_below_one():
+    """Tests that polylog log-values and signs reproduce log(n)^q for n < 1."""
+    from nd_r_complexity.model_search import (
+        build_coded_basis_matrix,
+        build_coded_log_basis_matrix,
+    )
+    from nd_r_complexity.search import (
+        Polylog,
+        generate_1d_basis_functions,
+        nd_basis_codes,
+    )
+
+    n = np.array([0.0, 0.5, 3.0])
+    for q in (1, 2, 3):
+        polylog = Polylog(q)
+        np.testing.assert_allclose(
+            polylog.log_sign(n) * np.exp(polylog.log_value(n)), polylog(n), rtol=1e-12
+        )
+    assert np.isnan(Polylog(1.5).log_sign(n)[:2]).all()
+
+    # Every finite linear column is kept, with its sign, in the log domain.
+    X_data = np.array([[0.1, 0.2], [0.5, 3.0], [2.0, 0.7], [4.0, 8.0]])
+    one_d_funcs = list(generate_1d_basis_functions([1], [1], []))
+    codes = nd_basis_codes(len(one_d_funcs), 2)
+    linear = build_coded_basis_matrix(one_d_funcs, codes, X_data)
+    normalized, log_scale = build_coded_log_basis_matrix(one_d_funcs, codes, X_data)
+    assert np.isfinite(linear).all() and np.isfinite(normalized).all()
+    assert (linear < 0).any()
+    np.testing.assert_allclose(normalized * np.exp(log_scale), linear, rtol=1e-9)
+
+
+def test_equivalent_columns_are_merged(capsys):
+    """Tests that identical and collinear basis columns collapse to one column."""
+    from nd_r_complexity.model_search import equivalent_column_representatives
+
+    n = np.arange(1.0, 30.0)
+    basis_matrix = np.column_stack(
+        [n**3, n, n * n**2, 5 - 2 * n, np.ones_like(n), np.full_like(n, 7.0), n**2]
+    )
+    representatives = equivalent_column_representatives(basis_matrix)
+    np.testing.assert_array_equal(representatives, [0, 1, 4, 6])
+
+    kwargs = dict(num_terms=2, p_values=[1, 2, 3], q_values=[1], X_values=[])
+    _, expected = find_best_model(KNAPSACK_DATA, solver="batched", **kwargs)
+    _, pruned = find_best_model(
+        KNAPSACK_DATA, solver="batched", prune_equivalent=True, **kwargs
+    )
+    assert [str(f) for f in pruned] == [str(f) for f in expected]
+    assert "Merged equivalent basis columns" in capsys.readouterr().out
+
+
+def test_find_best_model_rejects_unknown_search_arguments(capsys):
+    """Tests that arguments forwarded to search_models are checked up front."""
+    with pytest.raises(TypeError):
+        find_best_model(KNAPSACK_DATA, 1, [1], [], [], solvr="gram")
+    assert capsys.readouterr().out == ""
+
+
+def test_find_best_model_keeps_positional_search_arguments(capsys):
+    """Tests that num_threads, search_strategy and num_samples stay positional."""
+    model, basis_functions = find_best_model(BFS_DATA, 1, [1], [1], [], 1, "grid", 100)
+    assert model is not None
+    assert len(basis_functions) == 1
+    assert "Best combination of basis functions:" in capsys.readouterr().out
@@ -0,0 +1,134 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from nd_r_complexity.gram import GramStatistics
+from nd_r_complexity.metrics import Metrics
+from nd_r_complexity.model_search import find_best_model, search_models
+from nd_r_complexity.results import load_result
+from nd_r_complexity.search import n_choose_k
+from nd_r_complexity.selection import (
+    CrossValidationStatistics,
+    information_criterion,
+)
+
+from helpers import KNAPSACK_DATA
+
+COMBINATIONS = np.array([[0, 1], [3, 7], [2, 10], [5, 6], [1, 4]])
+
+
+def _held_out_mse(basis_matrix, y_data, folds, column_indices):
+    squared_errors = 0.0
+    for fold in np.unique(folds):
+        train, test = folds != fold, folds == fold
+        design = np.column_stack(
+            [np.ones(len(y_data)), basis_matrix[:, column_indices]]
+        )
+        coef = np.linalg.lstsq(design[train], y_data[train], rcond=None)[0]
+        squared_errors += np.sum((y_data[test] - design[test] @ coef) ** 2)
+    return squared_errors / len(y_data)
+
+
+@pytest.mark.parametrize("num_folds", [5, None])
+@pytest.mark.parametrize("max_gram_bytes", [2**30, 0])
+def test_cross_validation_matches_refitting(
+    monkeypatch, knapsack_basis, num_folds, max_gram_bytes
+):
+    """Tests k-fold and leave-one-out scores against refitting on each fold."""
+    monkeypatch.setattr("nd_r_complexity.gram.MAX_GRAM_BYTES", max_gram_bytes)
+    basis_matrix, y_data = knapsack_basis([1, 2], [1], [])
+    # Scaled columns keep the reference least-squares fits accurate.
+    basis_matrix = basis_matrix / np.abs(basis_matrix).max(axis=0)
+    stats = CrossValidationStatistics(
+        GramStatistics(basis_matrix, y_data), num_folds, seed=0
+    )
+    if num_folds is None:
+        folds = np.arange(len(y_data))
+    else:
+        folds = np.random.default_rng(0).permutation(len(y_data)) % num_folds
+    expected = [
+        _held_out_mse(basis_matrix, y_data, folds, list(c)) for c in COMBINATIONS
+    ]
+    np.testing.assert_allclose(stats.batch_errors(COMBINATIONS), expected, rtol=1e-6)
+    assert stats.error(COMBINATIONS[0]) == pytest.approx(expected[0], rel=1e-6)
+
+
+def test_information_criteria():
+    """Tests that AIC/BIC penalize terms and rank like MSE for a fixed size."""
+    errors = np.array([2.0, 1.0, 3.0])
+    aic = information_criterion(errors, 100, 2, "aic")
+    bic = information_criterion(errors, 100, 2, "bic")
+    np.testing.assert_allclose(aic, 100 * np.log(errors) + 6)
+    np.testing.assert_allclose(bic, 100 * np.log(errors) + 3 * np.log(100))
+    assert list(np.argsort(bic)) == list(np.argsort(errors))
+    assert information_criterion(1.0, 100, 3, "bic") > information_criterion(
+        1.0, 100, 2, "bic"
+    )
+
+
+@pytest.mark.parametrize("criterion", ["bic", "cv", "loo"])
+def test_find_best_model_criterion(tmp_path, criterion):
+    """Tests ranking by a criterion through find_best_model and its result."""
+    output = str(tmp_path / "result.json")
+    kwargs = dict(num_terms=2, p_values=[1, 2], q_values=[0, 1], X_values=[])
+    find_best_model(
+        KNAPSACK_DATA,
+        solver="batched",
+        criterion=criterion,
+        top_k=3,
+        output=output,
+        quiet=True,
+        **kwargs,
+    )
+    result = load_result(output)
+    scores = [model["score"] for model in result.models]
+    assert scores == sorted(scores)
+    assert result.parameters["criterion"] == criterion
+    if criterion == "bic":
+        best = result.best
+        assert best["score"] == pytest.approx(
+            information_criterion(best["mse"], 64, len(best["basis_ids"]), "bic")
+        )
+    else:
+        # Held-out errors are never below the training error of a full fit.
+        assert all(model["score"] >= model["mse"] for model in result.models)
+
+
+@pytest.mark.parametrize("solver", ["batched", "incremental"])
+def test_information_criterion_grid_searches_smaller_models(tmp_path, solver):
+    """Tests that AIC/BIC grid search lets fewer terms beat the full size."""
+    rng = np.random.default_rng(0)
+    n, m = rng.uniform(1, 10, 200), rng.uniform(1, 10, 200)
+    data_path = str(tmp_path / "product.csv")
+    pd.DataFrame({"n": n, "m": m, "t": 3 * n * m + rng.normal(0, 1, 200)}).to_csv(
+        data_path, index=False
+    )
+    kwargs = dict(num_terms=2, p_values=[1], q_values=[], X_values=[])
+    _, mse_basis = find_best_model(data_path, solver=solver, quiet=True, **kwargs)
+    assert len(mse_basis) == 2
+
+    metrics = Metrics()
+    result = search_models(
+        data_path,
+        solver=solver,
+        criterion="bic",
+        metrics=metrics,
+        verbose=False,
+        **kwargs,
+    )
+    assert [str(f) for f in result[0]["basis_functions"]] == ["n_1^1 * n_2^1"]
+    num_columns = 3**2
+    assert metrics.counters["combinations_fitted"] == num_columns + n_choose_k(
+        num_columns, 2
+    )
+
+
+def test_criterion_validation():
+    """Tests that unsupported criterion combinations are rejected."""
+    kwargs = dict(num_terms=2, p_values=[1], q_values=[1], X_values=[])
+    with pytest.raises(ValueError):
+        find_best_model(KNAPSACK_DATA, criterion="r2", **kwargs)
+    with pytest.raises(ValueError):
+        find_best_model(KNAPSACK_DATA, criterion="cv", solver="sklearn", **kwargs)
+    with pytest.raises(ValueError):
+        find_best_model(KNAPSACK_DATA, criterion="aic", search_strategy="bnb", **kwargs)
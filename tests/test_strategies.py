@@ -0,0 +1,144 @@
+import itertools
+
+import numpy as np
+import pytest
+
+from nd_r_complexity.gram import GramStatistics
+from nd_r_complexity.model_search import find_best_model
+from nd_r_complexity.search import n_choose_k
+from nd_r_complexity.strategies import branch_and_bound_search, stepwise_search
+from nd_r_complexity.top_k import TopK
+
+from helpers import BFS_DATA, KNAPSACK_DATA, finite_basis_columns
+
+
+def _grid_top_k(stats, num_terms, top_k):
+    index_array = np.array(
+        list(itertools.combinations(range(stats.centered.shape[1]), num_terms))
+    )
+    best = TopK(top_k)
+    best.push_many(stats.batch_errors(index_array), index_array)
+    return best.items()
+
+
+@pytest.mark.parametrize("method", ["forward", "omp"])
+@pytest.mark.parametrize("backward", [False, True])
+def test_stepwise_search_is_near_grid_optimum(knapsack_basis, method, backward):
+    """Tests stepwise selection against the exhaustive grid on knapsack data."""
+    basis_matrix, y_data = knapsack_basis([1, 2, 3], [1], [])
+    stats = GramStatistics(basis_matrix, y_data)
+    grid_error, _ = _grid_top_k(stats, 3, 1)[0]
+
+    best, num_scored = stepwise_search(
+        GramStatistics(basis_matrix, y_data, with_gram=False),
+        3,
+        top_k=2,
+        method=method,
+        backward=backward,
+    )
+    (error, column_indices), _ = best.items()
+    assert len(column_indices) == 3
+    assert error == pytest.approx(stats.error(column_indices), rel=1e-6)
+    assert grid_error <= error <= 1.5 * grid_error
+    assert num_scored < 4 * stats.centered.shape[1]
+
+
+def test_forward_first_step_is_exhaustive(knapsack_basis):
+    """Tests that one forward step ranks single columns exactly like the grid."""
+    stats = GramStatistics(*knapsack_basis([1, 2, 3], [1], []))
+    best, _ = stepwise_search(stats, 1, top_k=5)
+    expected = _grid_top_k(stats, 1, 5)
+    assert [c for _, c in best.items()] == [c for _, c in expected]
+    np.testing.assert_allclose(
+        [e for e, _ in best.items()], [e for e, _ in expected], rtol=1e-9
+    )
+
+
+def test_find_best_model_stepwise(capsys):
+    """Tests the stepwise strategy through find_best_model."""
+    model, basis_functions = find_best_model(
+        KNAPSACK_DATA,
+        num_terms=1,
+        p_values=[1],
+        q_values=[0],
+        X_values=[],
+        search_strategy="stepwise",
+    )
+    assert [str(f) for f in basis_functions] == ["n_1^1 * n_2^1"]
+    assert "Stepwise search scored" in capsys.readouterr().out
+
+
+@pytest.mark.parametrize("num_terms,top_k", [(1, 3), (2, 5), (3, 4)])
+def test_branch_and_bound_matches_grid(knapsack_basis, num_terms, top_k):
+    """Tests that branch and bound returns exactly the grid top-K."""
+    stats = GramStatistics(*knapsack_basis([1, 2], [0, 1], []))
+    best, counters = branch_and_bound_search(stats, num_terms, top_k=top_k)
+    expected = _grid_top_k(stats, num_terms, top_k)
+    assert [c for _, c in best.items()] == [c for _, c in expected]
+    np.testing.assert_allclose(
+        [e for e, _ in best.items()], [e for e, _ in expected], rtol=1e-9
+    )
+    assert counters["nodes"] > 0
+
+
+@pytest.mark.parametrize("keep_rows", [True, False])
+def test_branch_and_bound_prunes_subtrees(keep_rows):
+    """Tests that bounds skip subtrees when samples outnumber the columns."""
+    rng = np.random.default_rng(0)
+    X_data = rng.uniform(1, 20, (400, 2))
+    y_data = 5 * X_data[:, 0] * X_data[:, 1] + rng.normal(0, 1, 400)
+    basis_matrix = finite_basis_columns(X_data, [1, 2], [1], [])
+    stats = GramStatistics(basis_matrix, y_data)
+    expected = _grid_top_k(stats, 3, 3)
+    if not keep_rows:
+        # Streamed statistics only hold the Gram matrix and moments.
+        stats.centered = stats.y_centered = None
+
+    best, counters = branch_and_bound_search(stats, 3, top_k=3)
+    assert [c for _, c in best.items()] == [c for _, c in expected]
+    assert counters["pruned"] > 0
+    assert counters["scored"] < n_choose_k(basis_matrix.shape[1], 3) / 4
+
+
+def test_find_best_model_bnb_matches_grid(capsys):
+    """Tests the branch-and-bound strategy through find_best_model."""
+    kwargs = dict(num_terms=2, p_values=[1], q_values=[1, 2], X_values=[], top_k=3)
+    _, grid_basis = find_best_model(BFS_DATA, solver="gram", **kwargs)
+    grid_out = capsys.readouterr().out
+    _, bnb_basis = find_best_model(BFS_DATA, search_strategy="bnb", **kwargs)
+    bnb_out = capsys.readouterr().out
+    assert [str(f) for f in bnb_basis] == [str(f) for f in grid_basis]
+    assert "Branch and bound visited" in bnb_out
+    assert bnb_out.split("Top 3")[1] == grid_out.split("Top 3")[1]
+
+
+@pytest.mark.parametrize("search_strategy", ["stepwise", "bnb"])
+def test_sklearn_solver_refits_from_ranking_statistics(capsys, search_strategy):
+    """Tests that subsets ranked by Gram statistics report errors in order."""
+    kwargs = dict(
+        num_terms=2,
+        p_values=[1, 2, 3],
+        q_values=[1, 2],
+        X_values=[2],
+        top_k=3,
+        search_strategy=search_strategy,
+    )
+    find_best_model(BFS_DATA, solver="gram", **kwargs)
+    gram_out = capsys.readouterr().out
+    find_best_model(BFS_DATA, solver="sklearn", **kwargs)
+    sklearn_out = capsys.readouterr().out
+    assert sklearn_out.split("Top 3")[1] == gram_out.split("Top 3")[1]
+    lines = sklearn_out.split("Top 3")[1].strip().splitlines()[1:]
+    errors = [float(line.split(" ")[1].rstrip(":")) for line in lines]
+    assert errors == sorted(errors)
+
+
+@pytest.mark.parametrize("strategy", [stepwise_search, branch_and_bound_search])
+def test_too_few_columns_raise_like_grid(strategy):
+    """Tests that no strategy silently returns fewer than num_terms columns."""
+    rng = np.random.default_rng(0)
+    stats = GramStatistics(rng.normal(size=(20, 2)), rng.normal(size=20))
+    with pytest.raises(ValueError, match="No combination"):
+        strategy(stats, 3)
+    best, _ = strategy(stats, 2)
+    assert [c for _, c in best.items()] == [(0, 1)]
@@ -0,0 +1,34 @@
+import random
+
+import numpy as np
+
+from nd_r_complexity.top_k import TopK
+
+
+def test_top_k_is_independent_of_push_and_merge_order():
+    """Tests that merged per-worker heaps rank exactly like a full sort."""
+    rng = random.Random(0)
+    entries = [(float(rng.randint(0, 20)), (i, i + 1)) for i in range(200)]
+    entries.append((float("inf"), (500, 501)))
+    expected = sorted(e for e in entries if np.isfinite(e[0]))[:5]
+
+    shuffled = entries[:]
+    rng.shuffle(shuffled)
+    merged = TopK(5)
+    for start in range(0, len(shuffled), 17):
+        worker = TopK(5)
+        chunk = shuffled[start : start + 17]
+        worker.push_many([e for e, _ in chunk], [c for _, c in chunk])
+        merged.merge(worker)
+
+    assert merged.items() == expected
+
+
+def test_push_many_ignores_nan_errors():
+    """Tests that NaN errors from ill-conditioned fits do not hide finite ones."""
+    best = TopK(2)
+    best.push_many([1.0, np.nan, np.nan, np.nan], [(0,), (1,), (2,), (3,)])
+    assert best.items() == [(1.0, (0,))]
+
+    best.push_many([np.nan, 3.0, np.inf, 2.0, np.nan], [(i,) for i in range(4, 9)])
+    assert best.items() == [(1.0, (0,)), (2.0, (7,))]